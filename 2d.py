@@ -1,6 +1,5 @@
 import itertools
 import operator
-import pygame
 
 # constants
 WIDTH, HEIGHT = 800, 600
@@ -76,6 +75,7 @@ class BallastTank(Body):
 
 
 def main():
+    import pygame
 
     pygame.init()
     pygame.display.set_caption('submarine simulator')
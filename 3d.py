@@ -11,28 +11,103 @@ backburner:
 - center of projected area radii from center of mass y,z as an optimized coefficient of torque
 '''
 
-from math import pi as PI, sqrt, sin, cos
+from math import pi as PI, sqrt, sin, cos, acos
+import functools
+from vec import VecXYZ
+from integrators import Integrator
+from water import WaterColumn
+from orientation import Orientation
+from drag import DragTable, VISCOSITY
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from scheduler import ForceScheduler
 
 G: float = 9.8
 
-DRAG: float = 0.15 # approx drag coefficient of water against a streamline submarine
+DRAG: float = 0.15 # approx drag coefficient of water against a streamline submarine, unless the submarine has a drag table
 SURFACE_Z: float = 100.0
 
 # pressure
 RHO_AIR: float = 1.225 # kg/m^3
 RHO_FRESHWATER_SURFACE: float = 1000
 RHO_SEAWATER_SURFACE: float = 1025
+RHO_WATER: float = RHO_SEAWATER_SURFACE # used for friction
 BETA_SEAWATER: float = 0.0046 # approx gradient of pressure change per change increase in depth
 
+# the water column every buoyancy calc reads, replace it with a measured profile (WaterColumn.load) for stratified water
+WATER: WaterColumn = WaterColumn.linear(RHO_SEAWATER_SURFACE, BETA_SEAWATER, g=G, surface_z=SURFACE_Z)
+
+# the per category forces Submarine.acceleration leaves in Submarine.forces, as applied to the hull
+FORCES: tuple[str,...] = (
+    'xf_thrust', 'yf_thrust', 'zf_thrust',
+    'xf_buoyancy', 'yf_buoyancy', 'zf_buoyancy',
+    'xf_friction', 'yf_friction', 'zf_friction',
+)
+
+# control surface area cache
+AREA_QUANTUM: float | None = None # radians, attitudes within one quantum share an area. None only reuses exact attitudes
+AREA_CACHE_SIZE: int = 4096 # entries per surface shape
+
 '''
 The submarine components perform calculations relative to a direction vector facing positive x.
 The submarine tells the components when executing the calculation where the actual direction is (the direction the sub is facing)
 '''
 
+class AreaCache:
+    '''
+    LRU cache of control surface projected areas keyed by (quantised) attitude.
+    One cache is shared by every surface with the same width and height, see shared()
+    '''
+    _shared: dict[tuple,'AreaCache'] = {}
+
+    def __init__(self, width: float, height: float, quantum: float | None = AREA_QUANTUM, maxsize: int = AREA_CACHE_SIZE):
+        self.width, self.height = width, height
+        self.quantum, self.maxsize = quantum, maxsize
+        self._lookup = functools.lru_cache(maxsize)(self._compute)
+        if quantum is None: # skip a python frame per call, the C lru wrapper is the whole hit path
+            self.area = self._lookup
+
+    @classmethod
+    def shared(cls, width: float, height: float) -> 'AreaCache':
+        '''the cache for this shape, created with the AREA_QUANTUM/AREA_CACHE_SIZE in effect at the time'''
+        key = (width, height, AREA_QUANTUM, AREA_CACHE_SIZE)
+        cache = cls._shared.get(key)
+        if cache is None:
+            cache = cls._shared[key] = cls(width, height, AREA_QUANTUM, AREA_CACHE_SIZE)
+        return cache
+
+    @classmethod
+    def stats(cls) -> dict[str,int]:
+        '''hit/miss counters summed over every shared cache'''
+        caches = cls._shared.values()
+        return {'caches': len(caches), 'hits': sum(c.hits for c in caches), 'misses': sum(c.misses for c in caches)}
+
+    @property
+    def hits(self) -> int:
+        return self._lookup.cache_info().hits
+
+    @property
+    def misses(self) -> int:
+        return self._lookup.cache_info().misses
+
+    def area(self, ya: float, za: float) -> float:
+        # the area is evaluated at the quantised attitude, so a cached value doesn't depend on which attitude missed first
+        q = self.quantum
+        return self._lookup(round(ya / q)*q, round(za / q)*q)
+
+    def _compute(self, ya: float, za: float) -> float:
+        h = sqrt(2*self.height**2 - 2*self.height**2*cos(ya))
+        w = sqrt(2*self.width**2 - 2*self.width**2*cos(za))
+        return h*w
+
 class ControlSurface:
     """on its own this cannot calculate any vectors relative to origin. it calculates control surface area that faces the x direction unit vector. this is then rotated by the owning submarine, depending on where the submarine chooses to place it."""
-    width: float = 1    
-    height: float = 1    
+    _width: float = 1
+    _height: float = 1
+    _cache: AreaCache | None = None # AreaCache.shared for the current dimensions, looked up on first use
+    _orientation: Orientation | None = None # the attitude _area was taken at, dropped with _cache
+    _area: float = 0.0
 
     xa, ya, za = 0.0, 0.0, 0.0
 
@@ -43,18 +118,38 @@ class ControlSurface:
         self.ya = ya
         self.za = za
 
-    def area(self, xa0, ya0, za0): # the surface area facing the input direction
-        ya = ya0 + self.ya
-        za = za0 + self.za
+    @property
+    def width(self) -> float:
+        return self._width
 
-        h = sqrt(2*self.height**2 - 2*self.height**2*cos(ya))
-        w = sqrt(2*self.width**2 - 2*self.width**2*cos(za))
+    @width.setter
+    def width(self, width: float):
+        self._width, self._cache, self._orientation = width, None, None
 
-        return h*w
+    @property
+    def height(self) -> float:
+        return self._height
+
+    @height.setter
+    def height(self, height: float):
+        self._height, self._cache, self._orientation = height, None, None
+
+    def area(self, xa0, ya0, za0): # the surface area facing the input direction
+        orientation = self._orientation
+        if orientation is None:
+            orientation = self._orientation = Orientation()
+        if not orientation.update(xa0 + self.xa, ya0 + self.ya, za0 + self.za): # the attitude hasn't changed
+            return self._area
+        cache = self._cache
+        if cache is None:
+            cache = self._cache = AreaCache.shared(self.width, self.height)
+        self._area = cache.area(orientation.ya, orientation.za)
+        return self._area
 
 class Propeller:
     """effectively a simple thrust vector calculator tool until further complexity is added e.g. spin"""
     xa, ya, za = 0.0, 0.0, 0.0
+    _orientation: Orientation | None = None # the trig of the latest attitude, see orientation.py
 
     def __init__(self, xa: float = 0.0, ya: float = 0.0, za: float = 0.0):
         self.xa = xa
@@ -62,14 +157,15 @@ class Propeller:
         self.za = za
 
     def force(self, xa0, ya0, za0, f) -> tuple[float,float,float]:
-        xa = xa0 + self.xa
-        ya = ya0 + self.ya
-        za = za0 + self.za
+        o = self._orientation
+        if o is None:
+            o = self._orientation = Orientation()
+        o.update(xa0 + self.xa, ya0 + self.ya, za0 + self.za)
 
-        # flip the direction to get forward force
-        xf = -f*cos(za)*cos(ya)
-        yf = -f*sin(za)
-        zf = -f*cos(za)*sin(ya)
+        # the thrust axis, o.forward, flipped to get forward force
+        xf = -f*o.cos_za*o.cos_ya
+        yf = -f*o.sin_za
+        zf = -f*o.cos_za*o.sin_ya
 
         return xf, yf, zf
 
@@ -82,18 +178,16 @@ class BallastTank:
         self.rho = rho
 
     def _water_rho(self, zs) -> float:
-        depth: float = zs - SURFACE_Z
-        return RHO_SEAWATER_SURFACE + BETA_SEAWATER*depth
+        return WATER.density_at(zs)
 
     def force(self, xs: float, ys: float, zs: float, rho: float = 1.0) -> tuple[float,float,float]:
-        # calculate (weight) force of the displaced quanity of water
-        m = self.rho*self.vol
-        f = m*g
+        # weight of the tank contents less the weight of the water they displace (z points down)
+        f = (self.rho - self._water_rho(zs))*self.vol*G
         # TODO: account for rotation and torque that potentially produces other axis forces
         return 0.0, 0.0, f
 
     # utility function to set the rho parameter from known values of rho for air and water
-    def set_air_water_displacement(self, air_prc: float = 0.0):
+    def set_air_water_displacement(self, air_prc: float = 0.0, zs: float = SURFACE_Z):
         water_rho = self._water_rho(zs)
         self.rho = air_prc*RHO_AIR + (1-air_prc)*water_rho
     
@@ -110,15 +204,19 @@ class Submarine:
 
     # components should be passed angles relative to positive x facing vector, 
     # ... regardless of the angle you define your sub facing
-    propeller = Propeller(.0,PI,0.0)
-    surfaces = [
-        #ControlSurface(1,1,PI/2,PI/2,.0) # plane
-    ]
-    ballast_tanks = [
-        BallastTank()
-    ]
-
-    def __init__(self, length: float = 100, diameter: float = 5, density: float = 1, xs: float = .0, ys: float = .0, zs: float = .0, xa: float = .0, ya: float = .0, za: float = .0):
+    # NOTE: created per instance in __init__, class level lists would be shared by every submarine
+    propeller: Propeller
+    surfaces: list[ControlSurface]
+    ballast_tanks: list[BallastTank]
+    integrator: Integrator | None = None # None keeps the original explicit update in tick
+    drag: DragTable | None = None # cd by Reynolds number (over the diameter) and angle of attack, see drag.py. None keeps DRAG
+    _orientation: Orientation | None = None # the trig of the attitude drag_coefficient last saw
+    _drag_inputs: tuple | None = None # velocity, attitude, hull and table of the latest drag_coefficient, see _drag_cd
+    _drag_cd: float = 0.0
+    scheduler: 'ForceScheduler | None' = None # multi-rate force terms, see scheduler.py. None evaluates every term every time
+    forces: tuple[float,...] = (.0,)*len(FORCES) # from the latest acceleration evaluation, see FORCES
+
+    def __init__(self, length: float = 100, diameter: float = 5, density: float = 1, xs: float = .0, ys: float = .0, zs: float = .0, xa: float = .0, ya: float = .0, za: float = .0, integrator: Integrator | None = None):
         self.length = length
         self.diameter = diameter
         self.density = density
@@ -128,54 +226,123 @@ class Submarine:
         self.xa = xa
         self.ya = ya
         self.za = za
+        self.integrator = integrator
+
+        self.propeller = Propeller(.0,PI,0.0)
+        self.surfaces = [
+            #ControlSurface(1,1,PI/2,PI/2,.0) # plane
+        ]
+        self.ballast_tanks = [
+            BallastTank()
+        ]
 
         self.hull_projected_area = PI*(self.diameter/2)**2
         self.volume = self.length * self.hull_projected_area
         self.mass = self.volume*self.density
 
-    def tick(self, thrust: float = 2.0, dt: float = 1.0) -> tuple[float,float,float]:
-
-        # calculate projected area needed for friction calc
+    def projected_area(self) -> float:
+        '''projected area needed for the friction calc'''
         area = PI*(self.diameter/2)**2 # hull face
         for surface in self.surfaces: # sum the thrust projected areas
             area += surface.area(self.xa,self.ya,self.za)
-            
-        # calculate friction 
-        # TODO: consider torque of surface angle
-        xf_friction = (RHO_WATER*DRAG*area*xv**2)/2
-        yf_friction = (RHO_WATER*DRAG*area*yv**2)/2
-        zf_friction = (RHO_WATER*DRAG*area*zv**2)/2
+        return area
 
-        # calculate all additional non-resistance forces
-        # incl. the thrust force
-        xf_thrust, yf_thrust, zf_thrust = self.propeller.force(self.xa, self.ya, self.za, thrust)
-
-        # buoyant force
+    def friction_force(self, area: float, xv: float, yv: float, zv: float) -> tuple[float,float,float]:
+        # TODO: consider torque of surface angle
+        # v*|v| keeps the friction opposed to the direction of motion
+        cd = DRAG if self.drag is None else self.drag_coefficient(xv, yv, zv)
+        xf_friction = (RHO_WATER*cd*area*xv*abs(xv))/2
+        yf_friction = (RHO_WATER*cd*area*yv*abs(yv))/2
+        zf_friction = (RHO_WATER*cd*area*zv*abs(zv))/2
+        return xf_friction, yf_friction, zf_friction
+
+    def drag_coefficient(self, xv: float, yv: float, zv: float) -> float:
+        '''cd from the drag table at this velocity, the attack being between it and the direction the hull faces'''
+        inputs = (xv, yv, zv, self.xa, self.ya, self.za, self.diameter, self.drag, RHO_WATER)
+        if inputs == self._drag_inputs: # at rest or at terminal velocity nothing below changes
+            return self._drag_cd
+        speed = sqrt(xv*xv + yv*yv + zv*zv)
+        if not speed:
+            cd = self.drag.cd_at(.0, .0)
+        else:
+            o = self._orientation
+            if o is None:
+                o = self._orientation = Orientation()
+            o.update(self.xa, self.ya, self.za)
+            xf, yf, zf = o.forward
+            along = abs(xf*xv + yf*yv + zf*zv) / speed
+            cd = self.drag.cd_at(RHO_WATER*speed*self.diameter/VISCOSITY, acos(along) if along < 1.0 else .0) # reynolds() inlined
+        self._drag_inputs, self._drag_cd = inputs, cd
+        return cd
+
+    def thrust_force(self, thrust: float) -> tuple[float,float,float]:
+        return self.propeller.force(self.xa, self.ya, self.za, thrust)
+
+    def buoyant_force(self, xs: float, ys: float, zs: float) -> tuple[float,float,float]:
         # TODO: the buoyant force has a different projected area!!!
         xf_buoyancy, yf_buoyancy, zf_buoyancy = .0, .0, .0
         for tank in self.ballast_tanks:
-            f_tank_buoyancy = tank.force(self.xs, self.ys, self.zs)
+            f_tank_buoyancy = tank.force(xs, ys, zs)
             xf_buoyancy += f_tank_buoyancy[0]
             yf_buoyancy += f_tank_buoyancy[1]
             zf_buoyancy += f_tank_buoyancy[2]
+        return xf_buoyancy, yf_buoyancy, zf_buoyancy
+
+    def acceleration(self, thrust: float, xs: float, ys: float, zs: float, xv: float, yv: float, zv: float, count: bool = True) -> tuple[float,float,float]:
+        '''
+        the acceleration at a given position and velocity, with the current attitude and components. count=False
+        keeps a scheduler's counters and cached terms out of it, see ForceScheduler.acceleration
+        '''
+        if self.scheduler is not None:
+            return self.scheduler.acceleration(self, thrust, xs, ys, zs, xv, yv, zv, count)
+
+        friction = self.friction_force(self.projected_area(), xv, yv, zv)
+
+        # calculate all additional non-resistance forces
+        # incl. the thrust force
+        return self._combine(self.thrust_force(thrust), self.buoyant_force(xs, ys, zs), friction)
+
+    def _combine(self, thrust: tuple[float,float,float], buoyancy: tuple[float,float,float], friction: tuple[float,float,float]) -> tuple[float,float,float]:
+        '''sum the force terms into Submarine.forces and the acceleration, the one place they are added up'''
+        xf_thrust, yf_thrust, zf_thrust = thrust
+        xf_buoyancy, yf_buoyancy, zf_buoyancy = buoyancy
+        xf_friction, yf_friction, zf_friction = friction
 
         xf = xf_thrust + xf_buoyancy - xf_friction
         yf = yf_thrust + yf_buoyancy - yf_friction
         zf = zf_thrust + zf_buoyancy - zf_friction
+        self.forces = (xf_thrust, yf_thrust, zf_thrust, xf_buoyancy, yf_buoyancy, zf_buoyancy, -xf_friction, -yf_friction, -zf_friction)
 
         # revert to accellerations (yes this is innefficient and unnecessary, but its very understandable)
-        xc = xf / self.mass
-        yc = yf / self.mass
-        zc = zf / self.mass
-
-        self.xv += xc / dt
-        self.yv += yc / dt
-        self.zv += zc / dt
+        return xf / self.mass, yf / self.mass, zf / self.mass
+
+    def tick(self, thrust: float = 2.0, dt: float = 1.0, integrator: Integrator | None = None):
+        '''
+        advance the submarine by dt. without an integrator (and none set on the submarine) this is the
+        original explicit update, which is only stable for tiny steps
+        '''
+        integrator = integrator or self.integrator
+        if self.scheduler is not None:
+            self.scheduler.advance()
+        if integrator is None:
+            xc, yc, zc = self.acceleration(thrust, self.xs, self.ys, self.zs, self.xv, self.yv, self.zv)
+
+            self.xv += xc / dt
+            self.yv += yc / dt
+            self.zv += zc / dt
+
+            self.xs += self.xv
+            self.ys += self.yv
+            self.zs += self.zv
+            return
+
+        def a(s: VecXYZ, v: VecXYZ) -> VecXYZ:
+            return VecXYZ(self.acceleration(thrust, *s, *v))
+
+        s, v = integrator.advance(a, VecXYZ(self.xs, self.ys, self.zs), VecXYZ(self.xv, self.yv, self.zv), dt)
+        self.xs, self.ys, self.zs = s
+        self.xv, self.yv, self.zv = v
 
-        self.xs += self.xv
-        self.ys += self.yv
-        self.zs += self.zv
-        
     def __str__(self) -> str:
         return f'Submarine({self.xs},{self.ys},{self.zs},{self.xa},{self.ya},{self.za})'
 
@@ -0,0 +1,38 @@
+'''
+Cylinder drag for a batch of hull panels: one scalar wrapper call per panel against one batched kernel call.
+
+run from the repository root: python -m benchmarks.drag_kernels
+'''
+from __future__ import annotations
+import timeit
+import numpy as np
+import resistance_functional as rf
+from vec import VecXZ, VecY, VecX
+
+PANELS: int = 10_000
+RHO: float = 1025.0
+CD: float = 0.8
+
+def main():
+    rng = np.random.default_rng(0)
+    a = rng.uniform(-np.pi, np.pi, PANELS)
+    v = rng.normal(size=(2, PANELS))
+    h = rng.uniform(0.5, 2.0, PANELS)
+    r = rng.uniform(0.1, 0.5, PANELS)
+
+    panels = [(VecY(a[i]), VecXZ(0.0, 0.0), VecXZ(v[0, i], v[1, i]), VecX(h[i]), VecX(r[i])) for i in range(PANELS)]
+    def scalar():
+        return [rf.cylinder_resistant_force2d(a_i, s_i, v_i, h_i, r_i, CD, RHO) for a_i, s_i, v_i, h_i, r_i in panels]
+    def batched():
+        return rf.cylinder_resistant_forces2d(a, v, h, r, CD, RHO)
+
+    assert np.allclose(np.array([list(f) for f in scalar()]).T, batched())
+
+    scalar_s = timeit.timeit(scalar, number=3) / 3
+    batched_s = timeit.timeit(batched, number=100) / 100
+    print(f"{'path':<12}{'ms/tick':>10}{'ns/panel':>12}")
+    print(f"{'scalar':<12}{scalar_s*1e3:>10.2f}{scalar_s/PANELS*1e9:>12.1f}")
+    print(f"{'batched':<12}{batched_s*1e3:>10.3f}{batched_s/PANELS*1e9:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+'''
+Steps per simulated second for each integrator.
+
+Scenario: a submarine dives from rest with a heavy ballast tank, cruises at terminal velocity,
+blows the tank at half time and coasts back. The fixed step integrators are run at the largest power of two
+step that keeps the final position within TOLERANCE of a fine RK4 reference, RK45 picks its own steps.
+
+run from the repository root: python -m benchmarks.integrators
+'''
+from __future__ import annotations
+import importlib
+import time
+from integrators import Integrator, SemiImplicitEuler, VelocityVerlet, RK4, RK45
+
+sub3d = importlib.import_module('3d')
+
+DURATION: float = 120.0 # simulated seconds
+BLOW_AT: float = 60.0
+THRUST: float = 2e4
+TOLERANCE: float = 1e-2 # metres of final position error
+
+def _simulate(integrator: Integrator, dt: float) -> sub3d.Submarine:
+    sub = sub3d.Submarine(integrator=integrator)
+    sub.ballast_tanks = [sub3d.BallastTank(rho=1100.0)]
+    t = 0.0
+    while t < DURATION - 1e-9:
+        if t >= BLOW_AT:
+            sub.ballast_tanks[0].rho = sub3d.RHO_AIR
+        h = min(dt, DURATION - t, BLOW_AT - t if t < BLOW_AT else DURATION)
+        sub.tick(THRUST, h)
+        t += h
+    return sub
+
+def _error(sub: sub3d.Submarine, reference: sub3d.Submarine) -> float:
+    return max(abs(sub.xs - reference.xs), abs(sub.ys - reference.ys), abs(sub.zs - reference.zs))
+
+def main():
+    reference = _simulate(RK4(), 2**-8)
+
+    print(f"{'integrator':<20}{'dt':>10}{'steps/sim s':>14}{'error m':>12}{'wall ms':>10}")
+    for name, make in (('semi-implicit euler', SemiImplicitEuler), ('velocity verlet', VelocityVerlet), ('rk4', RK4)):
+        dt = 8.0
+        while dt > 2**-12:
+            integrator = make()
+            start = time.perf_counter()
+            try:
+                sub = _simulate(integrator, dt)
+                error = _error(sub, reference)
+            except (OverflowError, ValueError): # quadratic drag makes large explicit steps diverge
+                error = float('inf')
+            wall = time.perf_counter() - start
+            if error < TOLERANCE:
+                break
+            dt /= 2
+        print(f'{name:<20}{dt:>10.4g}{integrator.steps/DURATION:>14.1f}{error:>12.2e}{wall*1e3:>10.1f}')
+
+    integrator = RK45(rtol=1e-6, atol=1e-4)
+    start = time.perf_counter()
+    sub = _simulate(integrator, 10.0)
+    wall = time.perf_counter() - start
+    print(f"{'rk45 (adaptive)':<20}{'auto':>10}{integrator.steps/DURATION:>14.1f}{_error(sub, reference):>12.2e}{wall*1e3:>10.1f}")
+
+if __name__ == '__main__':
+    main()
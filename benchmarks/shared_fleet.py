@@ -0,0 +1,47 @@
+'''
+Scaling of SharedFleet from 1 to N worker processes on one large fleet.
+
+efficiency = speedup / workers, against the single process Fleet.tick on the same fleet.
+
+run from the repository root: python -m benchmarks.shared_fleet [submarines] [max workers]
+'''
+from __future__ import annotations
+import multiprocessing
+import sys
+import time
+from fleet import Fleet, _random_submarines
+from integrators import RK4
+from sharedfleet import SharedFleet
+
+TICKS: int = 50
+THRUST: float = 2.0
+DT: float = 0.01
+
+def main(n: int = 200_000, max_workers: int | None = None):
+    subs = _random_submarines(1000)
+    fleet = Fleet(subs*(n // len(subs)))
+    max_workers = max_workers or multiprocessing.cpu_count()
+
+    integrator = RK4()
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        fleet.tick(THRUST, DT, integrator)
+    serial = (time.perf_counter() - start) / TICKS
+
+    print(f'{len(fleet)} submarines, {multiprocessing.cpu_count()} cores')
+    print(f"{'workers':<10}{'ms/tick':>10}{'speedup':>10}{'efficiency':>12}")
+    print(f"{'serial':<10}{serial*1e3:>10.2f}{1.0:>10.2f}{'':>12}")
+    workers = 1
+    while workers <= max_workers:
+        with SharedFleet(fleet, workers, THRUST, DT, 'rk4') as shared:
+            shared.tick() # warm up
+            start = time.perf_counter()
+            for _ in range(TICKS):
+                shared.tick()
+            elapsed = (time.perf_counter() - start) / TICKS
+        speedup = serial / elapsed
+        print(f'{workers:<10}{elapsed*1e3:>10.2f}{speedup:>10.2f}{speedup/workers:>12.2f}')
+        workers *= 2
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:3]))
@@ -0,0 +1,275 @@
+'''
+The benchmark suite: hot path microbenchmarks and whole tick macrobenchmarks, with a history and a budget.
+
+Every run appends one JSON line per run to the history file (time, commit, host, seconds per operation for
+each benchmark, and which of them were over budget). Each result is then compared with the best of the last
+BASELINE_RUNS passing runs on the same host, so a regression never becomes the baseline, and the suite exits non-zero if any benchmark is slower than that by more than its budget (budget.toml).
+
+run from the repository root:
+    python -m benchmarks.suite                  # everything, recorded
+    python -m benchmarks.suite -k fleet --quick # a subset with fewer repeats
+    python -m benchmarks.suite --no-record      # compare only
+'''
+from __future__ import annotations
+from typing import Any, Callable
+import argparse
+import contextlib
+import datetime
+import fnmatch
+import importlib
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import timeit
+import tomllib
+import numpy as np
+from fleet import Fleet, _random_submarines
+from integrators import RK4
+from polytope import MassPolygon
+from vec import VecXZ, VecXYZ
+import vec
+import drag
+
+sub3d = importlib.import_module('3d')
+
+HERE: str = os.path.dirname(os.path.abspath(__file__))
+HISTORY: str = os.path.join(HERE, 'history.jsonl')
+BUDGET: str = os.path.join(HERE, 'budget.toml')
+BASELINE_RUNS: int = 5
+FLEET_SIZES: tuple[int,...] = (1, 10, 100, 1_000, 10_000, 100_000)
+
+# name -> a function returning a callable to time (one operation per call)
+BENCHMARKS: dict[str,Callable[[], Callable[[], Any]]] = {}
+
+def benchmark(name: str):
+    def register(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+# === micro ===
+
+@benchmark('vec.add')
+def _vec_add():
+    a, b = VecXYZ(1.0, 2.0, 3.0), VecXYZ(4.0, 5.0, 6.0)
+    return lambda: a + b
+
+@benchmark('vec.iadd_scaled') # Polytope.apply_force: v += f / mass
+def _vec_iadd_scaled():
+    v, f = VecXZ(1.0, 2.0), VecXZ(3.0, 4.0)
+    def op():
+        nonlocal v
+        v += f / 7.0
+    return op
+
+def _buoyancy_chain(fused: bool) -> Callable[[], Any]:
+    '''BuoyantPolygon.apply_buoyant_force into Polytope.apply_force for 100 bodies, v += -p*volume*g / mass'''
+    g = VecXZ(.0, 9.81)
+    bodies = [(VecXZ(1.0, 2.0), 1.0 + i/100, 900.0 + i) for i in range(100)]
+    def op():
+        with vec.lazy() if fused else contextlib.nullcontext():
+            for v, volume, mass in bodies:
+                v += -1025.0*volume*g / mass
+    return op
+
+@benchmark('vec.buoyancy_chain')
+def _vec_buoyancy_chain():
+    return _buoyancy_chain(False)
+
+@benchmark('vec.buoyancy_chain.lazy')
+def _vec_buoyancy_chain_lazy():
+    return _buoyancy_chain(True)
+
+@benchmark('vec.dot')
+def _vec_dot():
+    a, b = VecXYZ(1.0, 2.0, 3.0), VecXYZ(4.0, 5.0, 6.0)
+    return lambda: a * b
+
+@benchmark('vec.magnitude()') # renamed from vec.magnitude, which only looked the method up, so it starts a new baseline
+def _vec_magnitude():
+    a = VecXYZ(1.0, 2.0, 3.0)
+    return lambda: a.magnitude()
+
+@benchmark('mass_polygon.mass')
+def _mass_polygon_mass():
+    polygon = MassPolygon()
+    polygon.d, polygon.p = VecXZ(2.0, 3.0), 1.5
+    return lambda: polygon.mass
+
+@benchmark('control_surface.area')
+def _control_surface_area():
+    surface = sub3d.ControlSurface(1.0, 2.0, 0.1, 0.2, 0.3)
+    return lambda: surface.area(0.0, 0.4, 0.5)
+
+@benchmark('propeller.force')
+def _propeller_force():
+    propeller = sub3d.Propeller(0.0, math.pi, 0.0)
+    return lambda: propeller.force(0.0, 0.4, 0.5, 2e4)
+
+@benchmark('ballast_tank.force')
+def _ballast_tank_force():
+    tank = sub3d.BallastTank(10.0, 1100.0)
+    return lambda: tank.force(0.0, 0.0, 250.0)
+
+def _friction(table: str | None) -> Callable[[], Any]:
+    sub = sub3d.Submarine(ya=0.2)
+    sub.drag = table and drag.table(table)
+    return lambda: sub.friction_force(20.0, 2.0, 0.1, 0.5)
+
+@benchmark('submarine.friction_force') # the constant 3d.DRAG
+def _submarine_friction_force():
+    return _friction(None)
+
+@benchmark('submarine.friction_force.drag_table')
+def _submarine_friction_force_drag_table():
+    return _friction('cylinder')
+
+@benchmark('drag_table.cd[100000]')
+def _drag_table_cd():
+    rng = np.random.default_rng(0)
+    table, re, attack = drag.table('cylinder'), 10**rng.uniform(0.0, 9.0, 100_000), rng.uniform(-math.pi, math.pi, 100_000)
+    return lambda: table.cd(re, attack)
+
+@benchmark('force_plan.forces') # gravity and drag over a 64 part assembly
+def _force_plan_forces():
+    from polytope import PolygonGroup, Circle, Line
+    from resistance import ResistantCylinder
+    from vec import VecX, VecY
+    parts = []
+    for i in range(64):
+        part = MassPolygon()
+        part.d, part.p, part.s = VecXZ(1.0, 1.0), 1000.0, VecXZ(i - 32.0, 1.0)
+        parts.append(part)
+    hull = ResistantCylinder()
+    hull.cap, hull.line = Circle(), Line()
+    hull.cap._diameter = Line()
+    hull.cap._diameter.d, hull.line.d = VecX(5.0), VecX(100.0)
+    group = PolygonGroup(hull, *parts)
+    group.s, group.a, group.v = VecXZ(.0, 150.0), VecY(0.1), VecXZ(2.0, 0.5)
+    plan = group.plan
+    return lambda: plan.forces((.0, 150.0), 0.1, (2.0, 0.5))
+
+# === macro ===
+
+@benchmark('submarine.tick')
+def _submarine_tick():
+    sub = _random_submarines(1)[0]
+    integrator = RK4()
+    return lambda: sub.tick(2.0, 0.01, integrator)
+
+def _fleet_tick(n: int):
+    def setup():
+        subs = _random_submarines(min(n, 1000))
+        fleet = Fleet(subs*(n // len(subs)))
+        integrator = RK4()
+        return lambda: fleet.tick(2.0, 0.01, integrator)
+    return setup
+
+for _n in FLEET_SIZES:
+    benchmark(f'fleet.tick[{_n}]')(_fleet_tick(_n))
+
+@benchmark('fleet.parked[100000]') # 1% moving, the rest asleep
+def _fleet_tick_parked():
+    from fleet import _parked
+    fleet, thrust = _parked(100_000, 1_000, sleep_ticks=2)
+    integrator = RK4()
+    for _ in range(3): # until the parked ones sleep
+        fleet.tick(thrust, 0.01, integrator)
+    return lambda: fleet.tick(thrust, 0.01, integrator)
+
+@benchmark('headless.run') # submarine.run over the example scenario, per tick
+def _headless_run():
+    from submarine import load_scenario, run
+    scenario = load_scenario(os.path.join(HERE, '..', 'scenario.toml'))
+    scenario.ticks = 100
+    return lambda: run(scenario)
+
+PER_CALL_TICKS: dict[str,int] = {'headless.run': 100} # benchmarks that do several operations per call
+
+# === running ===
+
+def measure(op: Callable[[], Any], repeat: int = 5) -> float:
+    '''best seconds per call over repeat rounds, each long enough (~0.2 s) to swamp timer resolution'''
+    timer = timeit.Timer(op)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _baseline(history: str, host: str, names: list[str]) -> dict[str,float]:
+    '''the best result of each benchmark over the last BASELINE_RUNS passing runs on this host'''
+    if not os.path.exists(history):
+        return {}
+    with open(history) as f:
+        runs = [json.loads(line) for line in f if line.strip()]
+    runs = [run for run in runs if run.get('host') == host and not run.get('failed')][-BASELINE_RUNS:]
+    return {name: min(run['results'][name] for run in runs if name in run['results']) for name in names if any(name in run['results'] for run in runs)}
+
+def _budgets(path: str) -> tuple[float, dict[str,float]]:
+    if not os.path.exists(path):
+        return 0.10, {}
+    with open(path, 'rb') as f:
+        budget = tomllib.load(f)
+    return budget.get('default', 0.10), budget.get('benchmarks', {})
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog='benchmarks.suite', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('-k', '--filter', default='*', help='glob over benchmark names, e.g. "fleet.*"')
+    parser.add_argument('--quick', action='store_true', help='one round per benchmark instead of five')
+    parser.add_argument('--history', default=HISTORY)
+    parser.add_argument('--budget', default=BUDGET)
+    parser.add_argument('--no-record', action='store_true', help="compare against the history but don't append to it")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if fnmatch.fnmatch(name, args.filter) or args.filter in name]
+    host = platform.node()
+    baseline = _baseline(args.history, host, names)
+    default_budget, budgets = _budgets(args.budget)
+
+    results: dict[str,float] = {}
+    failed = []
+    print(f"{'benchmark':<24}{'per op':>12}{'baseline':>12}{'change':>10}{'budget':>8}")
+    for name in names:
+        seconds = measure(BENCHMARKS[name](), 1 if args.quick else 5) / PER_CALL_TICKS.get(name, 1)
+        results[name] = seconds
+        budget = budgets.get(name, default_budget)
+        line = f'{name:<24}{_format(seconds):>12}'
+        if name in baseline:
+            change = seconds / baseline[name] - 1
+            line += f'{_format(baseline[name]):>12}{change:>+10.1%}{budget:>8.0%}'
+            if change > budget:
+                failed.append(name)
+                line += '  REGRESSION'
+        print(line, flush=True)
+
+    if not args.no_record:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({
+                'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'commit': _commit(),
+                'host': host,
+                'python': platform.python_version(),
+                'results': results,
+                'failed': failed, # an over budget run is kept for the record but never becomes a baseline
+            }) + '\n')
+
+    if failed:
+        print(f"over budget: {', '.join(failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+def _format(seconds: float) -> str:
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds/scale:.2f} {unit}'
+    return f'{seconds/1e-9:.1f} ns'
+
+if __name__ == '__main__':
+    sys.exit(main())
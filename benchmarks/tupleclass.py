@@ -0,0 +1,58 @@
+'''
+TupleClass against namedtuple and plain (and slotted) dataclasses for a per-tick state record.
+
+run from the repository root: python -m benchmarks.tupleclass
+'''
+from __future__ import annotations
+from collections import namedtuple
+from dataclasses import dataclass, astuple
+import timeit
+from tupleclass import TupleClass
+
+NUMBER: int = 200_000
+
+class TickTuple(TupleClass):
+    t: float
+    xs: float
+    zs: float
+    xv: float
+    zv: float
+
+TickNamed = namedtuple('TickNamed', TickTuple._fields)
+
+@dataclass
+class TickData:
+    t: float
+    xs: float
+    zs: float
+    xv: float
+    zv: float
+
+@dataclass(slots=True)
+class TickSlots:
+    t: float
+    xs: float
+    zs: float
+    xv: float
+    zv: float
+
+def _unpack_dataclass(r):
+    t, xs, zs, xv, zv = r.t, r.xs, r.zs, r.xv, r.zv # dataclasses aren't iterable, astuple deep copies
+
+def main():
+    values = (1.0, 2.0, 3.0, 4.0, 5.0)
+    print(f"{'ns/op':<16}{'construct':>12}{'attribute':>12}{'index':>12}{'unpack':>12}{'setattr':>12}")
+    for name, cls in (('TupleClass', TickTuple), ('namedtuple', TickNamed), ('dataclass', TickData), ('dataclass slots', TickSlots)):
+        r = cls(*values)
+        indexable = isinstance(r, tuple)
+        timings = [
+            timeit.timeit(lambda: cls(*values), number=NUMBER),
+            timeit.timeit(lambda: r.zs, number=NUMBER),
+            timeit.timeit(lambda: r[2], number=NUMBER) if indexable else None,
+            timeit.timeit((lambda: tuple(r)) if indexable else (lambda: _unpack_dataclass(r)), number=NUMBER),
+            timeit.timeit(lambda: setattr(r, 'zs', 1.0), number=NUMBER) if cls is not TickNamed else None,
+        ]
+        print(f'{name:<16}' + ''.join(f"{'-' if s is None else f'{s/NUMBER*1e9:.0f}':>12}" for s in timings))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+'''
+Per-tick allocation microbenchmark for Vec.
+
+Compares the old list-rebuilding operators (reimplemented below for reference) against the array backed Vec,
+for the update done by Polytope.apply_force every tick: v += f / mass
+
+run from the repository root: python -m benchmarks.vec_alloc
+'''
+from __future__ import annotations
+import itertools
+import operator
+import timeit
+import tracemalloc
+from vec import VecXZ
+
+TICKS: int = 10_000
+
+class _ListVec:
+    '''the previous storage engine: every operator rebuilds a list through closures and starmap'''
+    def __init__(self, components: list):
+        self.components = components
+
+    def _expand(self, other) -> _ListVec:
+        return other if isinstance(other, _ListVec) else _ListVec([other]*len(self.components))
+
+    def __truediv__(self, k: float) -> _ListVec:
+        return _ListVec([*map(lambda x: x / k, self.components)])
+
+    def __iadd__(self, other) -> _ListVec:
+        other = self._expand(other)
+        self.components = [*itertools.starmap(operator.add, zip(self.components, other.components))]
+        return self
+
+def _tick_list(v: _ListVec, f: _ListVec, mass: float) -> _ListVec:
+    v += f / mass
+    return v
+
+def _tick_array(v: VecXZ, f: VecXZ, mass: float) -> VecXZ:
+    v += f / mass
+    return v
+
+_scratch: VecXZ = VecXZ(.0, .0) # holds f / mass, allocated once rather than every tick
+
+def _tick_array_inplace(v: VecXZ, f: VecXZ, mass: float) -> VecXZ:
+    '''the same v += f / mass, with the quotient written into _scratch'''
+    scratch = _scratch
+    scratch.components[:] = f.components
+    scratch /= mass
+    v += scratch
+    return v
+
+def _tick_noop(v, f, mass: float):
+    return v
+
+def _transient_bytes(tick, v, f, mass: float) -> float:
+    '''peak bytes allocated (and released again) within a single tick, averaged'''
+    tick(v, f, mass) # warm up
+    tracemalloc.start()
+    total = 0
+    for _ in range(TICKS):
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        tick(v, f, mass)
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - base
+    tracemalloc.stop()
+    return total / TICKS
+
+def main():
+    cases = [
+        ('no-op (measurement floor)', _tick_noop, lambda: VecXZ(.0, .0), VecXZ(1.0, 2.0)),
+        ('list rebuild (previous)', _tick_list, lambda: _ListVec([.0, .0]), _ListVec([1.0, 2.0])),
+        ('array v += f / m', _tick_array, lambda: VecXZ(.0, .0), VecXZ(1.0, 2.0)),
+        ('array in place, scratch', _tick_array_inplace, lambda: VecXZ(.0, .0), VecXZ(1.0, 2.0)),
+    ]
+    print(f"{'case':<26}{'transient B/tick':>18}{'us/tick':>10}")
+    for name, tick, make_v, f in cases:
+        v = make_v()
+        transient = _transient_bytes(tick, v, f, 3.0)
+        seconds = timeit.timeit(lambda: tick(v, f, 3.0), number=TICKS)
+        print(f'{name:<26}{transient:>18.1f}{seconds/TICKS*1e6:>10.3f}')
+
+if __name__ == '__main__':
+    main()
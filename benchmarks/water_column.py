@@ -0,0 +1,38 @@
+'''
+Water column lookups against the closed form linear density they replace (BallastTank._water_rho before profiles).
+
+run from the repository root: python -m benchmarks.water_column
+'''
+from __future__ import annotations
+import importlib
+import timeit
+import numpy as np
+from water import WaterColumn
+
+sub3d = importlib.import_module('3d')
+
+N: int = 1_000_000
+
+def _closed_form(depth):
+    return sub3d.RHO_SEAWATER_SURFACE + sub3d.BETA_SEAWATER*depth
+
+def main():
+    column = WaterColumn.linear(sub3d.RHO_SEAWATER_SURFACE, sub3d.BETA_SEAWATER)
+    rng = np.random.default_rng(0)
+    depths = rng.uniform(0, 10000, N)
+    depth = 1234.5
+
+    assert np.allclose(column.density(depths), _closed_form(depths))
+
+    number = 200_000
+    scalar_closed = timeit.timeit(lambda: _closed_form(depth), number=number) / number
+    scalar_table = timeit.timeit(lambda: column.density(depth), number=number) / number
+    batch_closed = timeit.timeit(lambda: _closed_form(depths), number=10) / 10
+    batch_table = timeit.timeit(lambda: column.density(depths), number=10) / 10
+
+    print(f"{'query':<28}{'closed form':>14}{'table':>14}")
+    print(f"{'scalar (ns/lookup)':<28}{scalar_closed*1e9:>14.1f}{scalar_table*1e9:>14.1f}")
+    print(f"{f'batch of {N} (ns/lookup)':<28}{batch_closed/N*1e9:>14.2f}{batch_table/N*1e9:>14.2f}")
+
+if __name__ == '__main__':
+    main()
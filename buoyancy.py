@@ -4,12 +4,16 @@ import abc
 from math import pi as PI, sqrt, sin, cos, atan2
 from vec import VecXZ, VecY, VecX
 from polytope import SizePolygon
+from water import WaterColumn
 
 class BuoyantPolygon(SizePolygon):
     @abc.abstractmethod 
-    def apply_buoyant_force(self, p: float, g: Union[VecXZ,float]):
+    def apply_buoyant_force(self, p: Union[float,WaterColumn], g: Union[VecXZ,float]):
+        '''Takes the fluid density, or a water column to look it up at the current depth'''
         if isinstance(g, (int, float)):
             g = VecXZ(.0, g)
+        if isinstance(p, WaterColumn):
+            p = p.density_at(self.s.z)
 
         # weight of displaced fluid 
         # use -g to flip the vector direction
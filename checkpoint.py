@@ -0,0 +1,205 @@
+'''
+Whole simulation checkpoints.
+
+A checkpoint is everything needed to continue a run bit for bit: the fleet block (every submarine, propeller,
+ballast tank and control surface), the 3d.py environment constants and water column, the integrator with its
+internal state, the random number generators, and the simulation time.
+
+File layout, little endian:
+
+    MAGIC, uint32 version, uint32 header length
+    JSON header: time, environment, integrator, rng states, and for every array its dtype, shape and offset
+    arrays, each starting on an ALIGN byte boundary
+
+Columns are stored by name, so a checkpoint loads into a fleet whose column layout has since grown.
+'''
+from __future__ import annotations
+from typing import Any, BinaryIO
+from dataclasses import dataclass, field
+import importlib
+import json
+import os
+import random
+import struct
+import numpy as np
+from fleet import Fleet
+from integrators import Integrator, INTEGRATORS
+from water import WaterColumn
+
+sub3d = importlib.import_module('3d')
+
+MAGIC: bytes = b'SUBCKPT\n'
+VERSION: int = 1
+ALIGN: int = 64
+
+# module level 3d.py settings that change the physics, WATER is stored separately as an array
+ENVIRONMENT: tuple[str,...] = ('G', 'DRAG', 'RHO_WATER', 'RHO_AIR', 'SURFACE_Z', 'AREA_QUANTUM')
+
+@dataclass
+class Checkpoint:
+    fleet: Fleet
+    tick: int = 0
+    t: float = 0.0
+    integrator: Integrator | None = None
+    rng: np.random.Generator | None = None # the run's own generator, python's random module is always included
+    environment: dict[str,Any] = field(default_factory=dict)
+
+# === writing ===
+
+def _integrator_state(integrator: Integrator | None) -> dict[str,Any] | None:
+    if integrator is None:
+        return None
+    name = next(key for key, cls in INTEGRATORS.items() if type(integrator) is cls)
+    return {'name': name, 'state': vars(integrator)}
+
+def _arrays(fleet: Fleet) -> dict[str,np.ndarray]:
+    '''the named arrays of a checkpoint, views where possible'''
+    arrays = {}
+    i = 0
+    for name, width in fleet._columns():
+        rows = width or 1
+        arrays[f'fleet/{name}'] = fleet.block[i:i + rows, :fleet.n]
+        i += rows
+    arrays['water'] = sub3d.WATER.table
+    return arrays
+
+def save(path: str, checkpoint: Checkpoint):
+    '''write atomically: a crash mid write leaves the previous checkpoint at path intact'''
+    fleet = checkpoint.fleet
+    arrays = _arrays(fleet)
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': '<f8', 'shape': array.shape, 'offset': offset}
+        offset += -(-array.size*8 // ALIGN)*ALIGN
+
+    header = json.dumps({
+        'tick': checkpoint.tick,
+        't': checkpoint.t,
+        'fleet': {'n': fleet.n, 'max_tanks': fleet.max_tanks, 'max_surfaces': fleet.max_surfaces},
+        'environment': {name: getattr(sub3d, name) for name in ENVIRONMENT},
+        'water': {'depth0': sub3d.WATER.depth0, 'step': sub3d.WATER.step, 'surface_z': sub3d.WATER.surface_z},
+        'integrator': _integrator_state(checkpoint.integrator),
+        'rng': {
+            'numpy': checkpoint.rng.bit_generator.state if checkpoint.rng is not None else None,
+            'random': random.getstate(),
+        },
+        'arrays': layout,
+    }).encode()
+    header += b' '*(-(len(MAGIC) + 8 + len(header)) % ALIGN)
+
+    temp = f'{path}.tmp'
+    with open(temp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<II', VERSION, len(header)) + header)
+        start = f.tell()
+        for name, array in arrays.items():
+            f.seek(start + layout[name]['offset'])
+            for row in array.reshape(-1, array.shape[-1]) if array.ndim > 1 else (array,):
+                np.ascontiguousarray(row, dtype='<f8').tofile(f) # rows of the block are contiguous, no copy
+        f.truncate(start + offset)
+    os.replace(temp, path)
+
+# === reading ===
+
+def _read_header(f: BinaryIO) -> tuple[dict[str,Any], int]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f'{getattr(f, "name", f)} is not a checkpoint')
+    version, length = struct.unpack('<II', f.read(8))
+    if version > VERSION:
+        raise ValueError(f'checkpoint version {version} is newer than this reader ({VERSION})')
+    return json.loads(f.read(length)), len(MAGIC) + 8 + length
+
+def _tuples(state: Any) -> Any:
+    '''random.setstate wants the nested tuples JSON turned into lists back'''
+    return tuple(_tuples(x) for x in state) if isinstance(state, list) else state
+
+def load(path: str, environment: bool = True) -> Checkpoint:
+    '''
+    read a checkpoint. with environment the 3d.py constants, the water column and python's random state are
+    restored too, otherwise they're only returned in Checkpoint.environment
+    '''
+    with open(path, 'rb') as f:
+        header, start = _read_header(f)
+    data = np.memmap(path, dtype='<f8', mode='r', offset=start) if os.path.getsize(path) > start else np.zeros(0)
+
+    def array(name: str) -> np.ndarray:
+        meta = header['arrays'][name]
+        offset = meta['offset'] // 8
+        size = int(np.prod(meta['shape']))
+        return data[offset:offset + size].reshape(meta['shape'])
+
+    layout = header['fleet']
+    fleet = Fleet(capacity=max(layout['n'], 1), max_tanks=layout['max_tanks'], max_surfaces=layout['max_surfaces'])
+    fleet.n = layout['n']
+    for name, _ in fleet._columns():
+        key = f'fleet/{name}'
+        if key in header['arrays']: # columns added since the checkpoint was written stay zero
+            saved = array(key)
+            fleet.column(name)[...] = saved[0] if saved.shape[0] == 1 and fleet.column(name).ndim == 1 else saved
+
+    integrator = None
+    if header['integrator'] is not None:
+        cls = INTEGRATORS[header['integrator']['name']]
+        integrator = cls.__new__(cls)
+        integrator.__dict__.update(header['integrator']['state'])
+
+    rng = None
+    if header['rng']['numpy'] is not None:
+        state = header['rng']['numpy']
+        rng = np.random.Generator(getattr(np.random, state['bit_generator'])())
+        rng.bit_generator.state = state
+
+    env = dict(header['environment'])
+    water = WaterColumn(header['water']['depth0'], header['water']['step'], np.array(array('water')), header['water']['surface_z'])
+    env['WATER'] = water
+    if environment:
+        for name, value in env.items():
+            setattr(sub3d, name, value)
+        random.setstate(_tuples(header['rng']['random']))
+
+    return Checkpoint(fleet, header['tick'], header['t'], integrator, rng, env)
+
+def _test_roundtrip():
+    import tempfile
+    from fleet import _random_submarines
+    from integrators import RK45
+
+    path = os.path.join(tempfile.mkdtemp(), 'run.ckpt')
+    fleet = Fleet(_random_submarines(20, seed=3))
+    integrator = RK45()
+    rng = np.random.default_rng(7)
+    for _ in range(10):
+        fleet.tick(2e4, 0.5, integrator)
+
+    save(path, Checkpoint(fleet, 10, 5.0, integrator, rng))
+    python_next = random.random()
+    numpy_next = rng.random()
+    restored = load(path)
+    assert random.random() == python_next and restored.rng.random() == numpy_next
+    assert (restored.tick, restored.t) == (10, 5.0)
+    assert np.array_equal(restored.fleet.block[:, :20], fleet.block[:, :20])
+    assert restored.integrator.h == integrator.h
+
+    # forking: both continue identically
+    for _ in range(10):
+        fleet.tick(2e4, 0.5, integrator)
+        restored.fleet.tick(2e4, 0.5, restored.integrator)
+    assert np.array_equal(restored.fleet.block[:, :20], fleet.block[:, :20])
+
+def _test_instances_dont_share_components():
+    a, b = sub3d.Submarine(), sub3d.Submarine()
+    a.ballast_tanks[0].rho = 1100.0
+    a.surfaces.append(sub3d.ControlSurface(1, 1, 0, 0, 0))
+    assert b.ballast_tanks[0].rho == sub3d.RHO_SEAWATER_SURFACE and b.surfaces == []
+    assert a.propeller is not b.propeller
+
+def test():
+    _test_roundtrip()
+    _test_instances_dont_share_components()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
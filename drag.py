@@ -0,0 +1,247 @@
+'''
+Drag coefficients by Reynolds number and angle of attack, per hull shape.
+
+A constant cd is only right over a narrow band of speeds and sizes: a cylinder across the flow goes from
+cd ~10 when creeping, through ~1.2, down to ~0.3 past the drag crisis. A DragTable keeps cd on a uniform grid
+of log10(Re) and angle of attack, so like a WaterColumn a query is an O(1) index computation plus a bilinear
+interpolation, for a single body or whole arrays of them. Queries outside the grid clamp to its edges.
+
+    table = drag.table('cylinder')
+    table.cd(reynolds(rho, speed, diameter), attack)  # floats or arrays
+
+The angle of attack is between the flow and the body's axis, 0 along it and pi/2 across it, and may be given
+unfolded (the tables are symmetric). The built in tables are generated once from reference curves, blended
+between the flow along the axis and across it as cd = axial*cos^2 + normal*sin^2. Measured tables load from .csv.
+'''
+from __future__ import annotations
+from typing import Union
+from collections.abc import Callable
+from math import pi as PI, log10
+import csv
+import functools
+import numpy as np
+from water import _average_repeats
+
+Scalars = Union[float, np.ndarray]
+
+VISCOSITY: float = 1.08e-3 # dynamic viscosity of seawater around 15C, Pa s
+LOG_RE: tuple[float,float] = (-1.0, 9.0) # the built in tables' Reynolds number range, log10
+LOG_RE_STEP: float = 0.05
+ATTACK_STEP: float = PI/36 # 5 degrees
+TRANSITION_RE: float = 5e5 # laminar to turbulent skin friction
+FORM_DRAG: float = 0.02 # pressure drag of a streamlined nose and tail, per frontal area
+FINENESS: float = 20.0 # length over diameter of the default cylinder, the scenario hulls are 100 x 5
+
+# (log10 Re, cd) reference curves, the usual textbook plots
+CYLINDER_CROSSFLOW: tuple[tuple[float,float],...] = (
+    (-1.0, 58.0), (0.0, 10.0), (1.0, 2.8), (2.0, 1.45), (3.0, 1.0), (4.0, 1.15), (5.0, 1.2), (5.3, 1.2),
+    (5.5, 0.7), (5.7, 0.3), (6.0, 0.35), (6.5, 0.6), (7.0, 0.7), (9.0, 0.7),
+)
+SPHERE: tuple[tuple[float,float],...] = (
+    (-1.0, 240.0), (0.0, 27.0), (1.0, 4.2), (2.0, 1.1), (3.0, 0.47), (4.0, 0.41), (5.0, 0.47), (5.3, 0.45),
+    (5.5, 0.2), (5.6, 0.08), (6.0, 0.13), (6.5, 0.18), (7.0, 0.2), (9.0, 0.2),
+)
+PLATE_NORMAL: tuple[tuple[float,float],...] = (
+    (-1.0, 90.0), (0.0, 15.0), (1.0, 4.0), (2.0, 2.3), (3.0, 2.0), (4.0, 1.98), (9.0, 1.98),
+)
+
+def reynolds(rho: Scalars, speed: Scalars, length: Scalars, viscosity: float = VISCOSITY) -> Scalars:
+    return rho*speed*length/viscosity
+
+def skin_friction(re: np.ndarray) -> np.ndarray:
+    '''one side of a flat plate: Blasius while laminar, the ITTC 1957 line once turbulent'''
+    re = np.maximum(re, 1e-9)
+    return np.where(re < TRANSITION_RE, 1.328/np.sqrt(re), 0.075/(np.log10(np.maximum(re, TRANSITION_RE)) - 2)**2)
+
+def _curve(points: tuple[tuple[float,float],...]) -> Callable[[np.ndarray], np.ndarray]:
+    '''cd against Re from a reference curve, interpolated in log-log'''
+    log_re, log_cd = np.array(points).T
+    log_cd = np.log10(log_cd)
+    return lambda re: 10**np.interp(np.log10(re), log_re, log_cd)
+
+class DragTable:
+    name: str # a built in table or the file it was loaded from, enough to find it again, see table()
+    log_re0: float # log10 Re of the first grid row
+    log_re_step: float
+    attack_step: float # radians between grid columns, starting from 0
+    grid: np.ndarray # Re rows x attack columns of cd
+
+    def __init__(self, log_re0: float, log_re_step: float, attack_step: float, grid: np.ndarray, name: str = ''):
+        if grid.ndim != 2 or min(grid.shape) < 2:
+            raise ValueError(f'expected an Re x attack (both >= 2) grid, got {grid.shape}')
+        self.log_re0, self.log_re_step, self.attack_step, self.grid, self.name = log_re0, log_re_step, attack_step, grid, name
+        self._inv_re_step, self._inv_attack_step = 1.0 / log_re_step, 1.0 / attack_step
+        self._last_re, self._last_attack = grid.shape[0] - 1, grid.shape[1] - 1
+        self._rows = grid.tolist() # indexing lists is several times cheaper than an ndarray for the scalar path
+        self._flat = np.ascontiguousarray(grid).ravel()
+
+    # === construction ===
+
+    @classmethod
+    def blend(cls, axial: Callable[[np.ndarray], np.ndarray], normal: Callable[[np.ndarray], np.ndarray], name: str = '') -> DragTable:
+        '''tabulate axial*cos^2 + normal*sin^2 of the attack, both functions of an array of Re'''
+        re = 10**np.arange(LOG_RE[0], LOG_RE[1] + LOG_RE_STEP/2, LOG_RE_STEP)
+        attack = np.arange(0.0, PI/2 + ATTACK_STEP/2, ATTACK_STEP)
+        across = np.sin(attack)**2
+        grid = axial(re)[:, None]*(1 - across) + normal(re)[:, None]*across
+        return cls(LOG_RE[0], LOG_RE_STEP, ATTACK_STEP, grid, name)
+
+    @classmethod
+    def load(cls, path: str) -> DragTable:
+        '''
+        a .csv with a reynolds column followed by one column per angle of attack in degrees (0 to 90), e.g.
+        reynolds,0,45,90. rows and columns may be irregular, they are resampled onto a uniform grid as fine as
+        their smallest gaps
+        '''
+        with open(path, newline='') as f:
+            header, *rows = list(csv.reader(f))
+        data = np.array(rows, dtype=float)
+        log_re, grid = _average_repeats(np.log10(data[:, 0]), data[:, 1:].T) # repeated rows and columns are averaged
+        attack, grid = _average_repeats(np.radians(np.array(header[1:], dtype=float)), grid.T)
+        if min(len(log_re), len(attack)) < 2:
+            raise ValueError(f'expected two or more distinct Re and angles of attack in {path}')
+
+        re_step, attack_step = float(np.min(np.diff(log_re))), float(np.min(np.diff(attack)))
+        log_re_grid = np.arange(log_re[0], log_re[-1] + re_step/2, re_step)
+        attack_grid = np.arange(0.0, attack[-1] + attack_step/2, attack_step)
+        grid = np.stack([np.interp(log_re_grid, log_re, column) for column in grid.T], axis=1)
+        grid = np.stack([np.interp(attack_grid, attack, row) for row in grid])
+        return cls(float(log_re_grid[0]), re_step, attack_step, grid, path)
+
+    def save(self, path: str):
+        re = 10**(self.log_re0 + self.log_re_step*np.arange(self.grid.shape[0]))
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['reynolds', *(repr(float(a)) for a in np.degrees(self.attack_step*np.arange(self.grid.shape[1])))])
+            writer.writerows([repr(float(r)), *map(repr, row)] for r, row in zip(re, self.grid.tolist()))
+
+    # === queries ===
+
+    def cd_at(self, reynolds: float, attack: float) -> float:
+        '''cd at one point, skipping cd's type checks for the per-tick scalar callers'''
+        x = (log10(reynolds) - self.log_re0)*self._inv_re_step if reynolds > 0.0 else 0.0
+        i = int(x) if x > 0.0 else 0
+        if i >= self._last_re:
+            i, x = self._last_re - 1, self._last_re
+        x = x - i if x > 0.0 else 0.0
+        attack = abs(attack) % PI
+        y = (attack if attack < PI/2 else PI - attack)*self._inv_attack_step
+        j = int(y)
+        if j >= self._last_attack:
+            j, y = self._last_attack - 1, self._last_attack
+        y -= j
+        r0, r1 = self._rows[i], self._rows[i + 1]
+        c0 = r0[j] + (r0[j + 1] - r0[j])*y
+        c1 = r1[j] + (r1[j + 1] - r1[j])*y
+        return c0 + (c1 - c0)*x
+
+    def cd(self, reynolds: Scalars, attack: Scalars = 0.0) -> Scalars:
+        if isinstance(reynolds, (int, float)) and isinstance(attack, (int, float)):
+            return self.cd_at(reynolds, attack)
+        x = (np.log10(np.maximum(np.atleast_1d(reynolds), 1e-300)) - self.log_re0)*self._inv_re_step
+        np.clip(x, 0.0, self._last_re, out=x)
+        i = x.astype(np.intp)
+        np.minimum(i, self._last_re - 1, out=i)
+        x -= i
+        y = np.abs(np.atleast_1d(attack)) % PI
+        y = np.minimum(y, PI - y)*self._inv_attack_step
+        np.minimum(y, self._last_attack, out=y)
+        j = y.astype(np.intp)
+        np.minimum(j, self._last_attack - 1, out=j)
+        y -= j
+        flat, cols = self._flat, self._last_attack + 1
+        k = i*cols + j # flat indices gather faster than 2d ones
+        c00, c01, c10, c11 = flat.take(k), flat.take(k + 1), flat.take(k + cols), flat.take(k + cols + 1)
+        c0 = c00 + (c01 - c00)*y
+        c1 = c10 + (c11 - c10)*y
+        c1 -= c0
+        c1 *= x
+        c1 += c0
+        return c1
+
+# === built in tables, Re on each shape's drag_length ===
+
+def line() -> DragTable:
+    '''a flat plate of its length: skin friction on both sides along it, a bluff plate across it'''
+    return DragTable.blend(lambda re: 2*skin_friction(re), _curve(PLATE_NORMAL), 'line')
+
+def circle() -> DragTable:
+    '''a sphere of its diameter, the same from every side'''
+    sphere = _curve(SPHERE)
+    return DragTable.blend(sphere, sphere, 'circle')
+
+def cylinder(fineness: float = FINENESS) -> DragTable:
+    '''
+    a streamlined hull of its diameter: along it form drag plus the skin friction over a wetted area 4*fineness
+    times the frontal one (at the Reynolds number of its length), across it a cylinder in cross flow
+    '''
+    return DragTable.blend(lambda re: FORM_DRAG + 4*fineness*skin_friction(re*fineness), _curve(CYLINDER_CROSSFLOW), 'cylinder')
+
+TABLES: dict[str,Callable[[], DragTable]] = {'line': line, 'circle': circle, 'cylinder': cylinder}
+
+@functools.cache
+def table(name: str) -> DragTable:
+    '''a built in table by name, generated on first use, or a .csv loaded once'''
+    return TABLES[name]() if name in TABLES else DragTable.load(name)
+
+def _test_lookup():
+    hull = table('cylinder')
+    assert table('cylinder') is hull
+    assert 0.14 < hull.cd(reynolds(1025.0, 5.0, 5.0)) < 0.16 # about 3d.DRAG where the scenario hulls cruise
+    assert hull.cd(1e6, PI/2) < hull.cd(1e5, PI/2) # the drag crisis
+    assert hull.cd(1e6, -0.3) == hull.cd(1e6, 0.3) and abs(hull.cd(1e6, PI - 0.3) - hull.cd(1e6, 0.3)) < 1e-12 # symmetric
+    assert hull.cd(1e-5) == hull.cd(10**LOG_RE[0]) and hull.cd(1e12) == hull.cd(10**LOG_RE[1]) # clamped
+
+    # on the grid points the table is exact, in between bilinear
+    i, j = 100, 4
+    re, attack = 10**(hull.log_re0 + i*hull.log_re_step), j*hull.attack_step
+    assert abs(hull.cd(re, attack) - hull.grid[i, j]) < 1e-9
+    mid = hull.cd(10**(hull.log_re0 + (i + 0.5)*hull.log_re_step), (j + 0.5)*hull.attack_step)
+    assert abs(mid - hull.grid[i:i + 2, j:j + 2].mean()) < 1e-9
+
+    # batches agree with the scalar path
+    rng = np.random.default_rng(0)
+    res, attacks = 10**rng.uniform(-2.0, 10.0, 1000), rng.uniform(-4.0, 4.0, 1000)
+    cds = hull.cd(res, attacks)
+    assert cds.shape == (1000,) and np.allclose(cds, [hull.cd(float(r), float(a)) for r, a in zip(res, attacks)], rtol=1e-12)
+    assert np.allclose(table('circle').cd(1e4, attacks), table('circle').cd(1e4)) # a sphere has no attack
+
+def _test_load():
+    import os
+    import tempfile
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'hull.csv')
+        table('line').save(path)
+        loaded = DragTable.load(path)
+        assert loaded.grid.shape == table('line').grid.shape and np.allclose(loaded.grid, table('line').grid)
+        assert abs(loaded.cd(3e4, 0.2) - table('line').cd(3e4, 0.2)) < 1e-9
+
+        with open(path, 'w') as f: # irregular, resampled
+            f.write('reynolds,0,30,90\n1,2.0,2.0,2.0\n100,1.0,1.5,2.0\n1000,0.5,1.0,1.5\n')
+        loaded = DragTable.load(path)
+        assert (loaded.log_re_step, loaded.grid.shape) == (1.0, (4, 4)) and loaded.name == path
+        assert loaded.cd(100.0, PI/12) == 1.25 and loaded.cd(10.0, PI/2) == 2.0
+
+        with open(path, 'w') as f: # repeated Re and angles, averaged
+            f.write('reynolds,0,90,90\n1,2.0,1.0,3.0\n100,1.0,2.0,2.0\n100,0.0,1.0,1.0\n')
+        loaded = DragTable.load(path)
+        assert loaded.grid.tolist() == [[2.0, 2.0], [0.5, 1.5]]
+
+        with open(path, 'w') as f:
+            f.write('reynolds,0,90\n10,1.0,1.0\n10,1.0,1.0\n')
+        try:
+            DragTable.load(path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError('expected a ValueError for a single Re')
+
+def test():
+    _test_lookup()
+    _test_load()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
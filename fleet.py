@@ -0,0 +1,556 @@
+'''
+Struct-of-arrays engine for many 3d.py submarines.
+
+Every submarine is a row: its state, hull geometry, propeller angles, ballast tanks and control surfaces live in
+contiguous float64 columns, and Fleet.tick advances all rows at once with the same friction, thrust and buoyancy
+terms as Submarine.tick. Fleet[i] hands back a Submarine whose attributes read and write that row.
+
+With sleep_ticks set, a submarine whose speed and acceleration stay under sleep_speed and sleep_acceleration for
+that many ticks is put to sleep: its velocity is zeroed and ticks skip it, so a mostly parked fleet costs about
+as much as its moving part. It wakes up when its thrust changes, when anything is written through its view (a
+ballast tank, its attitude, ...), or on apply_force and wake(). Write columns directly and call wake() yourself.
+'''
+from __future__ import annotations
+from typing import Union
+from collections.abc import Sequence, Iterator
+import importlib
+from math import pi as PI
+import numpy as np
+from integrators import Integrator, RK4
+from drag import DragTable, reynolds
+
+sub3d = importlib.import_module('3d') # the module name isn't a valid identifier
+
+# per submarine scalar columns, in block order
+STATE: tuple[str,...] = ('xs', 'ys', 'zs', 'xv', 'yv', 'zv', 'xa', 'ya', 'za')
+HULL: tuple[str,...] = ('length', 'diameter', 'density', 'mass')
+PROPELLER: tuple[str,...] = ('propeller_xa', 'propeller_ya', 'propeller_za')
+COUNTS: tuple[str,...] = ('tank_count', 'surface_count')
+SLEEP: tuple[str,...] = ('still',) # ticks spent below the sleep thresholds, asleep from sleep_ticks on
+
+SLEEP_SETTINGS: tuple[str,...] = ('sleep_ticks', 'sleep_speed', 'sleep_acceleration') # Fleet attributes
+SLEEP_SPEED: float = 1e-3 # m/s
+SLEEP_ACCELERATION: float = 1e-4 # m/s^2
+
+# per component columns, shaped (components, capacity)
+TANK: tuple[str,...] = ('tank_vol', 'tank_rho')
+SURFACE: tuple[str,...] = ('surface_width', 'surface_height', 'surface_xa', 'surface_ya', 'surface_za')
+
+class Fleet:
+    '''
+    All columns are views into one (columns x capacity) float64 block, so the whole fleet is a single buffer.
+    Rows beyond a submarine's own tank/surface count are zero filled, which makes them contribute no force or area.
+    '''
+    n: int # number of submarines in use
+    capacity: int
+    max_tanks: int
+    max_surfaces: int
+    block: np.ndarray
+    forces: np.ndarray # len(FORCES) x capacity, from the latest acceleration evaluation
+    sleep_ticks: int = 0 # quiet ticks before a submarine sleeps, 0 never sleeps
+    sleep_speed: float = SLEEP_SPEED
+    sleep_acceleration: float = SLEEP_ACCELERATION
+    drag: DragTable | None = None # cd by Reynolds number and angle of attack like Submarine.drag, None keeps 3d.DRAG. one for the whole fleet
+    _external: bool = False # the block belongs to someone else (see over), so it can't be reallocated
+    _thrust: Union[float,np.ndarray,None] = None # of the latest tick, a change wakes everyone it reaches
+
+    def __init__(self, submarines: Sequence[sub3d.Submarine] = (), capacity: int = 16, max_tanks: int = 1, max_surfaces: int = 0):
+        self.n = 0
+        self._allocate(max(capacity, len(submarines)), max_tanks, max_surfaces)
+        for sub in submarines:
+            self.add(sub)
+
+    @classmethod
+    def from_block(cls, block: np.ndarray, max_tanks: int, max_surfaces: int) -> Fleet:
+        '''a fleet holding a copy of a (rows x n) block laid out like Fleet.block, e.g. a saved keyframe'''
+        n = block.shape[1]
+        fleet = cls(capacity=max(n, 1), max_tanks=max_tanks, max_surfaces=max_surfaces)
+        if block.shape[0] != fleet.block.shape[0]:
+            raise ValueError(f'expected {fleet.block.shape[0]} rows for {max_tanks} tanks and {max_surfaces} surfaces, got {block.shape[0]}')
+        fleet.block[:, :n] = block
+        fleet.n = n
+        return fleet
+
+    @classmethod
+    def over(cls, block: np.ndarray, max_tanks: int, max_surfaces: int, n: int | None = None) -> Fleet:
+        '''
+        a fleet whose columns are views into block, nothing is copied: shared memory, a mapped file, or a column
+        slice block[:, lo:hi] of another fleet. it ticks in place, but can't grow beyond the block
+        '''
+        fleet = cls.__new__(cls)
+        fleet.n = block.shape[1] if n is None else n
+        fleet.capacity, fleet.max_tanks, fleet.max_surfaces = block.shape[1], max_tanks, max_surfaces
+        if block.shape[0] != fleet._rows():
+            raise ValueError(f'expected {fleet._rows()} rows for {max_tanks} tanks and {max_surfaces} surfaces, got {block.shape[0]}')
+        fleet.block = block
+        fleet._bind(block)
+        fleet.forces = np.zeros((len(sub3d.FORCES), fleet.capacity))
+        fleet._external = True
+        return fleet
+
+    # === layout ===
+
+    def _columns(self) -> Iterator[tuple[str,int]]:
+        for name in STATE + HULL + PROPELLER + COUNTS + SLEEP:
+            yield name, None
+        for name in TANK:
+            yield name, self.max_tanks
+        for name in SURFACE:
+            yield name, self.max_surfaces
+
+    def _rows(self) -> int:
+        return sum(1 if width is None else width for _, width in self._columns())
+
+    def _allocate(self, capacity: int, max_tanks: int, max_surfaces: int):
+        '''(re)build the block and rebind every column view, keeping the existing rows'''
+        if self._external:
+            raise ValueError(f'a fleet over an external block is full at {self.capacity} submarines, {self.max_tanks} tanks and {self.max_surfaces} surfaces')
+        old = {name: getattr(self, name) for name, _ in self._columns()} if hasattr(self, 'block') else {}
+
+        self.capacity, self.max_tanks, self.max_surfaces = capacity, max_tanks, max_surfaces
+        self.block = np.zeros((self._rows(), capacity))
+        self._bind(self.block)
+        self.forces = np.zeros((len(sub3d.FORCES), capacity)) # written by acceleration, like Submarine.forces
+
+        for name, column in old.items():
+            new = getattr(self, name)
+            if column.ndim == 1:
+                new[:self.n] = column[:self.n]
+            else:
+                new[:column.shape[0], :self.n] = column[:, :self.n]
+
+    def _bind(self, block: np.ndarray):
+        i = 0
+        for name, width in self._columns():
+            if width is None:
+                setattr(self, name, block[i])
+                i += 1
+            else:
+                setattr(self, name, block[i:i + width])
+                i += width
+
+    # === rows ===
+
+    def add(self, sub: sub3d.Submarine) -> SubmarineView:
+        '''
+        copy a Submarine into a new row and return the view onto that row. the drag table is the fleet's, the first
+        submarine's is taken over and any later one must have the same
+        '''
+        if sub.drag is not self.drag:
+            if self.n:
+                name = lambda table: repr(table.name) if table is not None else 'the constant 3d.DRAG'
+                raise ValueError(f'a fleet has one drag table for all its submarines, {name(self.drag)}, this submarine has {name(sub.drag)}')
+            self.drag = sub.drag
+        tanks, surfaces = len(sub.ballast_tanks), len(sub.surfaces)
+        if self.n == self.capacity or tanks > self.max_tanks or surfaces > self.max_surfaces:
+            capacity = max(2*self.capacity, 1) if self.n == self.capacity else self.capacity
+            self._allocate(capacity, max(tanks, self.max_tanks), max(surfaces, self.max_surfaces))
+
+        i = self.n
+        self.n += 1
+        for name in STATE + HULL:
+            getattr(self, name)[i] = getattr(sub, name)
+        self.propeller_xa[i], self.propeller_ya[i], self.propeller_za[i] = sub.propeller.xa, sub.propeller.ya, sub.propeller.za
+        self.tank_count[i], self.surface_count[i] = tanks, surfaces
+        for k, tank in enumerate(sub.ballast_tanks):
+            self.tank_vol[k, i], self.tank_rho[k, i] = tank.vol, tank.rho
+        for k, surface in enumerate(sub.surfaces):
+            self.surface_width[k, i], self.surface_height[k, i] = surface.width, surface.height
+            self.surface_xa[k, i], self.surface_ya[k, i], self.surface_za[k, i] = surface.xa, surface.ya, surface.za
+        return SubmarineView(self, i)
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, i: int) -> SubmarineView:
+        if not -self.n <= i < self.n:
+            raise IndexError(i)
+        return SubmarineView(self, i % self.n)
+
+    def __iter__(self) -> Iterator[SubmarineView]:
+        return (SubmarineView(self, i) for i in range(self.n))
+
+    def column(self, name: str) -> np.ndarray:
+        '''the in-use part of a column, as a view'''
+        return getattr(self, name)[..., :self.n]
+
+    # === physics ===
+
+    @property
+    def s(self) -> np.ndarray:
+        '''positions as a 3 x n view (xs, ys, zs are adjacent rows of the block)'''
+        return self.block[0:3, :self.n]
+
+    @property
+    def v(self) -> np.ndarray:
+        '''velocities as a 3 x n view'''
+        return self.block[3:6, :self.n]
+
+    def acceleration(self, thrust: Union[float,np.ndarray], s: np.ndarray, v: np.ndarray, rows: Union[slice,np.ndarray,None] = None) -> np.ndarray:
+        '''
+        vectorised Submarine.acceleration for every row, or only the given rows (s and v hold just those).
+        thrust may be one value or one per row
+        '''
+        r = slice(0, self.n) if rows is None else rows
+        xf_friction, yf_friction, zf_friction = self.friction_force(self.projected_area(r), v, r)
+        xf_thrust, yf_thrust, zf_thrust = self.thrust_force(thrust, r)
+        zf_buoyancy = self.buoyant_force(s[2], r)
+
+        forces = self.forces[:, r] # a view, unless rows picks an active subset
+        forces[0], forces[1], forces[2] = xf_thrust, yf_thrust, zf_thrust
+        forces[3], forces[4], forces[5] = 0.0, 0.0, zf_buoyancy
+        forces[6], forces[7], forces[8] = -xf_friction, -yf_friction, -zf_friction
+        if not isinstance(r, slice):
+            self.forces[:, r] = forces
+
+        mass = self.mass[r]
+        return np.stack((
+            (xf_thrust - xf_friction) / mass,
+            (yf_thrust - yf_friction) / mass,
+            (zf_thrust + zf_buoyancy - zf_friction) / mass,
+        ))
+
+    # the force terms of acceleration, separate methods so profiling can time each like Submarine's
+
+    def projected_area(self, r: Union[slice,np.ndarray]) -> np.ndarray:
+        '''hull face plus every control surface, see Submarine.projected_area'''
+        area = PI*(self.diameter[r]/2)**2
+        if self.max_surfaces:
+            ya, za = self.ya[r], self.za[r]
+            height, width = self.surface_height[:, r], self.surface_width[:, r]
+            h = np.sqrt(2*height**2 - 2*height**2*np.cos(ya + self.surface_ya[:, r]))
+            w = np.sqrt(2*width**2 - 2*width**2*np.cos(za + self.surface_za[:, r]))
+            area += (h*w).sum(axis=0)
+        return area
+
+    def friction_force(self, area: np.ndarray, v: np.ndarray, r: Union[slice,np.ndarray]) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+        xv, yv, zv = v
+        cd = sub3d.DRAG if self.drag is None else self._drag_coefficients(v, self.ya[r], self.za[r], self.diameter[r])
+        k = (sub3d.RHO_WATER*cd*area)/2
+        return k*xv*np.abs(xv), k*yv*np.abs(yv), k*zv*np.abs(zv)
+
+    def thrust_force(self, thrust: Union[float,np.ndarray], r: Union[slice,np.ndarray]) -> tuple[np.ndarray,np.ndarray,np.ndarray]:
+        '''see Propeller.force'''
+        pya, pza = self.ya[r] + self.propeller_ya[r], self.za[r] + self.propeller_za[r]
+        cos_pza = np.cos(pza)
+        return -thrust*cos_pza*np.cos(pya), -thrust*np.sin(pza), -thrust*cos_pza*np.sin(pya)
+
+    def buoyant_force(self, zs: np.ndarray, r: Union[slice,np.ndarray]) -> np.ndarray:
+        '''the vertical force only, see BallastTank.force. one batched water column lookup for the whole fleet'''
+        water_rho = sub3d.WATER.density_at(zs)
+        return ((self.tank_rho[:, r] - water_rho)*self.tank_vol[:, r]).sum(axis=0)*sub3d.G
+
+    def _drag_coefficients(self, v: np.ndarray, ya: np.ndarray, za: np.ndarray, diameter: np.ndarray) -> np.ndarray:
+        '''vectorised Submarine.drag_coefficient, one batched table lookup'''
+        xv, yv, zv = v
+        speed = np.sqrt(xv*xv + yv*yv + zv*zv)
+        cz = np.cos(za)
+        along = np.abs(cz*np.cos(ya)*xv + np.sin(za)*yv + cz*np.sin(ya)*zv) / np.where(speed > 0.0, speed, 1.0)
+        return self.drag.cd(reynolds(sub3d.RHO_WATER, speed, diameter), np.arccos(np.minimum(along, 1.0)))
+
+    def tick(self, thrust: Union[float,np.ndarray] = 2.0, dt: float = 1.0, integrator: Integrator | None = None):
+        '''vectorised Submarine.tick over every awake row, one integrator steps the whole fleet'''
+        if not self.sleep_ticks:
+            s, v = self.s, self.v
+            if integrator is None:
+                v += self.acceleration(thrust, s, v) / dt
+                s += v
+                return
+
+            s[...], v[...] = integrator.advance(lambda s, v: self.acceleration(thrust, s, v), s, v, dt)
+            return
+
+        self._wake_on_thrust(thrust)
+        rows = self.active
+        if len(rows) == self.n: # everyone is awake, step views of the block like above
+            rows = slice(0, self.n)
+        elif not len(rows):
+            return
+        if isinstance(thrust, np.ndarray):
+            thrust = thrust[rows]
+
+        s, v = self.block[0:3, rows], self.block[3:6, rows] # copies for a subset
+        if integrator is None:
+            v += self.acceleration(thrust, s, v, rows) / dt
+            s += v
+        else:
+            s, v = integrator.advance(lambda s, v: self.acceleration(thrust, s, v, rows), s, v, dt)
+        self.block[0:3, rows], self.block[3:6, rows] = s, v
+        self._settle(rows)
+
+    # === sleeping ===
+
+    @property
+    def active(self) -> np.ndarray:
+        '''
+        indices of the rows that are awake, found from the still column every time: other Fleets over the same
+        block (a SharedFleet's coordinator and workers) wake rows too
+        '''
+        return np.flatnonzero(self.still[:self.n] < self.sleep_ticks) if self.sleep_ticks else np.arange(self.n)
+
+    def asleep(self) -> np.ndarray:
+        '''a mask of the rows that are asleep'''
+        return self.still[:self.n] >= self.sleep_ticks if self.sleep_ticks else np.zeros(self.n, dtype=bool)
+
+    def wake(self, rows: Union[int,slice,np.ndarray,None] = None):
+        '''wake some rows, or everyone'''
+        self.still[:self.n][slice(None) if rows is None else rows] = 0
+
+    def apply_force(self, row: int, f: Sequence[float]):
+        '''an external push, like Polytope.apply_force: the velocity changes by f / mass and the row wakes up'''
+        self.v[:, row] += np.asarray(f, dtype=float) / self.mass[row]
+        self.wake(row)
+
+    def _wake_on_thrust(self, thrust: Union[float,np.ndarray]):
+        '''wake whoever's thrust differs from the previous tick's. the first tick only notes it, so a restored fleet keeps sleeping'''
+        last = self._thrust
+        if isinstance(thrust, np.ndarray):
+            if isinstance(last, np.ndarray) and last.shape == thrust.shape:
+                changed = np.flatnonzero(last != thrust)
+                if len(changed):
+                    self.wake(changed)
+            elif last is not None:
+                self.wake()
+            self._thrust = thrust.copy()
+        elif thrust != last:
+            if last is not None:
+                self.wake()
+            self._thrust = thrust
+
+    def _settle(self, rows: Union[slice,np.ndarray]):
+        '''count the quiet ticks of the rows just stepped, and put to sleep the ones quiet for long enough'''
+        v, f = self.block[3:6, rows], self.forces[:, rows]
+        net = (f[0:3] + f[3:6] + f[6:9]) / self.mass[rows]
+        quiet = ((v*v).sum(axis=0) < self.sleep_speed**2) & ((net*net).sum(axis=0) < self.sleep_acceleration**2)
+        still = np.where(quiet, self.still[rows] + 1, 0.0)
+        self.still[rows] = still
+        sleeping = still >= self.sleep_ticks
+        if sleeping.any():
+            idx = np.arange(self.n)[rows][sleeping] if isinstance(rows, slice) else rows[sleeping]
+            self.block[3:6, idx] = 0.0 # at rest, not drifting
+
+# === per row views ===
+
+def _column(name: str) -> property:
+    def get(self) -> float:
+        return float(getattr(self._fleet, name)[self._row])
+    def set(self, val: float):
+        getattr(self._fleet, name)[self._row] = val
+        self._fleet.wake(self._row)
+    return property(get, set)
+
+def _component_column(name: str) -> property:
+    def get(self) -> float:
+        return float(getattr(self._fleet, name)[self._k, self._row])
+    def set(self, val: float):
+        getattr(self._fleet, name)[self._k, self._row] = val
+        self._fleet.wake(self._row)
+    return property(get, set)
+
+class PropellerView(sub3d.Propeller):
+    def __init__(self, fleet: Fleet, row: int):
+        self._fleet, self._row = fleet, row
+
+    xa = _column('propeller_xa')
+    ya = _column('propeller_ya')
+    za = _column('propeller_za')
+
+class BallastTankView(sub3d.BallastTank):
+    def __init__(self, fleet: Fleet, row: int, k: int):
+        self._fleet, self._row, self._k = fleet, row, k
+
+    vol = _component_column('tank_vol')
+    rho = _component_column('tank_rho')
+
+class ControlSurfaceView(sub3d.ControlSurface):
+    def __init__(self, fleet: Fleet, row: int, k: int):
+        self._fleet, self._row, self._k = fleet, row, k
+
+    width = _component_column('surface_width')
+    height = _component_column('surface_height')
+    xa = _component_column('surface_xa')
+    ya = _component_column('surface_ya')
+    za = _component_column('surface_za')
+
+class SubmarineView(sub3d.Submarine):
+    '''a Submarine backed by one Fleet row, the scalar tick/reset/str all work through it'''
+    def __init__(self, fleet: Fleet, row: int):
+        self._fleet, self._row = fleet, row
+
+    @property
+    def hull_projected_area(self) -> float:
+        return PI*(self.diameter/2)**2
+
+    @property
+    def drag(self) -> DragTable | None:
+        return self._fleet.drag
+
+    @drag.setter
+    def drag(self, table: DragTable | None):
+        '''the table is fleet wide, setting it through one view sets it for every submarine of the fleet'''
+        self._fleet.drag = table
+
+    @property
+    def volume(self) -> float:
+        return self.length*self.hull_projected_area
+
+    @property
+    def propeller(self) -> PropellerView:
+        return PropellerView(self._fleet, self._row)
+
+    @property
+    def ballast_tanks(self) -> list[BallastTankView]:
+        return [BallastTankView(self._fleet, self._row, k) for k in range(int(self._fleet.tank_count[self._row]))]
+
+    @property
+    def surfaces(self) -> list[ControlSurfaceView]:
+        return [ControlSurfaceView(self._fleet, self._row, k) for k in range(int(self._fleet.surface_count[self._row]))]
+
+for name in STATE + HULL:
+    setattr(SubmarineView, name, _column(name))
+
+def _random_submarines(n: int, seed: int = 0) -> list[sub3d.Submarine]:
+    rng = np.random.default_rng(seed)
+    subs = []
+    for _ in range(n):
+        sub = sub3d.Submarine(*rng.uniform((50, 3, .5), (150, 8, 2)), *rng.uniform(-10, 10, 3), *rng.uniform(-PI, PI, 3))
+        sub.propeller = sub3d.Propeller(.0, PI + rng.uniform(-.2, .2), rng.uniform(-.2, .2))
+        sub.surfaces = [sub3d.ControlSurface(*rng.uniform(.5, 2, 2), *rng.uniform(-PI, PI, 3)) for _ in range(rng.integers(0, 3))]
+        sub.ballast_tanks = [sub3d.BallastTank(*rng.uniform((1, 500), (20, 1025))) for _ in range(rng.integers(1, 4))]
+        subs.append(sub)
+    return subs
+
+def _test_matches_scalar():
+    subs = _random_submarines(50)
+    fleet = Fleet(subs)
+    for _ in range(5):
+        for sub in subs:
+            sub.tick(2.0, 1.0)
+        fleet.tick(2.0, 1.0)
+
+    for i, sub in enumerate(subs):
+        for name in STATE:
+            assert np.isclose(getattr(sub, name), fleet.column(name)[i], rtol=1e-9, atol=1e-9), (i, name)
+
+def _test_drag_matches_scalar():
+    from drag import table
+    subs, rng = _random_submarines(50, seed=3), np.random.default_rng(3)
+    for sub in subs:
+        sub.drag = table('cylinder')
+        sub.xv, sub.yv, sub.zv = rng.uniform(-2, 2, 3) # at every attack
+    fleet = Fleet(subs)
+    assert fleet.drag is table('cylinder') # taken over from the submarines
+    a = fleet.acceleration(2.0, fleet.s, fleet.v)
+    for i, sub in enumerate(subs):
+        assert np.allclose(a[:, i], sub.acceleration(2.0, sub.xs, sub.ys, sub.zs, sub.xv, sub.yv, sub.zv), rtol=1e-9, atol=1e-12), i
+    sub, v = subs[0], (subs[0].xv, subs[0].yv, subs[0].zv)
+    for change in (lambda: None, lambda: setattr(sub, 'za', sub.za + 0.5), lambda: setattr(sub, 'drag', table('line'))):
+        change()
+        cd = sub.drag_coefficient(*v) # the latest inputs are remembered, a changed attitude or table misses them
+        sub._drag_inputs = None
+        assert sub.drag_coefficient(*v) == cd
+    sub.drag = table('cylinder')
+    assert fleet[0].drag is fleet.drag
+    fleet[1].drag = None # for the whole fleet
+    assert fleet.drag is None and not np.allclose(a, fleet.acceleration(2.0, fleet.s, fleet.v)) # and differs from the constant
+
+    subs[1].drag = table('line')
+    try:
+        Fleet(subs)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('expected a ValueError for mixed drag tables')
+
+def _test_view():
+    sub = _random_submarines(1, seed=1)[0]
+    fleet = Fleet([sub])
+    view = fleet[0]
+    assert view.mass == sub.mass
+    assert len(view.ballast_tanks) == len(sub.ballast_tanks)
+
+    # a scalar tick through the view writes the row, matching the vectorised tick of an identical row
+    fleet.add(sub)
+    view.tick(2.0, 1.0)
+    fleet.tick(2.0, 1.0) # advances both rows, the view row twice
+    sub.tick(2.0, 1.0)
+    sub.tick(2.0, 1.0)
+    assert np.isclose(view.zs, sub.zs)
+
+    view.ballast_tanks[0].vol = 0.0
+    assert fleet.tank_vol[0, 0] == 0.0
+
+def _test_integrator_matches_scalar():
+    subs = _random_submarines(10, seed=2)
+    fleet = Fleet(subs)
+    for _ in range(5):
+        for sub in subs:
+            sub.tick(2.0, .01, RK4())
+        fleet.tick(2.0, .01, RK4())
+
+    for i, sub in enumerate(subs):
+        for name in STATE:
+            assert np.isclose(getattr(sub, name), fleet.column(name)[i], rtol=1e-9, atol=1e-9), (i, name)
+
+def _parked(n: int, moving: int, sleep_ticks: int = 0) -> tuple[Fleet, np.ndarray]:
+    '''n submarines with empty tanks, all but the first `moving` without thrust, and the thrust array'''
+    subs = _random_submarines(n, seed=5)
+    for sub in subs:
+        sub.xv = sub.yv = sub.zv = .0
+        for tank in sub.ballast_tanks:
+            tank.vol = .0
+    fleet = Fleet(subs)
+    fleet.sleep_ticks = sleep_ticks
+    thrust = np.zeros(n)
+    thrust[:moving] = 2.0
+    return fleet, thrust
+
+def _test_sleep():
+    fleet, thrust = _parked(10, 4, sleep_ticks=5)
+    awake, _ = _parked(10, 4)
+    for _ in range(8):
+        fleet.tick(thrust, .01, RK4())
+        awake.tick(thrust, .01, RK4())
+    assert list(fleet.asleep()) == [False]*4 + [True]*6
+    assert list(fleet.active) == [0, 1, 2, 3]
+    assert np.array_equal(fleet.block[:, :4], awake.block[:, :4]) # stepping a subset changes nothing for it
+
+    fleet[5].ballast_tanks[0].rho = 2000.0 # wakes through the view
+    fleet[5].ballast_tanks[0].vol = 1.0
+    fleet.apply_force(6, (1e3, .0, .0))
+    assert list(fleet.active) == [0, 1, 2, 3, 5, 6]
+    zs = fleet.zs[5]
+    fleet.tick(thrust, .01, RK4())
+    assert fleet.zs[5] > zs and fleet.xv[6] > .0
+
+    thrust[9] = 2.0 # a new thrust wakes that submarine only
+    fleet.tick(thrust, .01, RK4())
+    assert list(fleet.active) == [0, 1, 2, 3, 5, 6, 9]
+
+    fleet.wake()
+    assert not fleet.asleep().any()
+
+    # a second fleet over the same block (a SharedFleet coordinator and its worker) wakes rows for the first
+    fleet, thrust = _parked(6, 2, sleep_ticks=3)
+    worker = Fleet.over(fleet.block[:, :fleet.n], fleet.max_tanks, fleet.max_surfaces)
+    worker.sleep_ticks = 3
+    for _ in range(5):
+        worker.tick(thrust, .01, RK4())
+    assert list(worker.active) == [0, 1]
+    fleet.apply_force(4, (1e3, .0, .0))
+    xs = fleet.xs[4]
+    worker.tick(thrust, .01, RK4())
+    assert list(worker.active) == [0, 1, 4] and fleet.xs[4] > xs
+
+def test():
+    _test_matches_scalar()
+    _test_integrator_matches_scalar()
+    _test_drag_matches_scalar()
+    _test_view()
+    _test_sleep()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
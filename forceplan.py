@@ -0,0 +1,296 @@
+'''
+Flattened force evaluation for PolytopeGroup assemblies.
+
+Instead of asking every part for its force through its own apply_* method each tick, a ForcePlan walks the
+group tree once and sorts the parts by kind into arrays of geometry and body frame offsets:
+
+    mass       MassPolygon       masses           -> gravity m*g
+    buoyant    BuoyantPolygon    volumes          -> buoyancy -rho*V*g, rho at each part's depth
+    resistant  ResistantPolygon  shape, size, cd  -> drag from the projected area facing the flow
+
+Each kind is then one batched force and torque sum per evaluation. A group's plan is a derived property
+(PolytopeGroup.plan), so it is compiled on first use and recompiled only once the assembly changes: parts added
+or replaced, their geometry, or where they sit within the group.
+
+Offsets are in the root's body frame and rotated by its attitude a.y when evaluated. Torque is around y through
+the centre of mass of the mass parts (the origin if there are none), as the Polytope hierarchy only rotates around y.
+
+Resistant parts without a cd of their own look it up in their shape's drag table (drag.py) at their Reynolds
+number and angle of attack, one batched lookup per table; parts with neither use 3d.DRAG as it is when evaluated.
+Setting or deleting a part's cd or drag recompiles the plan like its geometry does.
+'''
+from __future__ import annotations
+from typing import Union
+from collections.abc import Iterator
+from math import pi as PI, cos, sin, atan2, hypot
+import importlib
+import numpy as np
+from polytope import Polytope, PolytopeGroup, MassPolygon, Line, Circle, Cylinder
+from buoyancy import BuoyantPolygon
+from resistance import ResistantPolygon
+from resistance_functional import cylinder_projected_areas2d, circle_projected_areas2d, line_projected_areas2d, square_projected_areas2d, resistant_forces2d, flow_angles2d
+from water import WaterColumn
+from drag import DragTable, reynolds
+
+sub3d = importlib.import_module('3d')
+
+KINDS: tuple[str,...] = ('mass', 'buoyant', 'resistant')
+
+# resistant parts by silhouette, anything else is projected as a dx by dz box
+SHAPE_BOX, SHAPE_LINE, SHAPE_CIRCLE, SHAPE_CYLINDER = range(4)
+
+_WIDTH: dict[str,int] = {'mass': 4, 'buoyant': 4, 'resistant': 7} # x, z, a, then mass, volume or shape, size, cd
+
+def _parts(group: PolytopeGroup, offset: tuple[float,float] = (.0, .0), angle: float = .0) -> Iterator[tuple[Polytope,float,float,float]]:
+    '''every leaf part with its x, z offset and attitude in the frame of the group the walk started from'''
+    for child in group.components:
+        x, z, a = offset[0], offset[1], angle
+        if getattr(child, 's', None) is not None: # parts without a position sit at their group's origin
+            c, s = cos(angle), sin(angle)
+            x, z = x + c*child.s.x + s*child.s.z, z - s*child.s.x + c*child.s.z
+        if getattr(child, 'a', None) is not None:
+            a += child.a.y
+        if isinstance(child, PolytopeGroup):
+            yield from _parts(child, (x, z), a)
+        else:
+            yield child, x, z, a
+
+def _shape(part: ResistantPolygon) -> tuple[int,float,float]:
+    '''the silhouette of a resistant part and its two sizes, see resistance_functional'''
+    if isinstance(part, Cylinder):
+        return SHAPE_CYLINDER, part.line.d.x, part.cap.radius
+    if isinstance(part, Circle):
+        return SHAPE_CIRCLE, part.radius, .0
+    if isinstance(part, Line):
+        return SHAPE_LINE, part.d.x, .0
+    return SHAPE_BOX, part.d[0], part.d[1] if len(part.d) > 1 else .0
+
+class ForcePlan:
+    n: dict[str,int] # parts per kind
+    offsets: dict[str,np.ndarray] # kind -> 2 x n body frame x, z offsets
+    angles: dict[str,np.ndarray] # kind -> body frame attitudes
+    mass: np.ndarray
+    volume: np.ndarray
+    shape: np.ndarray # resistant parts' SHAPE_*
+    size: np.ndarray # 2 x n, see _shape
+    cd: np.ndarray # nan for parts using a drag table or 3d.DRAG
+    length: np.ndarray # resistant parts' drag_length, their Reynolds number is taken over
+    centre: np.ndarray # body frame centre of mass, the torque axis
+
+    def __init__(self, group: PolytopeGroup):
+        parts: dict[str,list] = {kind: [] for kind in KINDS}
+        tables: dict[DragTable,list[int]] = {} # -> the resistant parts looking their cd up in it
+        length, default = [], []
+        for part, x, z, a in _parts(group):
+            if isinstance(part, MassPolygon):
+                parts['mass'].append((x, z, a, part.mass))
+            if isinstance(part, BuoyantPolygon):
+                parts['buoyant'].append((x, z, a, part.volume))
+            if isinstance(part, ResistantPolygon):
+                cd = getattr(part, 'cd', None)
+                tabled = cd is None and part.drag is not None
+                if tabled:
+                    tables.setdefault(part.drag, []).append(len(parts['resistant']))
+                length.append(part._drag_length() if tabled else .0)
+                default.append(cd is None and not tabled)
+                parts['resistant'].append((x, z, a, *_shape(part), np.nan if cd is None else cd))
+
+        self.n, self.offsets, self.angles = {}, {}, {}
+        columns = {}
+        for kind in KINDS:
+            rows = np.array(parts[kind], dtype=float).reshape(len(parts[kind]), _WIDTH[kind])
+            self.n[kind] = len(rows)
+            self.offsets[kind] = np.ascontiguousarray(rows[:, :2].T)
+            self.angles[kind] = rows[:, 2]
+            columns[kind] = rows[:, 3:].T
+        self.mass = columns['mass'][0]
+        self.volume = columns['buoyant'][0]
+        self.shape = columns['resistant'][0].astype(int)
+        self.size = np.ascontiguousarray(columns['resistant'][1:3])
+        self.cd = columns['resistant'][3]
+        self.length = np.array(length)
+        self._default = np.array(default, dtype=bool) if any(default) else None # the parts using 3d.DRAG
+        self._tables = [(table, np.array(rows)) for table, rows in tables.items()]
+        self._shapes = [(shape, mask) for shape in range(4) if (mask := self.shape == shape).any()] # shapes present
+
+        total = self.mass.sum()
+        self.centre = (self.offsets['mass']*self.mass).sum(axis=1) / total if total else np.zeros(2)
+
+    def __len__(self) -> int:
+        return sum(self.n.values())
+
+    def forces_by_kind(self, s: tuple[float,float], a: float, v: tuple[float,float], g: float = sub3d.G, p: Union[float,WaterColumn] = sub3d.RHO_WATER) -> dict[str,tuple[np.ndarray,float]]:
+        '''
+        kind -> (the x, z force summed over its parts, their torque around the centre of mass) for the root at
+        position s, attitude a and velocity v. p is the fluid density or a water column to read it from per part
+        '''
+        c, sn = cos(a), sin(a)
+        rotation = np.array(((c, sn), (-sn, c)))
+        centre = rotation @ self.centre
+        out = {}
+        for kind in KINDS:
+            if not self.n[kind]:
+                out[kind] = np.zeros(2), 0.0
+                continue
+            r = rotation @ self.offsets[kind] # world frame offsets from the root origin
+            if kind == 'mass':
+                f = np.zeros((2, self.n[kind]))
+                f[1] = self.mass*g
+            elif kind == 'buoyant':
+                rho = p.density_at(s[1] + r[1]) if isinstance(p, WaterColumn) else p
+                f = np.zeros((2, self.n[kind]))
+                f[1] = -rho*self.volume*g
+            else:
+                rho = p.density_at(s[1] + r[1]) if isinstance(p, WaterColumn) else p
+                cd = self._cds(a, v, rho) if self._tables else self.cd
+                if self._default is not None:
+                    cd = np.where(self._default, sub3d.DRAG, cd)
+                f = resistant_forces2d(rho, np.array(v, dtype=float)[:, None], self._areas(a, v), cd)
+            r = r - centre[:, None]
+            out[kind] = f.sum(axis=1), float((r[1]*f[0] - r[0]*f[1]).sum())
+        return out
+
+    def forces(self, s: tuple[float,float], a: float, v: tuple[float,float], g: float = sub3d.G, p: Union[float,WaterColumn] = sub3d.RHO_WATER) -> tuple[np.ndarray,float]:
+        '''the total x, z force and torque over every kind'''
+        force, torque = np.zeros(2), 0.0
+        for f, t in self.forces_by_kind(s, a, v, g, p).values():
+            force += f
+            torque += t
+        return force, torque
+
+    def _cds(self, a: float, v: tuple[float,float], rho: Union[float,np.ndarray]) -> np.ndarray:
+        '''the cd of every resistant part, those with a drag table looked up at their Reynolds number and angle of attack'''
+        cd = self.cd.copy()
+        speed = hypot(v[0], v[1])
+        attack = a + self.angles['resistant'] - atan2(v[0], v[1]) + PI/2 # see ResistantPolygon._drag_force
+        for table, rows in self._tables:
+            cd[rows] = table.cd(reynolds(rho if np.ndim(rho) == 0 else rho[rows], speed, self.length[rows]), attack[rows])
+        return cd
+
+    def _areas(self, a: float, v: tuple[float,float]) -> np.ndarray:
+        '''the projected area of every resistant part facing the flow, one kernel call per shape present'''
+        flow = float(flow_angles2d(np.array(v, dtype=float)))
+        angles = a + self.angles['resistant']
+        areas = np.empty(self.n['resistant'])
+        size = self.size
+        for shape, m in self._shapes:
+            if shape == SHAPE_CYLINDER:
+                areas[m] = cylinder_projected_areas2d(flow, angles[m], size[0, m], size[1, m])
+            elif shape == SHAPE_CIRCLE:
+                areas[m] = circle_projected_areas2d(flow, angles[m], size[0, m])
+            elif shape == SHAPE_LINE:
+                areas[m] = line_projected_areas2d(flow, angles[m], size[0, m])
+            else:
+                areas[m] = square_projected_areas2d(flow, angles[m], size[0, m], size[1, m])
+        return areas
+
+def _test_plan():
+    from polytope import PolygonGroup
+    from resistance import ResistantCylinder
+    from vec import VecXZ, VecY, VecX
+
+    class Ballast(BuoyantPolygon, MassPolygon):
+        def apply_buoyant_force(self, p, g):
+            super().apply_buoyant_force(p, g)
+
+    def ballast(x: float, p: float) -> Ballast:
+        tank = Ballast()
+        tank.d, tank.p, tank.s, tank.a = VecXZ(1.0, 1.0), p, VecXZ(x, .0), VecY(.0)
+        return tank
+
+    hull = ResistantCylinder()
+    hull.cap, hull.line = Circle(), Line()
+    hull.cap._diameter = Line()
+    hull.cap._diameter.d, hull.line.d, hull.cd = VecX(2.0), VecX(10.0), 0.5
+
+    fore, aft = ballast(4.0, 500.0), ballast(-4.0, 1500.0)
+    sub = PolygonGroup(hull, PolygonGroup(fore, aft))
+    sub.s, sub.a, sub.v = VecXZ(.0, 50.0), VecY(.0), VecXZ(1.0, .0)
+    plan = sub.plan
+    assert plan is sub.plan and plan.n == {'mass': 2, 'buoyant': 2, 'resistant': 1}
+    assert np.allclose(plan.centre, (-2.0, .0)) # the heavier tank aft
+
+    kinds = plan.forces_by_kind((.0, 50.0), .0, (1.0, .0), g=10.0, p=1000.0)
+    assert np.allclose(kinds['mass'][0], (.0, 20000.0)) and np.isclose(kinds['mass'][1], 0.0) # gravity acts at the centre of mass
+    assert np.allclose(kinds['buoyant'][0], (.0, -20000.0))
+    assert np.isclose(kinds['buoyant'][1], -(6.0*-10000.0 + -2.0*-10000.0)) # equal lift, unequal arms
+    drag = resistant_forces2d(1000.0, np.array([[1.0], [.0]]), cylinder_projected_areas2d(flow_angles2d(np.array([1.0, .0])), .0, 10.0, 1.0), 0.5)
+    assert np.allclose(kinds['resistant'][0], drag[:, 0])
+
+    # the same force as every part's own apply_* method
+    expected = VecXZ(.0, .0)
+    for tank in (fore, aft):
+        tank.v = VecXZ(.0, .0)
+        tank.apply_gravitational_force(10.0)
+        tank.apply_buoyant_force(1000.0, 10.0)
+        expected += tank.v*tank.mass
+    force, _ = plan.forces((.0, 50.0), .0, (.0, .0), g=10.0, p=1000.0)
+    assert np.allclose(force, tuple(expected))
+
+    sub.s = VecXZ(5.0, 60.0) # the root moving doesn't touch the plan
+    assert sub.plan is plan
+    aft.p = 500.0 # a part's geometry
+    assert sub.plan is not plan and np.allclose(sub.plan.centre, (.0, .0))
+    plan = sub.plan
+    fore.s = VecXZ(6.0, .0) # a part moving within the assembly
+    assert sub.plan is not plan and np.allclose(sub.plan.centre, (1.0, .0))
+
+    plan = sub.plan
+    hull.cd = 0.1 # drag settings are compiled in too
+    assert sub.plan is not plan and sub.plan.cd[0] == 0.1
+    del hull.cd
+    hull.drag = None # neither a cd nor a table, 3d.DRAG is read when evaluated
+    drag = sub3d.DRAG
+    try:
+        sub3d.DRAG = 0.25
+        expected = resistant_forces2d(1000.0, np.array([[1.0], [.0]]), cylinder_projected_areas2d(flow_angles2d(np.array([1.0, .0])), .0, 10.0, 1.0), 0.25)
+        assert np.allclose(sub.plan.forces_by_kind((.0, 50.0), .0, (1.0, .0), g=10.0, p=1000.0)['resistant'][0], expected[:, 0])
+    finally:
+        sub3d.DRAG = drag
+    hull.cd = 0.5
+
+    sub.a = VecY(np.pi/2) # offsets turn with the root, (x, z) -> (z, -x)
+    _, torque = sub.plan.forces((.0, .0), np.pi/2, (.0, .0), g=10.0, p=0.0)
+    assert np.isclose(torque, 0.0)
+    force, _ = sub.apply_forces(10.0, 0.0)
+    assert np.allclose(force, (.0, 10000.0))
+
+def _test_drag_tables():
+    from polytope import PolygonGroup
+    from resistance import ResistantCylinder, ResistantCircle
+    from vec import VecXZ, VecY, VecX
+
+    def hull(length: float, diameter: float, a: float) -> ResistantCylinder:
+        hull = ResistantCylinder()
+        hull.cap, hull.line, hull.s, hull.a = Circle(), Line(), VecXZ(.0, .0), VecY(a)
+        hull.cap._diameter = Line()
+        hull.cap._diameter.d, hull.line.d = VecX(diameter), VecX(length)
+        return hull
+
+    buoy = ResistantCircle()
+    buoy._diameter, buoy.s = Line(), VecXZ(.0, -3.0)
+    buoy._diameter.d = VecX(0.5)
+    along, across, fixed = hull(10.0, 1.0, .0), hull(10.0, 1.0, PI/2), hull(10.0, 1.0, .0)
+    fixed.cd = 0.5
+    plan = PolygonGroup(along, across, fixed, buoy).plan
+    assert len(plan._tables) == 2 and np.isnan(plan.cd[[0, 1, 3]]).all() and plan.cd[2] == 0.5
+
+    for speed in (1e-3, 0.5, 5.0):
+        v = (speed, .0) # along x, the first hull's axis
+        cd = plan._cds(.0, v, 1025.0)
+        assert cd[0] == along.drag_coefficient(1025.0, speed, .0) and cd[2] == 0.5
+        assert cd[1] == along.drag.cd(reynolds(1025.0, speed, 1.0), PI/2) and cd[1] > cd[0] # broadside
+        assert cd[3] == buoy.drag.cd(reynolds(1025.0, speed, 0.5))
+    assert plan._cds(.0, (1e-3, .0), 1025.0)[0] > plan._cds(.0, (5.0, .0), 1025.0)[0] # creeping flow is draggier
+    rho = np.full(4, 1025.0) # a water column gives a density per part
+    assert np.allclose(plan._cds(.0, (0.5, .0), rho), plan._cds(.0, (0.5, .0), 1025.0), equal_nan=True)
+
+def test():
+    _test_plan()
+    _test_drag_tables()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
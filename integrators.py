@@ -0,0 +1,140 @@
+'''
+Numerical integrators for the second order systems s'' = a(s, v) used by the submarine models.
+
+The state halves s and v only need to support +, and * by a float, so the same integrator advances a single
+Submarine (VecXYZ state) or a whole Fleet (3 x N numpy arrays).
+'''
+from __future__ import annotations
+from typing import Any, Callable
+import abc
+import numpy as np
+from vec import Vec
+
+State = Any # Vec or np.ndarray
+Acceleration = Callable[[State, State], State] # a(s, v)
+
+def _components(x: State) -> np.ndarray:
+    return np.asarray(x.components if isinstance(x, Vec) else x, dtype=float)
+
+class Integrator(abc.ABC):
+    '''advances (s, v) by dt. steps counts the internal steps taken, to compare integrator cost'''
+    steps: int = 0
+    adaptive: bool = False # picks its step size from the whole state, so states stepped together affect each other
+
+    def advance(self, a: Acceleration, s: State, v: State, dt: float) -> tuple[State,State]:
+        self.steps += 1
+        return self.step(a, s, v, dt)
+
+    @abc.abstractmethod
+    def step(self, a: Acceleration, s: State, v: State, h: float) -> tuple[State,State]:
+        pass
+
+class SemiImplicitEuler(Integrator):
+    '''first order, symplectic: the new velocity moves the position'''
+    def step(self, a: Acceleration, s: State, v: State, h: float) -> tuple[State,State]:
+        v1 = v + a(s, v)*h
+        return s + v1*h, v1
+
+class VelocityVerlet(Integrator):
+    '''
+    second order. our forces depend on velocity (drag), so the end of step acceleration
+    is taken at an Euler predicted velocity
+    '''
+    def step(self, a: Acceleration, s: State, v: State, h: float) -> tuple[State,State]:
+        a0 = a(s, v)
+        s1 = s + v*h + a0*(h*h/2)
+        a1 = a(s1, v + a0*h)
+        return s1, v + (a0 + a1)*(h/2)
+
+class RK4(Integrator):
+    '''classic fourth order Runge-Kutta'''
+    def step(self, a: Acceleration, s: State, v: State, h: float) -> tuple[State,State]:
+        k1s, k1v = v, a(s, v)
+        k2s = v + k1v*(h/2)
+        k2v = a(s + k1s*(h/2), k2s)
+        k3s = v + k2v*(h/2)
+        k3v = a(s + k2s*(h/2), k3s)
+        k4s = v + k3v*h
+        k4v = a(s + k3s*h, k4s)
+        return s + (k1s + k2s*2 + k3s*2 + k4s)*(h/6), v + (k1v + k2v*2 + k3v*2 + k4v)*(h/6)
+
+# Dormand-Prince 5(4) tableau, the system is autonomous so the c nodes aren't needed
+_DP_A: tuple[tuple[float,...],...] = (
+    (),
+    (1/5,),
+    (3/40, 9/40),
+    (44/45, -56/15, 32/9),
+    (19372/6561, -25360/2187, 64448/6561, -212/729),
+    (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+    (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+_DP_B5: tuple[float,...] = (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0)
+_DP_B4: tuple[float,...] = (5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40)
+
+class RK45(Integrator):
+    '''
+    Embedded Dormand-Prince 5(4) with error controlled step size.
+
+    advance() covers the whole dt with as many internal steps as the tolerances need, and remembers the last
+    accepted step size, so steady cruise runs at h_max while ballast changes or high drag shrink the step.
+    '''
+    adaptive = True
+
+    def __init__(self, rtol: float = 1e-6, atol: float = 1e-6, h_min: float = 1e-6, h_max: float = float('inf')):
+        self.rtol, self.atol = rtol, atol
+        self.h_min, self.h_max = h_min, h_max
+        self.h: float | None = None # the next step size to try
+        self.rejected: int = 0
+
+    def advance(self, a: Acceleration, s: State, v: State, dt: float) -> tuple[State,State]:
+        t = 0.0
+        h = min(self.h or dt, self.h_max)
+        while t < dt:
+            h = min(h, dt - t)
+            (s1, v1), error = self._attempt(a, s, v, h)
+            if error <= 1.0 or h <= self.h_min:
+                t += h
+                s, v = s1, v1
+                self.steps += 1
+            else:
+                self.rejected += 1
+            # standard step size controller with a safety factor, growth bounded to [0.2, 5]
+            h = min(max(h*min(5.0, max(0.2, 0.9*error**-0.2 if error > 0 else 5.0)), self.h_min), self.h_max)
+            if t < dt:
+                self.h = h
+        return s, v
+
+    def step(self, a: Acceleration, s: State, v: State, h: float) -> tuple[State,State]:
+        return self._attempt(a, s, v, h)[0]
+
+    def _attempt(self, a: Acceleration, s: State, v: State, h: float) -> tuple[tuple[State,State],float]:
+        ks, kv = [], []
+        for i in range(7):
+            si, vi = s, v
+            for j, aij in enumerate(_DP_A[i]):
+                if aij:
+                    si = si + ks[j]*(h*aij)
+                    vi = vi + kv[j]*(h*aij)
+            ks.append(vi)
+            kv.append(a(si, vi))
+
+        s5, v5, es, ev = s, v, 0, 0
+        for i in range(7):
+            if _DP_B5[i]:
+                s5 = s5 + ks[i]*(h*_DP_B5[i])
+                v5 = v5 + kv[i]*(h*_DP_B5[i])
+            if _DP_B5[i] != _DP_B4[i]:
+                es = es + ks[i]*(h*(_DP_B5[i] - _DP_B4[i]))
+                ev = ev + kv[i]*(h*(_DP_B5[i] - _DP_B4[i]))
+
+        scale_s = self.atol + self.rtol*np.maximum(np.abs(_components(s)), np.abs(_components(s5)))
+        scale_v = self.atol + self.rtol*np.maximum(np.abs(_components(v)), np.abs(_components(v5)))
+        error = max(float(np.max(np.abs(_components(es))/scale_s)), float(np.max(np.abs(_components(ev))/scale_v)))
+        return (s5, v5), error
+
+INTEGRATORS: dict[str,type] = {
+    'euler': SemiImplicitEuler,
+    'verlet': VelocityVerlet,
+    'rk4': RK4,
+    'rk45': RK45,
+}
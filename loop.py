@@ -0,0 +1,92 @@
+'''
+Fixed timestep physics decoupled from rendering.
+
+PhysicsLoop steps the simulation on its own thread at a steady rate (simulated seconds per step = 1/rate),
+using an accumulator of wall time scaled by the time warp. The renderer never waits for physics, it asks for
+the state interpolated between the last two steps instead.
+'''
+from __future__ import annotations
+from typing import Callable
+import threading
+import time
+import numpy as np
+
+WARPS: tuple[float,...] = (1.0, 10.0, 100.0)
+
+class PhysicsLoop:
+    rate: float # physics steps per simulated second
+    warp: float # simulated seconds per wall second
+    max_substeps: int # bound on steps per wake up, beyond this physics falls behind instead of spiralling
+    steps: int
+    t: float # simulated time
+
+    def __init__(self, step: Callable[[float], None], state: Callable[[], np.ndarray], rate: float = 240.0, warp: float = 1.0, max_substeps: int = 1000):
+        '''step(h) advances the simulation by h simulated seconds, state() returns the array to interpolate (a view is fine)'''
+        self._step = step
+        self._state = state
+        self.rate, self.warp, self.max_substeps = rate, warp, max_substeps
+        self.steps, self.t = 0, 0.0
+        self.dropped = 0.0 # simulated seconds skipped because physics couldn't keep up
+
+        # double buffered snapshots of the last two steps, swapped rather than reallocated
+        self._previous = np.array(state(), dtype=float)
+        self._current = self._previous.copy()
+        self._stepped_at = time.perf_counter()
+
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def h(self) -> float:
+        return 1.0 / self.rate
+
+    def start(self):
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name='physics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        h = self.h
+        accumulator = 0.0
+        last = time.perf_counter()
+        while self._running.is_set():
+            now = time.perf_counter()
+            accumulator += (now - last)*self.warp
+            last = now
+
+            substeps = 0
+            while accumulator >= h and substeps < self.max_substeps:
+                self._step(h)
+                accumulator -= h
+                substeps += 1
+                with self._lock:
+                    self._previous, self._current = self._current, self._previous
+                    self._current[...] = self._state()
+                    self._stepped_at = time.perf_counter()
+                    self.steps += 1
+                    self.t += h
+
+            if substeps == self.max_substeps and accumulator >= h:
+                self.dropped += accumulator
+                accumulator = 0.0
+
+            # sleep until the next step is due, in wall time
+            time.sleep(max(0.0, (h - accumulator) / self.warp))
+
+    def interpolated(self, out: np.ndarray | None = None) -> np.ndarray:
+        '''the state blended between the last two steps, by how far wall time has moved past the latest one'''
+        with self._lock:
+            alpha = min(1.0, (time.perf_counter() - self._stepped_at)*self.warp*self.rate)
+            if out is None:
+                out = np.empty_like(self._current)
+            np.subtract(self._current, self._previous, out=out)
+            out *= alpha
+            out += self._previous
+        return out
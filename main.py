@@ -1,13 +1,27 @@
 from __future__ import annotations
-from typing import Any, override
+from typing import Any, override, TYPE_CHECKING
 import abc
-import tomllib
+import functools
 import math
-from vec import Vec, VecXZ, VecY
-from polytope import Polygon, SizePolygon, PolygonGroup, Cylinder
+import sys
+from vec import Vec, VecXZ, VecY, VecX
+from polytope import Polygon, SizePolygon, PolygonGroup, Cylinder, Circle, Line
 from resistance import ResistantCylinder
 from buoyancy import BuoyantPolygon
-import pygame as pg
+from submarine import load_scenario
+from fleet import Fleet
+from integrators import Integrator
+from orientation import Orientation
+from loop import PhysicsLoop, WARPS
+from replay import Replay
+import numpy as np
+import profiling
+
+SCRUB: float = 10.0 # replay seconds per second while scrubbing, times the speed
+OVERLAY: tuple[str,...] = ('frame', 'Fleet.tick', 'Fleet.acceleration') # profiling stages shown by the F3 overlay
+
+if TYPE_CHECKING: # pygame is only imported once a window is opened
+    import pygame as pg
 
 def hex_to_tuple(h: int) -> tuple[int,...]:
     l = []
@@ -31,22 +45,23 @@ class VisualPolygon(SizePolygon, abc.ABC):
 class VisualCylinder(VisualPolygon, Cylinder):
     @override
     def draw(self, surface: pg.Surface):
-        pg.draw.rect(screen, (200, 200, 180), (400, 30, 300, 15))
+        import pygame as pg
+        pg.draw.rect(surface, (200, 200, 180), (400, 30, 300, 15))
 
 class Propeller(Polygon):
     def __init__(self, s: VecXZ, a: VecY):
         self.s = s
         self.a = a
+        self.orientation = Orientation()
 
     def force(self, xa0, ya0, za0, f) -> tuple[float,float,float]:
-        xa = xa0 + self.xa
-        ya = ya0 + self.ya
-        za = za0 + self.za
+        o = self.orientation
+        o.update(xa0, ya0 + self.a.y, za0) # a polygon only turns around y
 
         # flip the direction to get forward force
-        xf = -f*cos(za)*cos(ya)
-        yf = -f*sin(za)
-        zf = -f*cos(za)*sin(ya)
+        xf = -f*o.cos_za*o.cos_ya
+        yf = -f*o.sin_za
+        zf = -f*o.cos_za*o.sin_ya
 
         return xf, yf, zf
 
@@ -56,23 +71,27 @@ class Hull(ResistantCylinder, VisualPolygon):
 class Submarine(PolygonGroup, VisualPolygon):
     components: Vec[Polygon]
 
-    def __init__(self, s: VecXZ, a: VecY, v: VecXZ = VecXZ(.0,.0)): 
+    def __init__(self, s: VecXZ, a: VecY, v: VecXZ = VecXZ(.0,.0), length: float = 100.0, diameter: float = 5.0): 
         self.s = s
         self.a = a
         self.v = v
 
+        hull = ResistantCylinder()
+        hull.cap, hull.line = Circle(), Line()
+        hull.cap._diameter = Line()
+        hull.cap._diameter.d, hull.line.d = VecX(diameter), VecX(length)
         self.components = Vec(
-            ResistantCylinder(), # hull
+            hull,
             Propeller(VecXZ(.0,.0), -self.a),
         )
 
     @property
     def hull(self):
-        return self._polys[0]
+        return self.components[0]
 
     @property
     def propeller(self):
-        return self._polys[1]
+        return self.components[1]
 
     @override
     def apply_force(self, f: VecXZ):
@@ -86,22 +105,66 @@ class Submarine(PolygonGroup, VisualPolygon):
     def volume(self):
         return self.hull.volume # TODO add ballast tanks
 
-def main():
-
-    with open('config.toml', 'rb') as cfg_file:
-        cfg = tomllib.load(cfg_file)
-
-    pg.init()
-    pg.display.set_caption(cfg['screen']['title'])
-
-    screen = pg.display.set_mode(cfg['screen']['d'])
-    submarine = Submarine(VecXZ(.0,.0), VecY(.0))
-
+def draw_fleet(screen: pg.Surface, fleet: Fleet, s: np.ndarray, x0: float):
+    '''side view of positions s (3 x n), 1px per metre, x shifted by x0 and z drawn downwards like the screen'''
+    import pygame as pg
+    for i in range(s.shape[1]):
+        length, diameter = fleet.length[i], fleet.diameter[i]
+        pg.draw.rect(screen, (200, 200, 180), (s[0, i] - x0 - length/2, s[2, i] - diameter/2, length, max(diameter, 1)))
+
+def _overlay_lines() -> list[str]:
+    '''median and p95 of the latest frames and physics steps, from the profiling stats'''
+    lines = []
+    for name in OVERLAY:
+        stage = profiling.STATS.get(name)
+        if stage is not None and stage.count:
+            lines.append(f'{name:<20}{stage.percentile(50)*1e3:7.2f} ms  p95 {stage.percentile(95)*1e3:7.2f} ms')
+    return lines
+
+@functools.cache
+def _font(size: int = 14) -> pg.font.Font:
+    import pygame as pg
+    return pg.font.SysFont('monospace', size)
+
+def _draw(screen: pg.Surface, cfg: dict[str,Any], fleet: Fleet, s: np.ndarray, overlay: list[str] = ()):
+    import pygame as pg
+
+    # the background sky and water
+    screen.fill(cfg['screen']['color'])
+    pg.draw.rect(screen, (0, 0, 255), (0, 100, 800, 500))
+
+    draw_fleet(screen, fleet, s, s[0, 0] - screen.get_width()/2 if s.shape[1] else 0.0)
+    if overlay:
+        for i, line in enumerate(overlay):
+            screen.blit(_font().render(line, True, (255, 255, 255), (0, 0, 0)), (8, 8 + 16*i))
+    pg.display.flip()
+
+def _live(screen: pg.Surface, cfg: dict[str,Any], thrust: float, fleet: Fleet, integrator: Integrator | None):
+    import pygame as pg
+
+    # physics runs on its own thread at a fixed rate, the window only interpolates between its steps
+    physics = PhysicsLoop(
+        lambda h: fleet.tick(thrust, h, integrator),
+        lambda: fleet.s,
+        rate=cfg.get('simulation', {}).get('rate', 240.0),
+    )
+    s = np.empty((3, len(fleet)))
+
+    physics.start()
     clock = pg.time.Clock()
-    while True:
+    running = True
+    while running:
         for event in pg.event.get():
             if event.type == pg.QUIT:
-                break
+                running = False
+            elif event.type == pg.KEYDOWN and pg.K_1 <= event.key < pg.K_1 + len(WARPS):
+                physics.warp = WARPS[event.key - pg.K_1] # x1, x10, x100
+            elif event.type == pg.KEYDOWN and event.key == pg.K_F3: # frame time overlay, profiles the tick while shown
+                if profiling.enabled():
+                    profiling.disable()
+                else:
+                    profiling.reset()
+                    profiling.enable()
 
         keys = pg.key.get_pressed()
         if keys[pg.K_LEFT]:
@@ -113,19 +176,73 @@ def main():
         if keys[pg.K_DOWN]:
             pass
         if keys[pg.K_q]:
-            break
+            running = False
+
+        physics.interpolated(out=s)
+        _draw(screen, cfg, fleet, s, _overlay_lines() if profiling.enabled() else ())
+        frame = clock.tick(cfg['screen'].get('fps', 0)) # 0 renders as fast as the display allows
+        if profiling.enabled():
+            profiling.record('frame', frame / 1000)
+
+    physics.stop()
+    profiling.disable()
+
+def _replay(screen: pg.Surface, cfg: dict[str,Any], replay: Replay) -> tuple[Fleet, Integrator | None] | None:
+    '''
+    scrub through a recorded run: space plays/pauses, left/right scrub, home/end jump, 1/2/3 set the speed.
+    r continues live from the current moment and returns its state, q quits
+    '''
+    import pygame as pg
+
+    geometry = replay.seek(0.0)[0] # hull sizes for drawing, they don't change over a run
+    s = np.empty((3, replay.n))
+    t, warp, playing = 0.0, WARPS[0], True
+
+    clock = pg.time.Clock()
+    while True:
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                return None
+            if event.type != pg.KEYDOWN:
+                continue
+            if pg.K_1 <= event.key < pg.K_1 + len(WARPS):
+                warp = WARPS[event.key - pg.K_1]
+            elif event.key == pg.K_SPACE:
+                playing = not playing
+            elif event.key == pg.K_HOME:
+                t = 0.0
+            elif event.key == pg.K_END:
+                t = replay.duration
+            elif event.key == pg.K_r:
+                fleet, integrator, _ = replay.seek(t)
+                return fleet, integrator
+
+        wall = clock.tick(cfg['screen'].get('fps', 60)) / 1000
+        keys = pg.key.get_pressed()
+        if keys[pg.K_q]:
+            return None
+        scrub = SCRUB*(keys[pg.K_RIGHT] - keys[pg.K_LEFT])
+        t = min(max(t + wall*warp*(scrub or playing), 0.0), replay.duration)
+
+        _draw(screen, cfg, geometry, replay.positions(t, out=s))
+
+def main(path: str = 'config.toml', replay: str | None = None):
+    import pygame as pg
 
-        # the background sky and water
-        screen.fill(cfg['screen']['color'])
-        pg.draw.rect(screen, (0, 0, 255), (0, 100, 800, 500))
+    scenario = load_scenario(path)
+    cfg = scenario.cfg
 
-        submarine.draw(screen)
+    pg.init()
+    pg.display.set_caption(cfg['screen']['title'])
+    screen = pg.display.set_mode(cfg['screen']['d'])
 
-        pg.display.flip()
-        clock.tick(60)
+    if replay is None:
+        _live(screen, cfg, scenario.thrust, scenario.make_fleet(), scenario.make_integrator())
+    elif (resumed := _replay(screen, cfg, Replay(replay))) is not None:
+        _live(screen, cfg, scenario.thrust, *resumed)
 
     pg.quit()
 
 if __name__ == '__main__':
-    main()
+    main(*sys.argv[1:3])
 
@@ -0,0 +1,110 @@
+'''
+Attitude with its trig terms cached until the angles change.
+
+A submarine's attitude is usually the same from one tick (and one integrator stage) to the next, yet the
+components used to take the cos and sin of it on every force evaluation. An Orientation keeps the last angles
+with their cos/sin and only recomputes them when update() is given different ones.
+
+    o = Orientation()
+    o.update(xa, ya, za)          # True if the angles changed (and the terms were recomputed)
+    o.cos_za*o.cos_ya, o.sin_za   # the cached terms
+    o.rotate(x, y, z)             # a local vector in the parent frame
+
+The counters are summed over every Orientation, see stats().
+'''
+from __future__ import annotations
+from math import cos, sin, nan
+
+TRIG_PER_UPDATE: int = 6 # cos and sin of each angle
+
+# module globals rather than class attributes, assigning to a class attribute would flush the type's lookup cache
+_updates: int = 0
+_recomputes: int = 0
+
+class Orientation:
+    '''roll xa, yaw ya and pitch za, in the angle convention of 3d.py (0s face along positive x)'''
+    __slots__ = ('xa', 'ya', 'za', 'cos_xa', 'sin_xa', 'cos_ya', 'sin_ya', 'cos_za', 'sin_za', '_matrix')
+
+    def __init__(self, xa: float = nan, ya: float = nan, za: float = nan):
+        self.xa = self.ya = self.za = nan # never equal, so the first update always computes
+        self._matrix = None
+        if xa == xa:
+            self.update(xa, ya, za)
+
+    def update(self, xa: float, ya: float, za: float) -> bool:
+        global _updates, _recomputes
+        _updates += 1
+        if xa == self.xa and ya == self.ya and za == self.za:
+            return False
+        _recomputes += 1
+        self.xa, self.ya, self.za = xa, ya, za
+        self.cos_xa, self.sin_xa = cos(xa), sin(xa)
+        self.cos_ya, self.sin_ya = cos(ya), sin(ya)
+        self.cos_za, self.sin_za = cos(za), sin(za)
+        self._matrix = None
+        return True
+
+    @property
+    def forward(self) -> tuple[float,float,float]:
+        '''where the local x axis points, the direction a propeller thrusts along'''
+        c = self.cos_za
+        return c*self.cos_ya, self.sin_za, c*self.sin_ya
+
+    @property
+    def matrix(self) -> tuple[tuple[float,float,float],...]:
+        '''rows of yaw . pitch . roll, built from the cached terms on first use after a change'''
+        if self._matrix is None:
+            cx, sx, cy, sy, cz, sz = self.cos_xa, self.sin_xa, self.cos_ya, self.sin_ya, self.cos_za, self.sin_za
+            self._matrix = (
+                (cy*cz, -cy*sz*cx - sy*sx, cy*sz*sx - sy*cx),
+                (sz, cz*cx, -cz*sx),
+                (sy*cz, -sy*sz*cx + cy*sx, sy*sz*sx + cy*cx),
+            )
+        return self._matrix
+
+    def rotate(self, x: float, y: float, z: float) -> tuple[float,float,float]:
+        '''a vector from the local frame into the parent frame'''
+        r0, r1, r2 = self.matrix
+        return (
+            r0[0]*x + r0[1]*y + r0[2]*z,
+            r1[0]*x + r1[1]*y + r1[2]*z,
+            r2[0]*x + r2[1]*y + r2[2]*z,
+        )
+
+def stats() -> dict[str,int]:
+    '''updates, recomputes and trig evaluations avoided by every Orientation since the last reset()'''
+    return {'updates': _updates, 'recomputes': _recomputes, 'trig_avoided': (_updates - _recomputes)*TRIG_PER_UPDATE}
+
+def reset():
+    global _updates, _recomputes
+    _updates = _recomputes = 0
+
+def _test_cache():
+    reset()
+    o = Orientation()
+    assert o.update(0.1, 0.2, 0.3) and not o.update(0.1, 0.2, 0.3)
+    assert (o.cos_ya, o.sin_za) == (cos(0.2), sin(0.3))
+    assert o.update(0.1, 0.2, 0.4)
+    assert stats() == {'updates': 3, 'recomputes': 2, 'trig_avoided': TRIG_PER_UPDATE}
+
+def _test_rotate():
+    o = Orientation(0.7, 0.2, 0.3)
+    assert all(abs(a - b) < 1e-12 for a, b in zip(o.rotate(1.0, 0.0, 0.0), o.forward)) # roll leaves x alone
+    r = o.matrix # orthonormal
+    for i in range(3):
+        for j in range(3):
+            dot = sum(r[i][k]*r[j][k] for k in range(3))
+            assert abs(dot - (i == j)) < 1e-12
+    x, y, z = o.rotate(0.3, -1.2, 2.0)
+    assert abs(x*x + y*y + z*z - (0.09 + 1.44 + 4.0)) < 1e-12
+
+def test():
+    _test_cache()
+    _test_rotate()
+    reset()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,124 @@
 from __future__ import annotations
-from typing import Any, override
+from typing import Any, Union, override, TYPE_CHECKING
 import abc
 from math import pi as PI, sqrt, sin, cos, atan2
 import operator
 import functools
-from vec import Vec, VecXZ, VecY, VecX
+from vec import Vec, VecXZ, VecY, VecX, VecExpr
+
+if TYPE_CHECKING:
+    import numpy as np
+    from forceplan import ForcePlan
+    from water import WaterColumn
+
+# assigning (or deleting) any of these drops the derived values of the polytope and of every group it is part of.
+# cd and drag aren't geometry, but a group's ForcePlan is compiled from them too
+GEOMETRY: frozenset[str] = frozenset({'d', 'p', 'components', 'cd', 'drag'})
+
+class derived(functools.cached_property):
+    '''
+    A property computed on first access and then read straight from the instance, until Polytope.invalidate()
+    drops it. Only depend on geometry (GEOMETRY attributes, parts and children), never on motion
+    '''
+    pass
 
 class Polytope(abc.ABC): # or, "Pylotope"
     '''The most abstract and all inclusive type for an arbitrary n-dimensional physical object'''
     s: Vec # displacement
     a: Vec # angle, orientation (not direction of movement)
     v: Vec # velocity
+    _parent: Polytope | None = None # the polytope this is a part or child of
+    _derived: tuple[str,...] = () # names of the derived properties, see __init_subclass__
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._derived = tuple({name for klass in cls.__mro__ for name, attr in vars(klass).items() if isinstance(attr, derived)})
+
+    def __setattr__(self, name: str, val: Any):
+        if isinstance(val, VecExpr): # keep a vector, not a tree over other attributes, see vec.lazy
+            val = val.evaluate()
+        object.__setattr__(self, name, val)
+        if name in GEOMETRY:
+            if name == 'components':
+                for child in val:
+                    object.__setattr__(child, '_parent', self)
+            self.invalidate()
+        elif name == 's' or name == 'a': # moving a child moves its group's centre of mass, its own values are relative to itself
+            if self._parent is not None:
+                self._parent.invalidate()
+        elif isinstance(val, Polytope) and name != '_parent': # a part, e.g. Cylinder.cap
+            object.__setattr__(val, '_parent', self)
+            self.invalidate()
+
+    def __delattr__(self, name: str):
+        object.__delattr__(self, name)
+        if name in GEOMETRY:
+            self.invalidate()
+
+    def invalidate(self):
+        '''
+        drop the derived values of this polytope and every group above it. assigning a GEOMETRY attribute does
+        this for you, call it yourself after changing one in place (e.g. poly.d[0] = 2.0)
+        '''
+        poly = self
+        while poly is not None:
+            cache = poly.__dict__
+            for name in poly._derived:
+                cache.pop(name, None)
+            poly = poly._parent
 
     def apply_force(self, f: Vec):
         self.v += f / self.mass
 
 class PolytopeGroup(Polytope, Vec[Polytope], abc.ABC):
-    '''A Polytope that owns multiple child Polytopes, all positioned relative to its origin'''
-    pass
+    '''
+    A Polytope that owns multiple child Polytopes, all positioned relative to its origin.
+    Its volume, mass, centre of mass and inertia aggregate its children's and are cached like theirs
+    '''
+
+    def __setitem__(self, idx: int, child: Polytope):
+        super().__setitem__(idx, child)
+        object.__setattr__(child, '_parent', self)
+        self.invalidate()
+
+    @property
+    def _massive(self) -> list[Polytope]:
+        return [child for child in self.components if isinstance(child, (MassPolygon, PolytopeGroup))]
+
+    @derived
+    def volume(self) -> float:
+        return sum(child.volume for child in self.components if isinstance(child, (SizePolygon, PolytopeGroup)))
+
+    @derived
+    def mass(self) -> float:
+        return sum(child.mass for child in self._massive)
+
+    @derived
+    def centre_of_mass(self) -> Vec:
+        '''relative to the group origin, from each child's position s and its own centre of mass'''
+        return sum((child.mass*(child.s + child.centre_of_mass) for child in self._massive), VecXZ(.0, .0)) / self.mass
+
+    @derived
+    def inertia(self) -> float:
+        '''moment of inertia around the y axis through the centre of mass, by the parallel axis theorem'''
+        com = self.centre_of_mass
+        inertia = 0.0
+        for child in self._massive:
+            r = child.s + child.centre_of_mass - com
+            inertia += child.inertia + child.mass*(r*r)
+        return inertia
+
+    @derived
+    def plan(self) -> ForcePlan:
+        '''the flattened force evaluation plan of the whole tree, compiled again only once the assembly changes'''
+        from forceplan import ForcePlan # imports this module
+        return ForcePlan(self)
+
+    def apply_forces(self, g: float, p: Union[float,WaterColumn]) -> tuple[np.ndarray,float]:
+        '''gravity, buoyancy and drag of every part in one pass over the plan, returns the force and torque applied'''
+        force, torque = self.plan.forces((self.s.x, self.s.z), self.a.y, (self.v.x, self.v.z), g, p)
+        self.apply_force(VecXZ(float(force[0]), float(force[1])))
+        return force, torque
 
 class Polygon(Polytope):
     '''A 2D physical object'''
@@ -27,17 +128,31 @@ class Polygon(Polytope):
 class SizePolygon(Polygon):
     d: Vec # dimensions (size/volume)
 
-    @property
+    @derived
     def volume(self):
         return functools.reduce(operator.mul, self.d)
 
+    @derived
+    def gyration(self) -> float:
+        '''squared radius of gyration around y through the centre, inertia per unit mass. a uniform box by default'''
+        return sum(x*x for x in self.d)/12
+
 class MassPolygon(SizePolygon):
     p: float # density
 
-    @property
+    @derived
     def mass(self):
         return self.volume*self.p
 
+    @derived
+    def centre_of_mass(self) -> VecXZ:
+        '''relative to s, uniform density puts it at the centre'''
+        return VecXZ(.0, .0)
+
+    @derived
+    def inertia(self) -> float:
+        return self.mass*self.gyration
+
     def apply_gravitational_force(self, g: Union[VecXZ,float]):
         '''Takes a gravity acceleration vector'''
         if isinstance(g, (int, float)):
@@ -64,19 +179,107 @@ class Circle(SizePolygon):
     def radius(self) -> float:
         return self.diameter / 2
 
-    @property
+    @derived
     @override
     def volume(self) -> float:
         '''The volume, or area of the circle'''
         return PI*self.radius**2
 
+    @derived
+    @override
+    def gyration(self) -> float:
+        return self.radius**2/2 # a disc
+
 class Cylinder(SizePolygon):
     cap: Circle
     line: Line # the line of the cylinder length
     
-    @property
+    @derived
     @override
     def volume(self) -> float:
         return self.line.volume*self.cap.volume
-    
-    
+
+    @derived
+    @override
+    def gyration(self) -> float:
+        return (3*self.cap.radius**2 + self.line.d.x**2)/12 # a solid cylinder across its axis
+
+
+def _box(d: VecXZ, p: float, s: VecXZ) -> MassPolygon:
+    box = MassPolygon()
+    box.d, box.p, box.s = d, p, s
+    return box
+
+def _test_cached():
+    box = _box(VecXZ(2.0, 3.0), 1.5, VecXZ(.0, .0))
+    assert box.mass == 9.0 and 'mass' in box.__dict__ and 'volume' in box.__dict__ # read from the instance from now on
+    assert box.inertia == 9.0*(4.0 + 9.0)/12
+
+    box.p = 2.0
+    assert 'mass' not in box.__dict__ and box.mass == 12.0
+    box.d = VecXZ(1.0, 1.0)
+    assert box.volume == 1.0 and box.mass == 2.0
+    box.d[0] = 3.0 # in place, not seen until invalidated
+    assert box.mass == 2.0
+    box.invalidate()
+    assert box.mass == 6.0
+
+    box.v = VecXZ(.0, .0)
+    box.apply_force(VecXZ(12.0, .0))
+    assert tuple(box.v) == (2.0, .0)
+
+    line, cap = Line(), Circle()
+    line.d, cap._diameter = VecX(10.0), Line()
+    cap._diameter.d = VecX(2.0)
+    cylinder = Cylinder()
+    cylinder.cap, cylinder.line = cap, line
+    assert abs(cylinder.volume - 10*PI) < 1e-12
+    cap._diameter.d = VecX(4.0) # a part of a part
+    assert abs(cylinder.volume - 40*PI) < 1e-12
+    assert abs(cylinder.gyration - (3*4 + 100)/12) < 1e-12
+
+def _test_group():
+    a = _box(VecXZ(2.0, 2.0), 1.0, VecXZ(-1.0, .0))
+    b = _box(VecXZ(2.0, 2.0), 3.0, VecXZ(3.0, .0))
+    group = PolygonGroup(a, b)
+    assert group.mass == 16.0 and group.volume == 8.0
+    assert tuple(group.centre_of_mass) == (2.0, .0)
+    assert group.inertia == a.inertia + 4*9.0 + b.inertia + 12*1.0
+
+    b.p = 1.0 # a child's geometry
+    assert 'mass' not in group.__dict__ and group.mass == 8.0
+    assert tuple(group.centre_of_mass) == (1.0, .0)
+    b.s = VecXZ(5.0, .0) # a child's position
+    assert tuple(group.centre_of_mass) == (2.0, .0)
+    group.s = VecXZ(100.0, .0) # the group's own position changes nothing inside it
+    assert 'mass' in group.__dict__
+
+    outer = PolygonGroup(group, _box(VecXZ(1.0, 1.0), 8.0, VecXZ(.0, .0)))
+    assert outer.mass == 16.0
+    group[0] = _box(VecXZ(1.0, 1.0), 4.0, VecXZ(.0, .0)) # replacing a child reaches every group above
+    assert group.mass == 8.0 and outer.mass == 16.0
+    a.p = 100.0 # no longer a child
+    assert outer.mass == 16.0
+
+def _test_lazy():
+    import vec
+    eager, fused = _box(VecXZ(2.0, 3.0), 1.5, VecXZ(.0, 4.0)), _box(VecXZ(2.0, 3.0), 1.5, VecXZ(.0, 4.0))
+    eager.v, fused.v = VecXZ(1.0, .0), VecXZ(1.0, .0)
+    eager.apply_gravitational_force(9.81)
+    eager.s = eager.s + eager.v*0.1
+    with vec.lazy():
+        fused.apply_gravitational_force(9.81) # v += mass*g / mass without the two temporaries
+        fused.s = fused.s + fused.v*0.1
+    assert type(fused.s) is VecXZ # assigning evaluates the tree
+    assert (tuple(fused.v), tuple(fused.s)) == (tuple(eager.v), tuple(eager.s))
+
+def test():
+    _test_cached()
+    _test_group()
+    _test_lazy()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+'''
+Opt-in per stage timing inside the tick.
+
+enable() swaps every stage method in STAGES for a wrapper that counts its calls and times them, and disable()
+puts the original functions back. With profiling off nothing is wrapped, so the tick pays nothing for it.
+
+    profiling.enable()
+    for _ in range(1000):
+        sub.tick(2.0, 0.01, RK4())
+    print(profiling.format_report())
+
+Stage times are inclusive: Submarine.acceleration (and Fleet.acceleration) includes the friction, thrust and
+buoyancy stages it calls.
+Anything else can be timed under its own name with timed(name) or record(name, seconds), main.py times frames.
+'''
+from __future__ import annotations
+from typing import Any, Callable
+from collections.abc import Iterator
+import contextlib
+import functools
+import importlib
+import math
+import time
+import numpy as np
+
+SAMPLES: int = 4096 # latest call times kept per stage for the percentiles
+PERCENTILES: tuple[float,...] = (50.0, 95.0, 99.0)
+
+# (module, class, method), each reported as class.method
+STAGES: tuple[tuple[str,str,str],...] = (
+    ('3d', 'Submarine', 'tick'),
+    ('3d', 'Submarine', 'acceleration'),
+    ('3d', 'Submarine', 'projected_area'), # hull face plus control surface area
+    ('3d', 'Submarine', 'friction_force'),
+    ('3d', 'Submarine', 'thrust_force'),
+    ('3d', 'Submarine', 'buoyant_force'),
+    ('fleet', 'Fleet', 'tick'),
+    ('fleet', 'Fleet', 'acceleration'),
+    ('fleet', 'Fleet', 'projected_area'),
+    ('fleet', 'Fleet', 'friction_force'),
+    ('fleet', 'Fleet', 'thrust_force'),
+    ('fleet', 'Fleet', 'buoyant_force'),
+    ('buoyancy', 'BuoyantPolygon', 'apply_buoyant_force'),
+    ('resistance', 'ResistantPolygon', 'apply_drag_force'),
+    ('polytope', 'MassPolygon', 'apply_gravitational_force'),
+)
+
+class Stage:
+    '''call count, cumulative time and the latest SAMPLES call times of one stage'''
+    name: str
+    count: int
+    total: float # seconds
+
+    def __init__(self, name: str, samples: int = SAMPLES):
+        self.name = name
+        self.count, self.total = 0, 0.0
+        self._samples = [0.0]*samples # a ring, written at count % samples
+
+    def add(self, seconds: float):
+        self._samples[self.count % len(self._samples)] = seconds
+        self.count += 1
+        self.total += seconds
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def samples(self) -> np.ndarray:
+        return np.array(self._samples[:min(self.count, len(self._samples))])
+
+    def percentile(self, q: float) -> float:
+        samples = self.samples
+        return float(np.percentile(samples, q)) if len(samples) else math.nan
+
+    def summary(self) -> dict[str,float]:
+        samples = self.samples
+        summary = {'count': self.count, 'total': self.total, 'mean': self.mean}
+        for q in PERCENTILES:
+            summary[f'p{q:g}'] = float(np.percentile(samples, q)) if len(samples) else math.nan
+        return summary
+
+STATS: dict[str,Stage] = {}
+_originals: dict[tuple[type,str],Callable | None] = {} # None when the method was inherited
+
+def stage(name: str) -> Stage:
+    s = STATS.get(name)
+    if s is None:
+        s = STATS[name] = Stage(name)
+    return s
+
+def _timed(method: Callable, s: Stage) -> Callable:
+    clock = time.perf_counter
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            s.add(clock() - start)
+    return timed
+
+def enabled() -> bool:
+    return bool(_originals)
+
+def enable(stages: tuple[tuple[str,str,str],...] = STAGES):
+    '''wrap the stage methods, already wrapped ones are left as they are'''
+    for module, cls_name, method in stages:
+        cls = getattr(importlib.import_module(module), cls_name)
+        if (cls, method) in _originals:
+            continue
+        _originals[cls, method] = cls.__dict__.get(method)
+        setattr(cls, method, _timed(getattr(cls, method), stage(f'{cls_name}.{method}')))
+
+def disable():
+    '''put the original methods back, the stats are kept until reset()'''
+    for (cls, method), original in _originals.items():
+        if original is None:
+            delattr(cls, method)
+        else:
+            setattr(cls, method, original)
+    _originals.clear()
+
+def reset():
+    STATS.clear()
+
+@contextlib.contextmanager
+def profiled(stages: tuple[tuple[str,str,str],...] = STAGES) -> Iterator[dict[str,Stage]]:
+    '''profile the stages for the duration of the block'''
+    enable(stages)
+    try:
+        yield STATS
+    finally:
+        disable()
+
+def record(name: str, seconds: float):
+    '''add a measurement to a stage of your own, e.g. a frame time'''
+    stage(name).add(seconds)
+
+@contextlib.contextmanager
+def timed(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def report() -> dict[str,dict[str,float]]:
+    '''stage name -> count, total, mean and percentiles (seconds) of every stage called, the most total time first'''
+    return {s.name: s.summary() for s in sorted(STATS.values(), key=lambda s: s.total, reverse=True) if s.count}
+
+def format_report(stats: dict[str,dict[str,float]] | None = None) -> str:
+    stats = report() if stats is None else stats
+    percentiles = [f'p{q:g}' for q in PERCENTILES]
+    lines = [f"{'stage':<40}{'calls':>10}{'total ms':>12}{'mean us':>10}" + ''.join(f'{p + " us":>10}' for p in percentiles)]
+    for name, s in stats.items():
+        lines.append(
+            f"{name:<40}{s['count']:>10}{s['total']*1e3:>12.2f}{s['mean']*1e6:>10.2f}"
+            + ''.join(f'{s[p]*1e6:>10.2f}' for p in percentiles)
+        )
+    return '\n'.join(lines)
+
+def _test_stages():
+    from integrators import RK4
+    sub3d = importlib.import_module('3d')
+    reset()
+    sub = sub3d.Submarine()
+    tick = sub3d.Submarine.__dict__['tick']
+
+    with profiled():
+        for _ in range(10):
+            sub.tick(2.0, 0.01, RK4())
+    assert sub3d.Submarine.__dict__['tick'] is tick # restored
+
+    stats = report()
+    assert stats['Submarine.tick']['count'] == 10
+    assert stats['Submarine.acceleration']['count'] == 40 # four RK4 stages per tick
+    assert stats['Submarine.buoyant_force']['count'] == 40
+    assert stats['Submarine.tick']['total'] >= stats['Submarine.acceleration']['total']
+    assert stats['Submarine.tick']['p50'] <= stats['Submarine.tick']['p99']
+
+    sub.tick(2.0, 0.01, RK4()) # disabled, not counted
+    assert report()['Submarine.tick']['count'] == 10
+    assert format_report().splitlines()[1].startswith('Submarine.tick')
+    reset()
+
+    from fleet import Fleet, _random_submarines
+    fleet = Fleet(_random_submarines(10))
+    with profiled():
+        for _ in range(10):
+            fleet.tick(2.0, 0.01, RK4())
+    stats = report()
+    assert all(stats[f'Fleet.{term}']['count'] == 40 for term in ('acceleration', 'projected_area', 'friction_force', 'thrust_force', 'buoyant_force'))
+    assert stats['Fleet.acceleration']['total'] >= stats['Fleet.buoyant_force']['total']
+    reset()
+
+def _test_inherited():
+    from polytope import MassPolygon
+    from vec import VecXZ
+    reset()
+    with profiled((('polytope', 'MassPolygon', 'apply_force'),)): # inherited from Polytope
+        assert 'apply_force' in MassPolygon.__dict__
+        polygon = MassPolygon()
+        polygon.d, polygon.p, polygon.v = VecXZ(2.0, 3.0), 1.5, VecXZ(.0, .0)
+        polygon.apply_force(VecXZ(9.0, .0))
+    assert 'apply_force' not in MassPolygon.__dict__
+    assert tuple(polygon.v) == (1.0, .0)
+    assert report()['MassPolygon.apply_force']['count'] == 1
+
+    ring = Stage('ring', samples=4)
+    for i in range(10):
+        ring.add(float(i))
+    assert ring.count == 10 and sorted(ring.samples) == [6.0, 7.0, 8.0, 9.0]
+    reset()
+
+def test():
+    _test_stages()
+    _test_inherited()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+'''
+Binary trajectory recording.
+
+A Recorder copies every tick's state into a preallocated ring buffer of fixed size TickState records. Without a
+file the ring keeps the latest ticks; with one, a full ring is spilled to the file and reused, so recordings
+larger than RAM stream to disk. Recording files are a small header describing the record layout followed by raw
+records, and load() maps them back in O(1). The forces are those at the recorded state, not the integrator's last
+stage: record_fleet evaluates them again for the rows whose state or thrust changed since the previous record
+(the moving ones), parked and sleeping rows keep theirs:
+
+    with Recorder(path='run.rec', submarines=len(fleet)) as recorder:
+        for tick in range(ticks):
+            fleet.tick(thrust, dt)
+            recorder.record_fleet(tick, tick*dt, fleet, thrust)
+
+    log = TupleArray(TickState, load('run.rec'))
+    log.zs[log.submarine == 0] # depth of the first submarine over time
+'''
+from __future__ import annotations
+from typing import Any, BinaryIO
+import importlib
+import json
+import struct
+import numpy as np
+from fleet import Fleet, STATE
+from tupleclass import TupleClass, TupleArray
+
+sub3d = importlib.import_module('3d')
+
+MAGIC: bytes = b'SUBREC\r\n' # the line endings catch text mode mangling
+VERSION: int = 1
+ALIGN: int = 64 # records start on a cache line
+RING_BYTES: int = 16 << 20 # the default ring size, however many submarines share it
+
+class TickState(TupleClass):
+    '''one submarine at one tick, the forces are sub3d.FORCES'''
+    tick: int
+    t: float
+    submarine: int
+    xs: float
+    ys: float
+    zs: float
+    xv: float
+    yv: float
+    zv: float
+    xa: float
+    ya: float
+    za: float
+    xf_thrust: float
+    yf_thrust: float
+    zf_thrust: float
+    xf_buoyancy: float
+    yf_buoyancy: float
+    zf_buoyancy: float
+    xf_friction: float
+    yf_friction: float
+    zf_friction: float
+    ballast_fill: float # water fraction of the combined tank volume, see BallastTank.set_air_water_displacement
+
+def ballast_fill(sub: sub3d.Submarine) -> float:
+    '''the inverse of set_air_water_displacement at the submarine's depth, over all of its tanks'''
+    water_rho = sub3d.WATER.density_at(sub.zs)
+    vol = sum(tank.vol for tank in sub.ballast_tanks)
+    if not vol:
+        return 0.0
+    return sum((tank.rho - sub3d.RHO_AIR)*tank.vol for tank in sub.ballast_tanks) / ((water_rho - sub3d.RHO_AIR)*vol)
+
+# === file format ===
+
+def _header(dtype: np.dtype) -> bytes:
+    '''MAGIC, a little endian uint32 length, then the JSON schema, padded so the records are aligned'''
+    schema = json.dumps({'version': VERSION, 'record': 'TickState', 'dtype': dtype.descr, 'itemsize': dtype.itemsize}).encode()
+    size = len(MAGIC) + 4 + len(schema)
+    schema += b' '*(-size % ALIGN)
+    return MAGIC + struct.pack('<I', len(schema)) + schema
+
+def read_header(f: BinaryIO) -> tuple[dict[str,Any], int]:
+    '''the schema and the offset of the first record'''
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f'{getattr(f, "name", f)} is not a recording')
+    (length,) = struct.unpack('<I', f.read(4))
+    schema = json.loads(f.read(length))
+    if schema['version'] > VERSION:
+        raise ValueError(f'recording version {schema["version"]} is newer than this reader ({VERSION})')
+    schema['dtype'] = np.dtype([tuple(field) for field in schema['dtype']])
+    return schema, len(MAGIC) + 4 + length
+
+def load(path: str) -> np.memmap:
+    '''
+    every record of a recording file, memory mapped read only. the record count comes from the file size,
+    so a recording cut short by a crash loads up to its last whole record
+    '''
+    with open(path, 'rb') as f:
+        schema, offset = read_header(f)
+        f.seek(0, 2)
+        count = (f.tell() - offset) // schema['itemsize']
+    if count == 0:
+        return np.zeros(0, dtype=schema['dtype']).view(np.memmap)
+    return np.memmap(path, dtype=schema['dtype'], mode='r', offset=offset, shape=(count,))
+
+# === recording ===
+
+class Recorder:
+    '''
+    The ring holds `ticks` ticks of `submarines` records each, allocated once, by default as many ticks as fit
+    in RING_BYTES (at least one). Each record call fills the next
+    tick's rows in place, the submarine column never changes so it's written up front. record_fleet works in
+    scratch buffers allocated with the ring, so apart from evaluating the changed rows' forces (Fleet.acceleration
+    over just those rows) recording allocates no arrays of its own.
+    '''
+    data: np.ndarray # the ring, TickState records
+    head: int # next row to write
+    count: int # ticks recorded in total
+    path: str | None
+
+    def __init__(self, ticks: int | None = None, submarines: int = 1, path: str | None = None):
+        self.submarines = submarines
+        if ticks is None:
+            ticks = max(1, RING_BYTES // (submarines*TickState.dtype().itemsize))
+        self.data = np.zeros(ticks*submarines, dtype=TickState.dtype())
+        self.data['submarine'] = np.tile(np.arange(submarines), ticks)
+        self.head = 0
+        self.count = 0
+        self.path = path
+        self.file: BinaryIO | None = None
+        if path is not None:
+            self.file = open(path, 'wb')
+            self.file.write(_header(self.data.dtype))
+
+        # per column views of the ring, so record_fleet doesn't look fields up every tick
+        self._columns = {name: self.data[name] for name in TickState._fields}
+        self._water_rho, self._total, self._weighted = np.empty(submarines), np.empty(submarines), np.empty(submarines)
+        self._filled = np.empty(submarines, dtype=bool)
+        self._tanks = np.empty((0, submarines)) # tanks x submarines, resized to the fleet's max_tanks
+
+        # the forces of every row at the state it was last recorded in, and that state: the fleet's block columns,
+        # thrust and environment. rows whose inputs didn't change since aren't evaluated again
+        self._forces = np.zeros((len(sub3d.FORCES), submarines))
+        self._inputs = np.empty((0, submarines)) # block rows x submarines, resized to the fleet's
+        self._unchanged = np.empty((0, submarines), dtype=bool)
+        self._changed = np.empty(submarines, dtype=bool)
+        self._thrust = np.empty(submarines)
+        self._thrust_changed = np.empty(submarines, dtype=bool)
+        self._environment: tuple | None = None
+
+    def _advance(self) -> int:
+        '''the first row of the next tick, spilling or wrapping a full ring'''
+        if self.head == len(self.data):
+            if self.file is not None:
+                self.data.tofile(self.file)
+            self.head = 0
+        row = self.head
+        self.head += self.submarines
+        self.count += 1
+        return row
+
+    def record(self, tick: int, t: float, sub: sub3d.Submarine, thrust: float):
+        '''one submarine (a single submarine recorder), its forces evaluated at its current state with thrust'''
+        sub.acceleration(thrust, sub.xs, sub.ys, sub.zs, sub.xv, sub.yv, sub.zv, count=False) # sets sub.forces, a scheduler doesn't count it
+        self.data[self._advance()] = (
+            tick, t, 0,
+            sub.xs, sub.ys, sub.zs, sub.xv, sub.yv, sub.zv, sub.xa, sub.ya, sub.za,
+            *sub.forces,
+            ballast_fill(sub),
+        )
+
+    def _evaluate(self, fleet: Fleet, thrust: float | np.ndarray):
+        '''bring _forces up to date with the fleet's state, evaluating only the rows whose inputs changed'''
+        n = self.submarines
+        block = fleet.block[:, :n]
+        environment = (sub3d.WATER, sub3d.DRAG, sub3d.RHO_WATER, sub3d.G, fleet.drag)
+        same = self._environment is not None and all(a is b for a, b in zip(environment, self._environment))
+        if not same or self._inputs.shape != block.shape:
+            self._inputs, self._unchanged = np.empty(block.shape), np.empty(block.shape, dtype=bool)
+            rows = slice(0, n)
+        else:
+            changed = np.not_equal(block, self._inputs, out=self._unchanged).any(axis=0, out=self._changed)
+            changed |= np.not_equal(thrust, self._thrust, out=self._thrust_changed)
+            rows = np.flatnonzero(changed)
+            if len(rows) == n:
+                rows = slice(0, n)
+            elif not len(rows):
+                return
+        self._environment = environment
+        if isinstance(rows, slice):
+            fleet.acceleration(thrust, fleet.s, fleet.v) # sets fleet.forces
+            self._forces[...] = fleet.forces[:, :n]
+            self._inputs[...] = block
+        else:
+            fleet.acceleration(thrust[rows] if isinstance(thrust, np.ndarray) else thrust, block[0:3, rows], block[3:6, rows], rows)
+            self._forces[:, rows] = fleet.forces[:, rows]
+            self._inputs[:, rows] = block[:, rows]
+        self._thrust[...] = thrust
+
+    def record_fleet(self, tick: int, t: float, fleet: Fleet, thrust: float | np.ndarray):
+        '''
+        one tick of a fleet. Fleet.forces holds the forces of the integrator's last stage (e.g. RK4's k4, or a
+        rejected RK45 trial) and sleeping rows keep older ones, so the recorded forces are those at the state
+        being recorded with the tick's thrust, see _evaluate
+        '''
+        n = self.submarines
+        if len(fleet) != n:
+            raise ValueError(f'recorder is laid out for {n} submarines, the fleet has {len(fleet)}')
+        self._evaluate(fleet, thrust)
+        i = self._advance()
+        rows = slice(i, i + n)
+        columns = self._columns
+        columns['tick'][rows] = tick
+        columns['t'][rows] = t
+        for name in STATE:
+            columns[name][rows] = getattr(fleet, name)[:n]
+        for k, name in enumerate(sub3d.FORCES):
+            columns[name][rows] = self._forces[k]
+
+        # see ballast_fill, with zero volume tank rows contributing nothing
+        vol = fleet.tank_vol[:, :n]
+        tanks = self._tanks
+        if tanks.shape != vol.shape:
+            tanks = self._tanks = np.empty(vol.shape)
+        total = vol.sum(axis=0, out=self._total)
+        np.subtract(fleet.tank_rho[:, :n], sub3d.RHO_AIR, out=tanks)
+        tanks *= vol
+        weighted = tanks.sum(axis=0, out=self._weighted)
+        water_rho = sub3d.WATER.density_at(fleet.zs[:n], out=self._water_rho)
+        water_rho -= sub3d.RHO_AIR
+        water_rho *= total
+        fill = columns['ballast_fill'][rows]
+        fill[...] = 0.0
+        np.divide(weighted, water_rho, out=fill, where=np.greater(total, 0.0, out=self._filled))
+
+    def records(self) -> np.ndarray:
+        '''
+        everything recorded, oldest first. a file backed recorder flushes and maps its file,
+        otherwise this is a copy of the ticks still in the ring
+        '''
+        if self.path is not None:
+            self.flush()
+            return load(self.path)
+        if self.count*self.submarines <= len(self.data):
+            return self.data[:self.head].copy()
+        return np.concatenate((self.data[self.head:], self.data[:self.head]))
+
+    def flush(self):
+        '''write the partly filled ring to the file, the ring is then reused from the start'''
+        if self.file is not None:
+            self.data[:self.head].tofile(self.file)
+            self.file.flush()
+            self.head = 0
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+    def __enter__(self) -> Recorder:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _test_ring():
+    from integrators import RK4
+
+    sub = sub3d.Submarine(integrator=RK4())
+    recorder = Recorder(ticks=4)
+    for tick in range(6):
+        sub.tick(2e4, 0.1)
+        recorder.record(tick, tick*0.1, sub, 2e4)
+    records = TupleArray(TickState, recorder.records())
+    assert list(records.tick) == [2, 3, 4, 5]
+    assert records[-1].zs == sub.zs and records[-1].xf_thrust == sub.forces[0]
+    assert abs(records[-1].ballast_fill - ballast_fill(sub)) < 1e-12
+
+def _test_spill():
+    import os, tempfile
+    from fleet import _random_submarines
+    from integrators import RK4
+
+    fleet = Fleet(_random_submarines(3))
+    path = os.path.join(tempfile.mkdtemp(), 'run.rec')
+    with Recorder(ticks=4, submarines=3, path=path) as recorder:
+        for tick in range(10): # spills twice, then the rest on close
+            fleet.tick(2e4, 0.1, RK4())
+            stage = fleet.forces[:, :3].copy() # k4's, not the committed state's
+            recorder.record_fleet(tick, tick*0.1, fleet, 2e4)
+
+    records = load(path)
+    assert isinstance(records, np.memmap) and len(records) == 30
+    assert list(records['tick'][::3]) == list(range(10))
+    assert list(records['submarine'][:6]) == [0, 1, 2, 0, 1, 2]
+    assert np.array_equal(records['zs'][-3:], fleet.zs[:3])
+    assert np.array_equal(records['zf_friction'][-3:], fleet.forces[8, :3])
+    fresh = Fleet(_random_submarines(3))
+    fresh.block[:, :3] = fleet.block[:, :3]
+    fresh.acceleration(2e4, fresh.s, fresh.v)
+    assert np.array_equal(records['zf_friction'][-3:], fresh.forces[8, :3]) and not np.array_equal(stage, fresh.forces[:, :3])
+
+    # a fleet row records the same values as the submarine it came from
+    sub = _random_submarines(1)[0]
+    fleet = Fleet([sub])
+    single, batched = Recorder(ticks=1), Recorder(ticks=1)
+    sub.tick(2e4, 0.1, RK4())
+    fleet.tick(2e4, 0.1, RK4())
+    single.record(0, 0.1, sub, 2e4)
+    batched.record_fleet(0, 0.1, fleet, 2e4)
+    for name in TickState._fields:
+        assert np.isclose(single.data[name][0], batched.data[name][0], rtol=1e-9), name
+
+def _test_ring_size():
+    itemsize = TickState.dtype().itemsize
+    assert len(Recorder().data) == RING_BYTES // itemsize
+    assert Recorder(submarines=1000).data.nbytes <= RING_BYTES # not 65536 ticks of a thousand submarines
+    n = RING_BYTES // itemsize + 1
+    assert len(Recorder(submarines=n).data) == n # one tick at least
+
+def _test_changed_rows():
+    from fleet import _parked
+    from integrators import RK4
+
+    fleet, thrust = _parked(6, 2, sleep_ticks=3)
+    recorder, counts = Recorder(ticks=8, submarines=6), []
+    acceleration = fleet.acceleration
+    def counted(thrust, s, v, rows=None):
+        counts.append(fleet.n if rows is None else len(rows))
+        return acceleration(thrust, s, v, rows)
+    for tick in range(6):
+        fleet.tick(thrust, .01, RK4())
+        fleet.acceleration = counted # only the recorder's evaluations
+        recorder.record_fleet(tick, tick*.01, fleet, thrust)
+        del fleet.acceleration
+    assert counts[0] == 6 and counts[-1] == 2 # the parked rows were evaluated while they settled, then kept
+    fresh, _ = _parked(6, 2)
+    fresh.block[...] = fleet.block
+    fresh.acceleration(thrust, fresh.s, fresh.v)
+    records = recorder.records()
+    for k, name in enumerate(sub3d.FORCES): # kept or evaluated again, the forces at the recorded state
+        assert np.array_equal(records[name][-6:], fresh.forces[k, :6]), name
+
+    thrust[4] = 2.0 # a new thrust, evaluated again
+    fleet.tick(thrust, .01, RK4())
+    fleet.acceleration = counted
+    recorder.record_fleet(6, .06, fleet, thrust)
+    assert counts[-1] == 3 and recorder.data['xf_thrust'][6*6 + 4] != 0.0
+
+def test():
+    _test_ring()
+    _test_changed_rows()
+    _test_ring_size()
+    _test_spill()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
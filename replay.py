@@ -0,0 +1,178 @@
+'''
+Keyframe indexed replays of fleet runs.
+
+A replay is a directory:
+
+    replay.json     the layout and the step parameters needed to resimulate
+    ticks.rec       every tick's TickState records (see recorder.py), what the viewer draws from
+    keyframes.f64   a full Fleet.block (every submarine, tank and surface column) every `interval` ticks
+    index.bin       one KEYFRAME record per keyframe: its tick, time, byte offset and integrator step size
+
+Drawing any moment reads the mapped ticks.rec directly. Recovering the complete simulation state at a time t
+(to continue live from there) is a binary search of the index, a copy of one keyframe and at most `interval`
+resimulated ticks.
+'''
+from __future__ import annotations
+import json
+import math
+import os
+import numpy as np
+from fleet import Fleet, SLEEP_SETTINGS
+from integrators import Integrator, INTEGRATORS
+import drag
+from recorder import Recorder, load
+
+VERSION: int = 1
+
+KEYFRAME: np.dtype = np.dtype([('tick', '<i8'), ('t', '<f8'), ('offset', '<i8'), ('h', '<f8')])
+
+class ReplayWriter:
+    '''record a fleet run, call write() once per tick after the fleet has been stepped to that tick'''
+    def __init__(self, path: str, fleet: Fleet, dt: float, thrust: float, integrator: str | None = None, interval: int = 1024):
+        os.makedirs(path, exist_ok=True)
+        self.path, self.interval, self.thrust = path, interval, thrust
+        self.n = len(fleet)
+        with open(os.path.join(path, 'replay.json'), 'w') as meta:
+            json.dump({
+                'version': VERSION,
+                'submarines': self.n,
+                'max_tanks': fleet.max_tanks,
+                'max_surfaces': fleet.max_surfaces,
+                'rows': fleet.block.shape[0],
+                'dt': dt,
+                'thrust': thrust,
+                'integrator': integrator,
+                'interval': interval,
+                'sleep': {name: getattr(fleet, name) for name in SLEEP_SETTINGS},
+                'drag': fleet.drag.name if fleet.drag else None,
+            }, meta)
+
+        self.recorder = Recorder(submarines=self.n, path=os.path.join(path, 'ticks.rec'))
+        self.keyframes = open(os.path.join(path, 'keyframes.f64'), 'wb')
+        self.index = open(os.path.join(path, 'index.bin'), 'wb')
+        self._entry = np.zeros(1, dtype=KEYFRAME)
+
+    def write(self, tick: int, t: float, fleet: Fleet, integrator: Integrator | None = None):
+        self.recorder.record_fleet(tick, t, fleet, self.thrust)
+        if tick % self.interval == 0:
+            entry = self._entry[0]
+            entry['tick'], entry['t'], entry['offset'] = tick, t, self.keyframes.tell()
+            entry['h'] = getattr(integrator, 'h', None) or math.nan # adaptive integrators carry their step size
+            np.ascontiguousarray(fleet.block[:, :self.n]).tofile(self.keyframes)
+            self._entry.tofile(self.index)
+
+    def close(self):
+        self.recorder.close()
+        self.keyframes.close()
+        self.index.close()
+
+    def __enter__(self) -> ReplayWriter:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Replay:
+    '''a recorded run, every file memory mapped'''
+    def __init__(self, path: str):
+        with open(os.path.join(path, 'replay.json')) as meta:
+            self.meta = json.load(meta)
+        if self.meta['version'] > VERSION:
+            raise ValueError(f'replay version {self.meta["version"]} is newer than this reader ({VERSION})')
+        self.n = self.meta['submarines']
+        self.dt = self.meta['dt']
+
+        self.ticks = load(os.path.join(path, 'ticks.rec'))
+        self.times = self.ticks['t'][::self.n] # one entry per recorded tick, a strided view of the map
+        self.index = np.fromfile(os.path.join(path, 'index.bin'), dtype=KEYFRAME)
+        self.keyframes = np.memmap(os.path.join(path, 'keyframes.f64'), dtype='<f8', mode='r') if self.index.size else None
+
+    @property
+    def duration(self) -> float:
+        return float(self.times[-1]) if len(self.times) else 0.0
+
+    def frame(self, t: float) -> int:
+        '''the last recorded tick at or before t'''
+        return max(int(np.searchsorted(self.times, t, side='right')) - 1, 0)
+
+    def positions(self, t: float, out: np.ndarray | None = None) -> np.ndarray:
+        '''3 x n positions at time t, interpolated between recorded ticks straight out of the mapped file'''
+        i = self.frame(t)
+        j = min(i + 1, len(self.times) - 1)
+        span = self.times[j] - self.times[i]
+        alpha = min(max((t - self.times[i]) / span, 0.0), 1.0) if span > 0 else 0.0
+
+        if out is None:
+            out = np.empty((3, self.n))
+        a, b = self.ticks[i*self.n:(i + 1)*self.n], self.ticks[j*self.n:(j + 1)*self.n]
+        for k, name in enumerate(('xs', 'ys', 'zs')):
+            np.subtract(b[name], a[name], out=out[k])
+            out[k] *= alpha
+            out[k] += a[name]
+        return out
+
+    def seek(self, t: float) -> tuple[Fleet, Integrator | None, int]:
+        '''
+        the complete fleet state at the last tick at or before t, with an integrator ready to continue from it,
+        and that tick
+        '''
+        if self.keyframes is None:
+            raise ValueError('the replay has no keyframes')
+        k = max(int(np.searchsorted(self.index['t'], t, side='right')) - 1, 0)
+        keyframe = self.index[k]
+
+        rows = self.meta['rows']
+        start = int(keyframe['offset']) // 8
+        block = self.keyframes[start:start + rows*self.n].reshape(rows, self.n)
+        fleet = Fleet.from_block(block, self.meta['max_tanks'], self.meta['max_surfaces'])
+        for name, value in self.meta.get('sleep', {}).items(): # resimulate with the same sleeping as the recording
+            setattr(fleet, name, value)
+        if self.meta.get('drag') is not None:
+            fleet.drag = drag.table(self.meta['drag'])
+
+        integrator = INTEGRATORS[self.meta['integrator']]() if self.meta['integrator'] else None
+        if integrator is not None and not math.isnan(keyframe['h']):
+            integrator.h = float(keyframe['h'])
+
+        tick = int(keyframe['tick'])
+        target = tick + max(int((t - keyframe['t']) / self.dt + 1e-9), 0)
+        target = min(target, tick + self.meta['interval'] - 1, int(self.ticks['tick'][-1]))
+        for _ in range(target - tick):
+            fleet.tick(self.meta['thrust'], self.dt, integrator)
+        return fleet, integrator, target
+
+def _test_seek():
+    import tempfile
+    from fleet import _random_submarines
+
+    for name in ('rk4', 'rk45'):
+        path = tempfile.mkdtemp()
+        fleet = Fleet(_random_submarines(4))
+        integrator = INTEGRATORS[name]()
+        states = []
+        with ReplayWriter(path, fleet, 0.1, 2e4, name, interval=8) as writer:
+            for tick in range(50):
+                if tick:
+                    fleet.tick(2e4, 0.1, integrator)
+                writer.write(tick, tick*0.1, fleet, integrator)
+                states.append(fleet.block[:, :4].copy())
+
+        replay = Replay(path)
+        assert len(replay.index) == 7 and replay.duration == 4.9
+        for tick in (0, 7, 8, 21, 49):
+            restored, _, at = replay.seek(tick*0.1 + 0.05)
+            assert at == tick
+            assert np.array_equal(restored.block[:, :4], states[tick]), (name, tick)
+
+        # drawing reads the ticks file, halfway between two ticks is halfway between their positions
+        s = replay.positions(2.05)
+        assert np.allclose(s, (states[20][0:3] + states[21][0:3])/2)
+
+def test():
+    _test_seek()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,15 @@
 from __future__ import annotations
 from typing import Any, override
 import abc
-from math import pi as PI, sqrt, sin, cos, atan2
-from vec import VecXZ, VecY, VecX
+from math import pi as PI, atan2
+from vec import Vec, VecXZ, VecY, VecX
 from polytope import SizePolygon, Line, Circle, Cylinder
+from drag import DragTable, reynolds, table
+from resistance_functional import line_projected_areas2d, circle_projected_areas2d, cylinder_projected_areas2d
 
 class ResistantPolygon(SizePolygon):
-    cd: float # drag coefficient
+    cd: float # drag coefficient, when set it's used instead of the shape's table
+    drag: DragTable | None = None # cd by Reynolds number and angle of attack, see drag.py
 
     @staticmethod
     def _projected_area_drag_force(v: Vec, area: float, p: float, cd: float) -> float:
@@ -48,39 +51,110 @@ class ResistantPolygon(SizePolygon):
         return (p * v**2 * area * cd)/2
 
     @abc.abstractmethod
-    def _projected_area(self) -> float:
+    def _projected_area(self, flow: float) -> float:
+        '''the area facing a flow at angle flow (see resistance_functional.flow_angles2d)'''
         pass
 
+    def _drag_length(self) -> float:
+        '''the length the shape's Reynolds number is taken over'''
+        return self.d.x
+
+    def drag_coefficient(self, p: float, speed: float, attack: float = .0) -> float:
+        '''
+        cd moving at speed through a fluid of density p, attack being the angle between the flow and the
+        polygon's axis (see drag.py). a cd set on the polygon wins over its table
+        '''
+        cd = getattr(self, 'cd', None)
+        if cd is not None or self.drag is None:
+            return self.cd
+        return self.drag.cd(reynolds(p, speed, self._drag_length()), attack)
+
     def _drag_force(self, p: float) -> VecXZ:
-        return self.projected_area_drag_force(v, self.projected_area(v), p, self.cd)
+        speed = self.v.magnitude()
+        if not speed:
+            return VecXZ(.0, .0)
+        flow = atan2(self.v.x, self.v.z)
+        attack = self.a.y - flow + PI/2 # across the flow where the projected area is largest
+        return self.v*(-self._projected_area_drag_force(speed, self._projected_area(flow), p, self.drag_coefficient(p, speed, attack))/speed)
 
     def apply_drag_force(self, p: float):
         self.apply_force(self._drag_force(p))
 
 class ResistantLine(ResistantPolygon, Line):
+    drag = table('line')
+
     @override
-    def _projected_area(self) -> float:
-        # positions of both line endpoints
-        p0 = Vec2D(self.s.x - (self.d.x/2)*cos(self.a.y), self.s.z - (self.d.x/2)*sin(self.a.y))
-        p1 = Vec2D(self.s.x + (self.d.x/2)*cos(self.a.y), self.s.z + (self.d.x/2)*sin(self.a.y))
-        return sqrt(d.x**2 - (p1.z-p0.z)**2)
+    def _projected_area(self, flow: float) -> float:
+        return float(line_projected_areas2d(flow, self.a.y, self.d.x))
 
 class ResistantCircle(ResistantPolygon, Circle):
+    drag = table('circle')
+
+    @override
+    def _drag_length(self) -> float:
+        return self.diameter
+
     @override
-    def _projected_area(self) -> float:
-        return PI*(super(self, ResistantLine).projected_area()/2)**2
+    def _projected_area(self, flow: float) -> float:
+        return float(circle_projected_areas2d(flow, self.a.y, self.radius))
 
 class ResistantCylinder(ResistantPolygon, Cylinder):
     cap: ResistantCircle
+    drag = table('cylinder')
 
     @override
-    def _projected_area(self) -> float:
-        # since its a flat projection, we don't need to worry about perspective.
-        # we can simply multiply the diameter by the line's projected area
-        body_area = cap.diameter*super().projected_area()
-
-        # we must also consider the cylinder circle top and bottom, 
-        # however, at least one will always be covered
-        # interestingly, we can pick either of the two circle caps and use it, since
-        # ... either will be the exact same contribution of area
-        return body_area + cap_projected_area() 
+    def _drag_length(self) -> float:
+        return self.cap.diameter
+
+    @override
+    def _projected_area(self, flow: float) -> float:
+        # the body and one cap, see cylinder_projected_areas2d
+        return float(cylinder_projected_areas2d(flow, self.a.y, self.line.d.x, self.cap.radius))
+
+def _shapes() -> list[ResistantPolygon]:
+    '''one of each resistant shape with a mass, at rest at the origin'''
+    from polytope import MassPolygon
+    line = type('Body', (ResistantLine, MassPolygon), {})()
+    line.d = VecX(2.0)
+    circle = type('Body', (ResistantCircle, MassPolygon), {})()
+    circle._diameter = Line()
+    circle._diameter.d = VecX(1.0)
+    cylinder = type('Body', (ResistantCylinder, MassPolygon), {})()
+    cylinder.cap, cylinder.line = Circle(), Line()
+    cylinder.cap._diameter = Line()
+    cylinder.cap._diameter.d, cylinder.line.d = VecX(1.0), VecX(10.0)
+    for shape in (line, circle, cylinder):
+        shape.s, shape.a, shape.p = VecXZ(.0, .0), VecY(.0), 500.0
+    return [line, circle, cylinder]
+
+def _test_drag_force():
+    from resistance_functional import resistant_forces2d
+    import numpy as np
+    for shape in _shapes():
+        shape.a, shape.v = VecY(0.3), VecXZ(.0, .0) # tilted, so no shape is ever end on to the flow
+        shape.apply_drag_force(1025.0) # no flow, no drag
+        assert tuple(shape.v) == (.0, .0)
+
+        for v in ((2.0, .0), (.0, 2.0), (1.5, -1.0)):
+            shape.v = VecXZ(*v)
+            flow = atan2(v[0], v[1])
+            area = shape._projected_area(flow)
+            speed = shape.v.magnitude()
+            cd = shape.drag_coefficient(1025.0, speed, shape.a.y - flow + PI/2)
+            expected = resistant_forces2d(1025.0, np.array(v)[:, None], area, cd)[:, 0] / shape.mass
+            shape.apply_drag_force(1025.0)
+            assert np.allclose(tuple(shape.v), np.array(v) + expected) and area > 0.0 and 0.0 < cd < 2.0
+            assert float(np.dot(np.array(tuple(shape.v)) - v, v)) < 0.0 # against the motion
+
+    line, circle, cylinder = _shapes()
+    assert line._projected_area(.0) == 2.0 and abs(line._projected_area(PI/2)) < 1e-12 # broadside, then end on
+    assert cylinder._projected_area(.0) > cylinder._projected_area(PI/2) # the body across the flow, then only a cap
+
+def test():
+    _test_drag_force()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
@@ -1,65 +1,90 @@
-from math import pi as PI, sqrt, sin, cos, atan2
+'''
+Batched projected area and drag kernels.
+
+The *s2d kernels take numpy arrays (or floats) of angles, dimensions and velocities and broadcast over them,
+so thousands of hull panels are evaluated per call without creating a Python object per panel.
+Vectors are passed D x N like VecArray.data, i.e. velocities as a (2, N) array of x and z rows.
+
+The *2d functions keep the original one shape at a time Vec signatures and wrap the kernels.
+'''
+from __future__ import annotations
+from typing import Union
+from math import pi as PI, atan2
+import numpy as np
 from vec import VecXZ, VecY, VecX
 
-def line_projected_area2d(a: VecY, line_s: VecXZ, line_a: VecY, line_d: VecX) -> float:
-    a_normalized = line_a - a # normalise line angle to the camera
-    # ... assuming that line_a.y = 0 is horizontal projected area of the full line_h
-
-    # positions of both line endpoints
-    p0 = Vec2D(line_s.x - (line_d.x/2)*cos(a_normalized.y), line_s.z - (line_d.x/2)*sin(a_normalized.y))
-    p1 = Vec2D(line_s.x + (line_d.x/2)*cos(a_normalized.y), line_s.z + (line_d.x/2)*sin(a_normalized.y))
-    p2 = Vec2D(p1.x, p2.z) # a third point forming a right angle at p0p2p1
+Scalars = Union[float, np.ndarray]
 
-    # the hypotenuse p0p1 has length line_d.x
-    # p1p2 has length p1.z - p0.z
+# === BATCHED KERNELS ===
 
-    # the camera has no position since its a flat infinite width projection, 
-    # ... so we assume its "positioned" at p1, which forms an angle p2p1p3
-    # ... we want the projected area of the line segment p1p3
+def line_projected_areas2d(a: Scalars, line_a: Scalars, line_d: Scalars) -> Scalars:
+    '''
+    a line of length line_d at angle line_a, seen by a flat projection at angle a.
+    line_a - a = 0 projects the full length, the endpoints p0, p1 then form a right angle
+    triangle whose hypotenuse is the line, so the projection is sqrt(d^2 - (p1.z-p0.z)^2) = d*|cos|
+    '''
+    return line_d*np.abs(np.cos(line_a - a))
 
-    return sqrt(line_h**2 - (p1.z-p0.z)**2)
-
-def circle_projected_area2d(a: VecY, circle_s: VecXZ, circle_a: VecY, circle_r: VecX) -> float:
-    return 2*PI*line_projected_area(a, circle_s, circle_a, circle_r)
+def circle_projected_areas2d(a: Scalars, circle_a: Scalars, circle_r: Scalars) -> Scalars:
+    return 2*PI*line_projected_areas2d(a, circle_a, circle_r)
 
-def cylinder_projected_area2d(a: VecY, cylinder_s: VecXZ, cylinder_a: VecY, cylinder_h: VecX, cylinder_r: VecX) -> float:
+def cylinder_projected_areas2d(a: Scalars, cylinder_a: Scalars, cylinder_h: Scalars, cylinder_r: Scalars) -> Scalars:
     # since its a flat projection, we don't need to worry about perspective.
-    # specifically, we allow the cylinder diameter to be fully projected 
+    # specifically, we allow the cylinder diameter to be fully projected
     # ... over the flat projection, thus:
-    body_area = (2*cylinder_r.x)*line_projected_area(a, cylinder_s, cylinder_a, cylinder_h.x)
+    body_area = (2*cylinder_r)*line_projected_areas2d(a, cylinder_a, cylinder_h)
 
-    # we must also consider the cylinder circle top and bottom, 
+    # we must also consider the cylinder circle top and bottom,
     # however, at least one will always be covered
     # interestingly, we can pick either of the two circle caps and use it, since
     # ... either will be the exact same contribution of area
+    cap_area = circle_projected_areas2d(a, cylinder_a + PI/2, cylinder_r) # the caps are perpendicular to the body
+    return body_area + cap_area
 
-    cap_s = Vec2D(cylinder_s.x - (cylinder_h/2)*cos(a.y), cylinder.s.z - (cylinder_h.x/2)*sin(a.y))
-    cap_a = cylinder_a + PI/2 # the cylinder caps are perpendicular to the cylinder body
-    cap_area = = circle_projected_area(a, cap_s, cap_a, cylinder_r)
+def square_projected_areas2d(a: Scalars, square_a: Scalars, square_dx: Scalars, square_dz: Scalars) -> Scalars:
+    '''the silhouette of a dx by dz rectangle rotated by square_a - a, each side contributes its own projection'''
+    a_normalized = square_a - a
+    return square_dx*np.abs(np.cos(a_normalized)) + square_dz*np.abs(np.sin(a_normalized))
 
-    return body_area + cap_area
+def resistant_forces2d(rho: Scalars, v: np.ndarray, area: Scalars, drag_coeff: Scalars) -> np.ndarray:
+    '''F = -rho*cd*A*|v|*v/2 for (2, N) velocities, i.e. the drag magnitude rho*v^2*A*cd/2 opposing the motion'''
+    return v*(-0.5*rho*drag_coeff*area*np.hypot(v[0], v[1]))
 
-def square_projected_area2d(a: VecY, square_s: VecXZ, square_a: VecY, square_d: VecXZ) -> float:
-    a_normalized = square_s - a
+def flow_angles2d(v: np.ndarray) -> np.ndarray:
+    '''the angle of the oncoming flow for (2, N) velocities'''
+    return np.arctan2(v[0], v[1])
 
-    p00 = VecXZ(square_s.x - (square_d.x/2)*cos(a_normalized), square_s.z - (square_d.z/2)*sin(a_normalized))
-    p10 = VecXZ(p00.x + square_d.x, p00.z)
-    p01 = VecXZ(p00.x, p00.z + square_d.z)
-    p11 = VecXZ(p10.x, p01.z)
+def cylinder_resistant_forces2d(a: Scalars, cylinder_v: np.ndarray, cylinder_h: Scalars, cylinder_r: Scalars, cylinder_drag_coeff: Scalars, medium_rho: Scalars) -> np.ndarray:
+    area = cylinder_projected_areas2d(a, flow_angles2d(cylinder_v), cylinder_h, cylinder_r)
+    return resistant_forces2d(medium_rho, cylinder_v, area, cylinder_drag_coeff)
 
-    p00p10 = sqrt(square_d.x**2 - (p10.z-p00.z)**2)
-    p00p01 = sqrt(square_d.z**2 - (p01.x-p00.x)**2)
+def square_resistant_forces2d(a: Scalars, square_v: np.ndarray, square_dx: Scalars, square_dz: Scalars, square_drag_coeff: Scalars, medium_rho: Scalars) -> np.ndarray:
+    area = square_projected_areas2d(a, flow_angles2d(square_v), square_dx, square_dz)
+    return resistant_forces2d(medium_rho, square_v, area, square_drag_coeff)
 
-    return p00p10*p00p01
+# === SCALAR WRAPPERS ===
+# positions are accepted for compatibility, a flat projection doesn't depend on them
+
+def line_projected_area2d(a: VecY, line_s: VecXZ, line_a: VecY, line_d: VecX) -> float:
+    return float(line_projected_areas2d(a.y, line_a.y, line_d.x))
+
+def circle_projected_area2d(a: VecY, circle_s: VecXZ, circle_a: VecY, circle_r: VecX) -> float:
+    return float(circle_projected_areas2d(a.y, circle_a.y, circle_r.x))
+
+def cylinder_projected_area2d(a: VecY, cylinder_s: VecXZ, cylinder_a: VecY, cylinder_h: VecX, cylinder_r: VecX) -> float:
+    return float(cylinder_projected_areas2d(a.y, cylinder_a.y, cylinder_h.x, cylinder_r.x))
+
+def square_projected_area2d(a: VecY, square_s: VecXZ, square_a: VecY, square_d: VecXZ) -> float:
+    return float(square_projected_areas2d(a.y, square_a.y, square_d.x, square_d.z))
 
 def resistant_force2d(rho: float, v: VecXZ, area: float, drag_coeff: float) -> VecXZ:
-    return rho*v**2*area*drag*coeff/2
+    return VecXZ(resistant_forces2d(rho, np.array(v.components)[:, None], area, drag_coeff)[:, 0].tolist())
 
-def cylinder_resistant_force2d(a: VecY, cylinder_s: VecXZ, cylinder_v: VecXZ, cylinder_r: float, cyclinder_drag_coeff: float, medium_rho: float) -> VecXZ:
+def cylinder_resistant_force2d(a: VecY, cylinder_s: VecXZ, cylinder_v: VecXZ, cylinder_h: VecX, cylinder_r: VecX, cylinder_drag_coeff: float, medium_rho: float) -> VecXZ:
     cylinder_a = VecY(atan2(cylinder_v.x, cylinder_v.z))
-    return resistance_force2d(medium_rho, cylinder_v, cylinder_projected_area2d(a, cylinder_s, cylinder_a, cylinder_r), cylinder_drag_coeff)
+    return resistant_force2d(medium_rho, cylinder_v, cylinder_projected_area2d(a, cylinder_s, cylinder_a, cylinder_h, cylinder_r), cylinder_drag_coeff)
 
 def square_resistant_force2d(a: VecY, square_s: VecXZ, square_v: VecXZ, square_d: VecXZ, square_drag_coeff: float, medium_rho: float) -> VecXZ:
     square_a = VecY(atan2(square_v.x, square_v.z))
     area: float = square_projected_area2d(a, square_s, square_a, square_d)
-    return resistance_force2d(medium_rho, square_v, area, square_drag_coeff)
+    return resistant_force2d(medium_rho, square_v, area, square_drag_coeff)
@@ -0,0 +1,244 @@
+'''
+Multi-rate evaluation of the force terms in Submarine.acceleration.
+
+Buoyancy only changes as fast as the depth does, and the control surface area only with the attitude, yet
+every term is normally evaluated at every integrator stage. A ForceScheduler lets each term declare how stale
+it may get: every `period` ticks, and/or as soon as one of its inputs has moved by more than `tolerance`.
+In between, the term's last value is reused. Terms not mentioned are evaluated every time. A change to the
+parts a term is built from (its state) always evaluates it afresh, whatever its period and tolerance.
+
+    term      inputs                 state                               evaluates
+    area      xa, ya, za             diameter, every surface             Submarine.projected_area
+    friction  area, xv, yv, zv       drag table                          Submarine.friction_force
+    thrust    thrust, xa, ya, za     propeller attitude                  Submarine.thrust_force
+    buoyancy  zs                     every ballast tank's rho and vol    Submarine.buoyant_force
+
+    sub.scheduler = ForceScheduler(period={'buoyancy': 10}, tolerance={'area': 1e-3})
+
+The reused and fresh terms are summed in one place (Submarine._combine), so Submarine.forces always adds up to
+the acceleration returned. With check=True every evaluation also computes every term fresh to measure the
+error of the reused values, and drift() runs a scheduled submarine against an unscheduled twin.
+'''
+from __future__ import annotations
+from typing import Any, Callable
+from math import dist, inf, nan
+import importlib
+from integrators import Integrator
+
+sub3d = importlib.import_module('3d')
+
+TERMS: tuple[str,...] = ('area', 'friction', 'thrust', 'buoyancy')
+
+class Term:
+    '''the cached value of one force term and its counters'''
+    name: str
+    period: float # ticks, inf when only the tolerance applies
+    tolerance: float | None
+    value: Any
+    inputs: tuple[float,...]
+    state: tuple # what the term is built from when value was evaluated, compared exactly
+    tick: int # when value was evaluated
+    evaluations: int
+    skipped: int
+    max_error: float # the largest distance of a reused value from the fresh one, when checked
+    error_sum: float
+    checks: int
+
+    def __init__(self, name: str, period: int | None = None, tolerance: float | None = None):
+        self.name = name
+        self.period = inf if period is None else period
+        self.tolerance = tolerance
+        self.scheduled = period is not None or tolerance is not None
+        self.reset()
+
+    def reset(self):
+        self.value, self.inputs, self.state, self.tick = None, (), (), 0
+        self.evaluations = self.skipped = self.checks = 0
+        self.max_error = self.error_sum = 0.0
+
+    def due(self, tick: int, inputs: tuple[float,...], state: tuple = ()) -> bool:
+        if not self.scheduled or self.value is None or tick - self.tick >= self.period or state != self.state:
+            return True
+        tolerance = self.tolerance
+        return tolerance is not None and any(abs(a - b) > tolerance for a, b in zip(inputs, self.inputs))
+
+    def summary(self) -> dict[str,float]:
+        return {
+            'evaluations': self.evaluations,
+            'skipped': self.skipped,
+            'max_error': self.max_error if self.checks else nan,
+            'mean_error': self.error_sum / self.checks if self.checks else nan,
+        }
+
+class ForceScheduler:
+    ticks: int # advanced by Submarine.tick
+    check: bool
+    terms: dict[str,Term]
+
+    def __init__(self, period: dict[str,int] | None = None, tolerance: dict[str,float] | None = None, check: bool = False):
+        period, tolerance = period or {}, tolerance or {}
+        unknown = (set(period) | set(tolerance)) - set(TERMS)
+        if unknown:
+            raise ValueError(f"unknown force terms {sorted(unknown)}, expected some of {', '.join(TERMS)}")
+        self.terms = {name: Term(name, period.get(name), tolerance.get(name)) for name in TERMS}
+        self.check = check
+        self.ticks = 0
+
+    def advance(self):
+        self.ticks += 1
+
+    def invalidate(self):
+        '''evaluate every term afresh next time, e.g. after 3d.WATER was replaced'''
+        for term in self.terms.values():
+            term.value = None
+
+    def _evaluate(self, name: str, inputs: tuple[float,...], fn: Callable, *args, state: tuple = (), count: bool = True) -> Any:
+        term = self.terms[name]
+        if not term.due(self.ticks, inputs, state):
+            if not count:
+                return term.value
+            term.skipped += 1
+            if self.check:
+                fresh = fn(*args)
+                error = abs(fresh - term.value) if isinstance(fresh, float) else dist(fresh, term.value)
+                term.checks += 1
+                term.error_sum += error
+                term.max_error = max(term.max_error, error)
+            return term.value
+        if not count:
+            return fn(*args)
+        term.value, term.inputs, term.state, term.tick = fn(*args), inputs, state, self.ticks
+        term.evaluations += 1
+        return term.value
+
+    def acceleration(self, sub: sub3d.Submarine, thrust: float, xs: float, ys: float, zs: float, xv: float, yv: float, zv: float, count: bool = True) -> tuple[float,float,float]:
+        '''
+        Submarine.acceleration with each term reused while it is within its period and tolerance. count=False
+        gives the same values but leaves the counters and cached terms alone, e.g. for recording the state
+        '''
+        terms = self.terms
+        xa, ya, za = sub.xa, sub.ya, sub.za
+        # the state is only compared for scheduled terms, the others are evaluated every time anyway
+        state = (sub.diameter, tuple((s.width, s.height, s.xa, s.ya, s.za) for s in sub.surfaces)) if terms['area'].scheduled else ()
+        area = self._evaluate('area', (xa, ya, za), sub.projected_area, state=state, count=count)
+        friction = self._evaluate('friction', (area, xv, yv, zv), sub.friction_force, area, xv, yv, zv, state=(sub.drag,), count=count)
+        p = sub.propeller
+        state = (p.xa, p.ya, p.za) if terms['thrust'].scheduled else ()
+        thrust_f = self._evaluate('thrust', (thrust, xa, ya, za), sub.thrust_force, thrust, state=state, count=count)
+        state = tuple((tank.rho, tank.vol) for tank in sub.ballast_tanks) if terms['buoyancy'].scheduled else ()
+        buoyancy = self._evaluate('buoyancy', (zs,), sub.buoyant_force, xs, ys, zs, state=state, count=count)
+        return sub._combine(thrust_f, buoyancy, friction)
+
+    def report(self) -> dict[str,dict[str,float]]:
+        '''term -> evaluations, skipped, and with check the max and mean error of the reused values'''
+        return {name: term.summary() for name, term in self.terms.items()}
+
+    def reset(self):
+        self.ticks = 0
+        for term in self.terms.values():
+            term.reset()
+
+def drift(make: Callable[[], sub3d.Submarine], scheduler: ForceScheduler, ticks: int, thrust: float, dt: float, integrator: Callable[[], Integrator]) -> dict[str,float]:
+    '''
+    step a scheduled submarine and an unscheduled twin (both from make()) side by side, returns how far apart
+    their positions and velocities got at most
+    '''
+    scheduled, full = make(), make()
+    scheduled.scheduler = scheduler
+    stepper, full_stepper = integrator(), integrator()
+    position = velocity = 0.0
+    for _ in range(ticks):
+        scheduled.tick(thrust, dt, stepper)
+        full.tick(thrust, dt, full_stepper)
+        position = max(position, dist((scheduled.xs, scheduled.ys, scheduled.zs), (full.xs, full.ys, full.zs)))
+        velocity = max(velocity, dist((scheduled.xv, scheduled.yv, scheduled.zv), (full.xv, full.yv, full.zv)))
+    return {'position': position, 'velocity': velocity}
+
+def _sinking() -> sub3d.Submarine:
+    sub = sub3d.Submarine(zs=120.0, ya=0.2)
+    sub.ballast_tanks = [sub3d.BallastTank(10.0, 1100.0)]
+    sub.surfaces = [sub3d.ControlSurface(1.0, 1.0, 0.0, 0.3, 0.1)]
+    return sub
+
+def _test_unscheduled():
+    from integrators import RK4
+    scheduler = ForceScheduler()
+    assert drift(_sinking, scheduler, 50, 2.0, 0.01, RK4) == {'position': 0.0, 'velocity': 0.0}
+    assert all(term['skipped'] == 0 and term['evaluations'] == 200 for term in scheduler.report().values())
+
+def _test_period():
+    from integrators import RK4
+    scheduler = ForceScheduler(period={'buoyancy': 10}, tolerance={'area': 0.0}, check=True)
+    result = drift(_sinking, scheduler, 100, 2.0, 0.01, RK4)
+    report = scheduler.report()
+    assert report['buoyancy']['evaluations'] == 10 and report['buoyancy']['skipped'] == 390
+    assert report['area']['evaluations'] == 1 and report['area']['max_error'] == 0.0 # the attitude never changes
+    assert report['friction']['skipped'] == 0
+    assert 0.0 < report['buoyancy']['max_error'] < 1.0 # newtons, the water barely densens over a few cm
+    assert 0.0 < result['position'] < 1e-4 # metres over a second
+
+    sub = _sinking()
+    sub.scheduler = ForceScheduler(period={'buoyancy': 10})
+    sub.tick(2.0, 0.01, RK4())
+    acceleration = sub.acceleration(2.0, sub.xs, sub.ys, sub.zs + 1.0, sub.xv, sub.yv, sub.zv) # a metre deeper, buoyancy is still the reused value
+    net = [sum(sub.forces[i::3]) for i in range(3)] # the forces add up to the reused sum
+    assert all(abs(f/sub.mass - a) < 1e-12 for f, a in zip(net, acceleration))
+
+def _test_tolerance():
+    from integrators import RK4
+    sub = _sinking()
+    sub.scheduler = scheduler = ForceScheduler(tolerance={'buoyancy': 0.5})
+    stepper = RK4()
+    for _ in range(200):
+        sub.tick(2.0, 0.1, stepper)
+    report = scheduler.report()['buoyancy']
+    assert 1 < report['evaluations'] < 100 and report['evaluations'] + report['skipped'] == 800
+    assert abs(sub.zs - scheduler.terms['buoyancy'].inputs[0]) <= 0.5 + abs(sub.zv)*0.1
+
+    try:
+        ForceScheduler(period={'drag': 2})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('expected a ValueError')
+
+def _test_state():
+    from integrators import RK4
+    sub = _sinking()
+    sub.scheduler = scheduler = ForceScheduler(period={'buoyancy': 1000, 'area': 1000, 'thrust': 1000})
+    sub.tick(2.0, 0.01, RK4())
+    assert scheduler.report()['buoyancy']['evaluations'] == 1
+
+    sub.ballast_tanks[0].rho = 1000.0 # lighter than the water now
+    assert sub.acceleration(2.0, sub.xs, sub.ys, sub.zs, sub.xv, sub.yv, sub.zv)[2] < 0.0 # rises, despite the period
+    assert scheduler.report()['buoyancy']['evaluations'] == 2
+    sub.surfaces[0].width = 3.0
+    sub.propeller.za = 0.2
+    sub.acceleration(2.0, sub.xs, sub.ys, sub.zs, sub.xv, sub.yv, sub.zv)
+    report = scheduler.report()
+    assert report['area']['evaluations'] == 2 and report['thrust']['evaluations'] == 2 and report['buoyancy']['evaluations'] == 2
+
+def _test_count():
+    from integrators import RK4
+    sub = _sinking()
+    sub.scheduler = scheduler = ForceScheduler(period={'buoyancy': 10})
+    stepper = RK4()
+    for _ in range(5):
+        sub.tick(2.0, 0.01, stepper)
+    before = scheduler.report()
+    acceleration = sub.acceleration(2.0, sub.xs, sub.ys, sub.zs, sub.xv, sub.yv, sub.zv, count=False)
+    assert scheduler.report() == before # a look at the state isn't part of the simulation
+    assert acceleration == sub.acceleration(2.0, sub.xs, sub.ys, sub.zs, sub.xv, sub.yv, sub.zv) # the same reused terms
+
+def test():
+    _test_unscheduled()
+    _test_period()
+    _test_tolerance()
+    _test_state()
+    _test_count()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
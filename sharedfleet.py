@@ -0,0 +1,217 @@
+'''
+One large fleet partitioned across processes through shared memory.
+
+The fleet block lives in a multiprocessing.shared_memory segment. Every worker process maps it and wraps its own
+column slice block[:, lo:hi] in a Fleet (Fleet.over), so it ticks its submarines in place. Workers and the
+coordinator meet at a barrier before and after every tick: between ticks the coordinator's own Fleet over the
+whole segment reads (or edits) any submarine without copying, while no worker is writing.
+
+Workers get the 3d.py environment (water column, constants), the sleep settings and the drag table from the
+coordinator, so spawned workers tick the same physics as forked ones. A worker that fails breaks the barrier,
+and the coordinator's tick() raises instead of waiting for it.
+
+Every worker steps its own partition with its own integrator, so an adaptive one (rk45) would pick its step sizes
+from the partition and a submarine's trajectory would depend on the worker count. Those are refused, see
+sweep.py for the same problem with chunks.
+
+    with SharedFleet(submarines, workers=8, thrust=2e4, dt=0.1, integrator='rk4') as shared:
+        for _ in range(ticks):
+            shared.tick()
+            draw(shared.fleet.s) # a view of the shared positions
+'''
+from __future__ import annotations
+from collections.abc import Sequence
+from threading import BrokenBarrierError
+from typing import Any
+from multiprocessing import shared_memory
+import importlib
+import multiprocessing
+import numpy as np
+from checkpoint import ENVIRONMENT
+from drag import DragTable
+from fleet import Fleet, SLEEP_SETTINGS
+from integrators import INTEGRATORS
+from water import WaterColumn
+
+sub3d = importlib.import_module('3d')
+
+_STOP: int = -1
+TIMEOUT: float = 60.0 # seconds to wait at a barrier for the slowest process of a tick before giving up on it
+
+def _environment() -> dict[str,Any]:
+    '''the 3d.py settings a worker needs, the water column as its arrays rather than its lookup lists'''
+    water = sub3d.WATER
+    env = {name: getattr(sub3d, name) for name in ENVIRONMENT}
+    env['WATER'] = (water.depth0, water.step, np.asarray(water.table), water.surface_z)
+    return env
+
+def _worker(name: str, shape: tuple[int,int], lo: int, hi: int, max_tanks: int, max_surfaces: int, environment: dict[str,Any], sleep: dict[str,float], table: DragTable | None, thrust: float, dt: float, integrator: str | None, timeout: float, barrier, command):
+    try:
+        memory = shared_memory.SharedMemory(name=name)
+        try:
+            for key, value in environment.items():
+                setattr(sub3d, key, WaterColumn(*value) if key == 'WATER' else value)
+            block = np.ndarray(shape, dtype=np.float64, buffer=memory.buf)
+            fleet = Fleet.over(block[:, lo:hi], max_tanks, max_surfaces)
+            for key, value in sleep.items():
+                setattr(fleet, key, value)
+            fleet.drag = table
+            stepper = INTEGRATORS[integrator]() if integrator else None
+            while True:
+                barrier.wait() # the coordinator has set the command, it may take as long as it likes between ticks
+                if command.value == _STOP:
+                    break
+                fleet.tick(thrust, dt, stepper)
+                barrier.wait(timeout) # everyone is done with this tick
+            del fleet, block # the views must go before the mapping can close
+        finally:
+            memory.close()
+    except BrokenBarrierError:
+        pass # another process failed, the coordinator reports it
+    except BaseException:
+        barrier.abort() # release everyone else rather than leave them waiting for this worker
+        raise
+
+class SharedFleet:
+    fleet: Fleet # the coordinator's view of the whole segment
+    bounds: list[tuple[int,int]] # each worker's [lo, hi) submarines
+    ticks: int
+
+    def __init__(self, submarines: Sequence[sub3d.Submarine] | Fleet, workers: int | None = None, thrust: float = 2.0, dt: float = 1.0, integrator: str | None = None, start_method: str | None = None, timeout: float = TIMEOUT):
+        if integrator in INTEGRATORS and INTEGRATORS[integrator].adaptive:
+            raise ValueError(f'{integrator} is adaptive and would step each partition differently, use a fixed step integrator, e.g. rk4')
+        private = submarines if isinstance(submarines, Fleet) else Fleet(submarines)
+        n = len(private)
+        workers = min(workers or multiprocessing.cpu_count(), max(n, 1))
+        shape = (private.block.shape[0], n)
+
+        self._memory = shared_memory.SharedMemory(create=True, size=max(shape[0]*shape[1]*8, 1))
+        block = np.ndarray(shape, dtype=np.float64, buffer=self._memory.buf)
+        block[...] = private.block[:, :n]
+        self.fleet = Fleet.over(block, private.max_tanks, private.max_surfaces)
+        self.ticks = 0
+
+        edges = np.linspace(0, n, workers + 1).round().astype(int)
+        self.bounds = [(int(lo), int(hi)) for lo, hi in zip(edges[:-1], edges[1:])]
+
+        sleep = {name: getattr(private, name) for name in SLEEP_SETTINGS}
+        context = multiprocessing.get_context(start_method)
+        self._timeout = timeout
+        self._barrier = context.Barrier(workers + 1)
+        self._command = context.Value('i', 0)
+        self._processes = [
+            context.Process(
+                target=_worker,
+                args=(self._memory.name, shape, lo, hi, private.max_tanks, private.max_surfaces, _environment(), sleep, private.drag, thrust, dt, integrator, timeout, self._barrier, self._command),
+                daemon=True,
+            )
+            for lo, hi in self.bounds
+        ]
+        for process in self._processes:
+            process.start()
+
+    def tick(self):
+        '''advance every partition by one step, returns once all of them have'''
+        try:
+            self._barrier.wait(self._timeout) # start
+            self._barrier.wait(self._timeout) # done
+        except BrokenBarrierError:
+            self._barrier.abort()
+            for process in self._processes:
+                process.join(self._timeout)
+            codes = [process.exitcode for process in self._processes]
+            raise RuntimeError(f'a SharedFleet worker failed or took over {self._timeout}s at tick {self.ticks}, worker exit codes {codes}') from None
+        self.ticks += 1
+
+    def close(self):
+        if self._processes:
+            self._command.value = _STOP
+            try:
+                self._barrier.wait(self._timeout)
+            except BrokenBarrierError:
+                pass # a worker failed, the others have left the barrier too
+            for process in self._processes:
+                process.join(self._timeout)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+        if self._memory is not None:
+            self.fleet = None # drop the views into the segment
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def __enter__(self) -> SharedFleet:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _test_matches_fleet():
+    from fleet import _random_submarines
+    from integrators import RK4
+
+    subs = _random_submarines(50, seed=4)
+    fleet = Fleet(subs)
+    with SharedFleet(subs, workers=3, thrust=2e4, dt=0.1, integrator='rk4') as shared:
+        assert shared.bounds == [(0, 17), (17, 33), (33, 50)]
+        s = shared.fleet.s # a view, it follows the workers' writes
+        for _ in range(10):
+            shared.tick()
+            fleet.tick(2e4, 0.1, RK4())
+        assert np.array_equal(s, fleet.s)
+        assert np.array_equal(shared.fleet.block, fleet.block[:, :50])
+
+def _test_environment():
+    from fleet import _random_submarines
+    from integrators import RK4
+    import drag
+
+    saved = {name: getattr(sub3d, name) for name in ('WATER', 'AREA_QUANTUM')}
+    try:
+        sub3d.WATER = WaterColumn.linear(1000.0, 0.02, max_depth=500.0, g=sub3d.G, surface_z=sub3d.SURFACE_Z) # fresh water
+        sub3d.AREA_QUANTUM = 0.01
+        fleet = Fleet(_random_submarines(20, seed=5))
+        fleet.drag = drag.table('cylinder')
+        with SharedFleet(fleet, workers=2, thrust=2.0, dt=0.01, integrator='rk4', start_method='spawn') as shared:
+            for _ in range(5):
+                shared.tick()
+                fleet.tick(2.0, 0.01, RK4())
+            assert np.array_equal(shared.fleet.block, fleet.block[:, :20]) # the spawned workers see the same profile
+    finally:
+        for name, value in saved.items():
+            setattr(sub3d, name, value)
+
+def _test_failing_worker():
+    from fleet import _random_submarines
+
+    with SharedFleet(_random_submarines(10, seed=6), workers=2, integrator='no such integrator', timeout=10.0) as shared:
+        try:
+            shared.tick()
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError('expected a RuntimeError')
+        assert shared.ticks == 0
+
+def _test_adaptive():
+    from fleet import _random_submarines
+
+    try:
+        SharedFleet(_random_submarines(4, seed=7), workers=2, integrator='rk45')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('expected a ValueError for an adaptive integrator')
+
+def test():
+    _test_matches_fleet()
+    _test_environment()
+    _test_failing_worker()
+    _test_adaptive()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+'''
+Headless batch runner for the 3d.py submarine model.
+
+    python -m submarine run scenario.toml -o run.csv
+    python -m submarine run scenario.toml -o run/ --format columns
+    python -m submarine run scenario.toml --record run.rec
+    python -m submarine run scenario.toml --replay run.replay
+    python -m submarine run scenario.toml --checkpoint run.ckpt --checkpoint-every 10000
+    python -m submarine run scenario.toml --resume run.ckpt
+    python -m submarine run scenario.toml --profile
+    python -m submarine sweep sweep.toml -o results.csv -j 64
+    python -m submarine run scenario.toml --display
+
+Scenarios use the config.toml structure read by main.py ([screen]) plus a [simulation] table and
+[[submarine]] entries. Ticks run at full speed with no frame cap, and pygame is only imported for --display.
+'''
+from __future__ import annotations
+from typing import Any, TextIO
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+import argparse
+import importlib
+import json
+import os
+import sys
+import tomllib
+import numpy as np
+from fleet import Fleet, STATE, SLEEP_SETTINGS
+from integrators import Integrator, INTEGRATORS
+from recorder import Recorder
+import checkpoint
+import profiling
+from replay import ReplayWriter
+from water import WaterColumn
+import drag
+
+sub3d = importlib.import_module('3d')
+
+@dataclass
+class Scenario:
+    cfg: dict[str,Any] # the whole toml document, incl. [screen] for the viewer
+    submarines: list[sub3d.Submarine]
+    dt: float = 1.0
+    ticks: int = 1000
+    thrust: float = 2.0
+    integrator: str | None = None # a key of integrators.INTEGRATORS, None for the original explicit update
+    sleep: dict[str,float] = field(default_factory=dict) # Fleet.sleep_ticks, sleep_speed and sleep_acceleration
+    drag: str | None = None # a drag table, see drag.table. None keeps the constant 3d.DRAG
+
+    def make_integrator(self) -> Integrator | None:
+        return INTEGRATORS[self.integrator]() if self.integrator else None
+
+    def make_fleet(self) -> Fleet:
+        return self.configure(Fleet(self.submarines))
+
+    def configure(self, fleet: Fleet) -> Fleet:
+        '''apply the scenario's fleet settings, e.g. to a fleet restored from a checkpoint'''
+        for name, value in self.sleep.items():
+            setattr(fleet, name, value)
+        if self.drag is not None:
+            fleet.drag = drag.table(self.drag)
+        return fleet
+
+def _make_submarine(spec: dict[str,Any]) -> sub3d.Submarine:
+    spec = dict(spec)
+    propeller = spec.pop('propeller', None)
+    tanks = spec.pop('ballast_tanks', None)
+    surfaces = spec.pop('surfaces', None)
+
+    sub = sub3d.Submarine(**spec)
+    if propeller is not None:
+        sub.propeller = sub3d.Propeller(**propeller)
+    if tanks is not None:
+        sub.ballast_tanks = [sub3d.BallastTank(**tank) for tank in tanks]
+    if surfaces is not None:
+        sub.surfaces = [sub3d.ControlSurface(**surface) for surface in surfaces]
+    return sub
+
+def load_scenario(path: str) -> Scenario:
+    with open(path, 'rb') as cfg_file:
+        cfg = tomllib.load(cfg_file)
+
+    water = cfg.get('water', {})
+    if 'profile' in water: # a CTD cast (.csv) or a saved table (.npy), relative to the scenario
+        sub3d.WATER = WaterColumn.load(os.path.join(os.path.dirname(path), water['profile']), surface_z=sub3d.SURFACE_Z)
+
+    sim = cfg.get('simulation', {})
+    table = sim.get('drag')
+    if table is not None and table not in drag.TABLES: # a measured table, relative to the scenario
+        table = os.path.join(os.path.dirname(path), table)
+    dt = float(sim.get('dt', 1.0))
+    ticks = int(sim['ticks']) if 'ticks' in sim else round(float(sim.get('duration', 1000*dt)) / dt)
+    return Scenario(
+        cfg=cfg,
+        submarines=[_make_submarine(spec) for spec in cfg.get('submarine', [{}])],
+        dt=dt,
+        ticks=ticks,
+        thrust=float(sim.get('thrust', 2.0)),
+        integrator=sim.get('integrator'),
+        sleep={name: sim[name] for name in SLEEP_SETTINGS if name in sim},
+        drag=table,
+    )
+
+# === output ===
+
+COLUMNS: tuple[str,...] = ('tick', 't', 'submarine') + STATE
+
+class CsvWriter:
+    '''one row per submarine per tick'''
+    def __init__(self, out: TextIO):
+        self.out = out
+        self.out.write(','.join(COLUMNS) + '\n')
+
+    def write(self, rows: np.ndarray):
+        np.savetxt(self.out, rows, delimiter=',', fmt='%.17g')
+
+    def close(self):
+        '''close the file written to, stdout is only flushed'''
+        if self.out is sys.stdout:
+            self.out.flush()
+        else:
+            self.out.close()
+
+class ColumnWriter:
+    '''
+    Binary columnar output: a directory holding one raw little endian float64 file per column plus columns.json.
+    Rows are buffered and appended chunk by chunk, every column file can be opened with np.memmap.
+    '''
+    def __init__(self, path: str, chunk: int = 65536):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.files = [open(os.path.join(path, f'{name}.f64'), 'wb') for name in COLUMNS]
+        self.chunk = np.empty((chunk, len(COLUMNS)), dtype='<f8')
+        self.used = 0
+        self.rows = 0
+
+    def write(self, rows: np.ndarray):
+        while len(rows):
+            take = min(len(rows), len(self.chunk) - self.used)
+            self.chunk[self.used:self.used + take] = rows[:take]
+            self.used += take
+            rows = rows[take:]
+            if self.used == len(self.chunk):
+                self._flush()
+
+    def _flush(self):
+        for i, f in enumerate(self.files):
+            self.chunk[:self.used, i].tofile(f)
+        self.rows += self.used
+        self.used = 0
+
+    def close(self):
+        self._flush()
+        for f in self.files:
+            f.close()
+        with open(os.path.join(self.path, 'columns.json'), 'w') as meta:
+            json.dump({'columns': COLUMNS, 'rows': self.rows, 'dtype': '<f8'}, meta)
+
+# === running ===
+
+def run(scenario: Scenario, writer: CsvWriter | ColumnWriter | None = None, every: int = 1, recorder: Recorder | None = None, replay: str | None = None, interval: int = 1024,
+        start: checkpoint.Checkpoint | None = None, checkpoint_path: str | None = None, checkpoint_every: int = 0) -> Fleet:
+    '''
+    step the whole scenario as fast as possible, streaming every nth tick's state to the writer and recorder.
+    a replay directory records every tick plus keyframes every interval ticks.
+    a start checkpoint continues from its tick instead of the scenario's submarines, and with a checkpoint path
+    the whole simulation is saved every checkpoint_every ticks and at the end
+    '''
+    if start is None:
+        fleet, integrator, first = scenario.make_fleet(), scenario.make_integrator(), 0
+    else:
+        fleet, integrator, first = scenario.configure(start.fleet), start.integrator, start.tick
+    replay_writer = ReplayWriter(replay, fleet, scenario.dt, scenario.thrust, scenario.integrator, interval) if replay else None
+
+    n = len(fleet)
+    rows = np.empty((n, len(COLUMNS)))
+    rows[:, 2] = np.arange(n)
+    try:
+        for tick in range(first, scenario.ticks + 1):
+            if checkpoint_path is not None and (tick == scenario.ticks or checkpoint_every and tick > first and tick % checkpoint_every == 0):
+                checkpoint.save(checkpoint_path, checkpoint.Checkpoint(fleet, tick, tick*scenario.dt, integrator))
+            if writer is not None and tick % every == 0:
+                rows[:, 0] = tick
+                rows[:, 1] = tick*scenario.dt
+                rows[:, 3:] = fleet.block[:len(STATE), :n].T
+                writer.write(rows)
+            if recorder is not None and tick % every == 0:
+                recorder.record_fleet(tick, tick*scenario.dt, fleet, scenario.thrust)
+            if replay_writer is not None:
+                replay_writer.write(tick, tick*scenario.dt, fleet, integrator)
+            if tick < scenario.ticks:
+                fleet.tick(scenario.thrust, scenario.dt, integrator)
+    finally:
+        if replay_writer is not None:
+            replay_writer.close()
+    return fleet
+
+def _run(args: argparse.Namespace):
+    if args.display:
+        import main # imports pygame
+        main.main(args.scenario, args.replay)
+        return
+
+    scenario = load_scenario(args.scenario)
+    if args.ticks is not None:
+        scenario.ticks = args.ticks
+    start = checkpoint.load(args.resume) if args.resume else None # also restores the environment it ran in
+
+    if args.output is None:
+        writer = None
+    elif args.format == 'columns':
+        writer = ColumnWriter(args.output)
+    else:
+        writer = CsvWriter(sys.stdout if args.output == '-' else open(args.output, 'w', newline=''))
+    recorder = Recorder(submarines=len(scenario.submarines), path=args.record) if args.record else None
+    if args.profile:
+        profiling.enable()
+    try:
+        fleet = run(scenario, writer, args.every, recorder, args.replay, args.keyframe_interval, start, args.checkpoint, args.checkpoint_every)
+    finally:
+        if writer is not None:
+            writer.close()
+        if recorder is not None:
+            recorder.close()
+        if args.profile:
+            profiling.disable()
+            print(profiling.format_report(), file=sys.stderr)
+
+    if args.output != '-':
+        for sub in fleet:
+            print(sub)
+
+def _sweep(args: argparse.Namespace):
+    from sweep import sweep # imports this module
+    ran = sweep(args.spec, args.output, args.jobs, args.chunk)
+    print(f'{ran} designs run, results in {args.output}')
+
+def main(argv: Sequence[str] | None = None):
+    parser = argparse.ArgumentParser(prog='submarine', description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='step a scenario')
+    run_parser.add_argument('scenario', help='scenario .toml')
+    run_parser.add_argument('-o', '--output', help="per tick state output, a .csv file, '-' for stdout, or a directory with --format columns")
+    run_parser.add_argument('--format', choices=('csv', 'columns'), default='csv')
+    run_parser.add_argument('-r', '--record', help='binary trajectory recording (state, forces by category, ballast fill), see recorder.load')
+    run_parser.add_argument('--replay', help='replay directory to write, or with --display an existing one to scrub through')
+    run_parser.add_argument('--keyframe-interval', type=int, default=1024, help='ticks between replay keyframes, the most a seek resimulates')
+    run_parser.add_argument('--checkpoint', help='save the whole simulation here every --checkpoint-every ticks and at the end')
+    run_parser.add_argument('--checkpoint-every', type=int, default=0)
+    run_parser.add_argument('--resume', help='continue from a checkpoint (e.g. of a crashed run, or to fork a scenario from it)')
+    run_parser.add_argument('--every', type=int, default=1, help='only write every nth tick')
+    run_parser.add_argument('--ticks', type=int, help='override the scenario tick count')
+    run_parser.add_argument('--profile', action='store_true', help='time the tick stages and print a report to stderr, see profiling.py')
+    run_parser.add_argument('--display', action='store_true', help='open the pygame viewer instead of running headless')
+    run_parser.set_defaults(func=_run)
+
+    sweep_parser = commands.add_parser('sweep', help='run a grid or random sweep of submarine designs over a process pool')
+    sweep_parser.add_argument('spec', help='sweep .toml, see sweep.py')
+    sweep_parser.add_argument('-o', '--output', default='results.csv', help='results table, designs already in it are skipped')
+    sweep_parser.add_argument('-j', '--jobs', type=int, help='worker processes, defaults to the core count')
+    sweep_parser.add_argument('--chunk', type=int, default=64, help='designs per work item, each chunk is stepped as one fleet')
+    sweep_parser.set_defaults(func=_sweep)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
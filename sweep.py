@@ -0,0 +1,250 @@
+'''
+Parameter sweeps and Monte Carlo runs over submarine designs.
+
+    python -m submarine sweep sweep.toml -o results.csv -j 64
+
+A sweep spec names a scenario (for dt, duration, thrust, integrator and water), which of its submarines is the
+base design, and the parameters to vary as dotted paths into that submarine's spec:
+
+    scenario = "scenario.toml"
+    mode = "grid"       # every combination, or "random" for `samples` draws
+    [parameters]
+    length = [60, 80, 100]                            # listed values (random: picked uniformly)
+    diameter = { min = 3.0, max = 8.0, num = 6 }       # grid: linspace, random: uniform in [min, max)
+    "ballast_tanks.0.vol" = [5.0, 10.0, 20.0]
+
+Designs are numbered, and a random design is drawn from its own seeded generator, so any design can be
+regenerated on its own. Chunks of designs go to a process pool, each chunk runs as one vectorised Fleet, and
+finished rows are appended to the results file straight away. Rerunning with the same output skips the designs
+already in it.
+
+A chunk shares one integrator, so an adaptive one (rk45) would pick its step sizes for the whole chunk and a
+design's result would depend on which designs it was chunked with. Sweeps run those scenarios with the fixed
+step FIXED_STEP integrator instead, which keeps every design's result the same however the sweep is chunked.
+'''
+from __future__ import annotations
+from typing import Any
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
+import csv
+import itertools
+import os
+import tomllib
+import numpy as np
+from fleet import Fleet
+from integrators import INTEGRATORS, Integrator
+from submarine import Scenario, load_scenario, _make_submarine
+
+METRICS: tuple[str,...] = ('top_speed', 'depth_stability', 'time_to_neutral', 'final_depth')
+NEUTRAL_SPEED: float = 0.01 # m/s, vertical speed below which a submarine counts as neutrally buoyant
+FIXED_STEP: str = 'rk4' # the integrator used instead of an adaptive one, see above
+
+class SweepSpec:
+    scenario: str
+    submarine: int # index of the base design in the scenario
+    mode: str
+    samples: int
+    seed: int
+    parameters: dict[str,Any]
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            spec = tomllib.load(f)
+        self.scenario = os.path.join(os.path.dirname(path), spec['scenario'])
+        self.submarine = spec.get('submarine', 0)
+        self.mode = spec.get('mode', 'grid')
+        self.samples = spec.get('samples', 100)
+        self.seed = spec.get('seed', 0)
+        self.parameters = spec['parameters']
+        if self.mode not in ('grid', 'random'):
+            raise ValueError(f"unknown sweep mode {self.mode!r}, expected 'grid' or 'random'")
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.parameters)
+
+    def __len__(self) -> int:
+        if self.mode == 'random':
+            return self.samples
+        return int(np.prod([len(self._grid_values(values)) for values in self.parameters.values()]))
+
+    @staticmethod
+    def _grid_values(values: Any) -> list[Any]:
+        if isinstance(values, dict):
+            return np.linspace(values['min'], values['max'], values.get('num', 2)).tolist()
+        return list(values)
+
+    def design(self, i: int) -> dict[str,Any]:
+        '''the parameters of design i'''
+        if self.mode == 'grid':
+            grids = [self._grid_values(values) for values in self.parameters.values()]
+            choice = []
+            for values in reversed(grids): # the last parameter varies fastest, like itertools.product
+                i, k = divmod(i, len(values))
+                choice.append(values[k])
+            return dict(zip(self.names, reversed(choice)))
+
+        rng = np.random.default_rng([self.seed, i])
+        design = {}
+        for name, values in self.parameters.items():
+            if isinstance(values, dict):
+                design[name] = float(rng.uniform(values['min'], values['max']))
+            else:
+                design[name] = values[int(rng.integers(len(values)))]
+        return design
+
+def _apply(spec: dict[str,Any], design: dict[str,Any]) -> dict[str,Any]:
+    '''a copy of a submarine spec with dotted paths (e.g. ballast_tanks.0.vol) set'''
+    spec = copy.deepcopy(spec)
+    for path, value in design.items():
+        *parents, leaf = path.split('.')
+        node = spec
+        for key in parents:
+            if isinstance(node, list):
+                node = node[int(key)]
+            else:
+                node = node.setdefault(key, {})
+        if isinstance(node, list):
+            node[int(leaf)] = value
+        else:
+            node[leaf] = value
+    return spec
+
+# === workers ===
+
+_worker: tuple[SweepSpec, Scenario] | None = None
+
+def _init_worker(spec_path: str):
+    '''load the spec and scenario (and with it any water profile) once per process'''
+    global _worker
+    spec = SweepSpec(spec_path)
+    _worker = spec, load_scenario(spec.scenario)
+
+def _integrator(scenario: Scenario) -> Integrator | None:
+    '''the scenario's integrator, or FIXED_STEP in place of an adaptive one'''
+    integrator = scenario.make_integrator()
+    if integrator is not None and integrator.adaptive:
+        return INTEGRATORS[FIXED_STEP]()
+    return integrator
+
+def evaluate(spec: SweepSpec, scenario: Scenario, indices: Sequence[int]) -> list[list[Any]]:
+    '''run a chunk of designs side by side as one fleet, one result row per design'''
+    base = scenario.cfg.get('submarine', [{}])[spec.submarine]
+    designs = [spec.design(i) for i in indices]
+    fleet = scenario.configure(Fleet([_make_submarine(_apply(base, design)) for design in designs]))
+    integrator = _integrator(scenario)
+    n, dt, ticks = len(fleet), scenario.dt, scenario.ticks
+
+    top_speed = np.zeros(n)
+    last_moving = np.full(n, np.nan) # nan until it moves vertically at all
+    depth_sum, depth_sum2, settle_ticks = np.zeros(n), np.zeros(n), 0
+    for tick in range(1, ticks + 1):
+        fleet.tick(scenario.thrust, dt, integrator)
+        v = fleet.v
+        np.maximum(top_speed, np.sqrt((v*v).sum(axis=0)), out=top_speed)
+        last_moving[np.abs(v[2]) >= NEUTRAL_SPEED] = tick*dt
+        if 2*tick > ticks: # depth statistics over the second half of the run
+            zs = fleet.zs[:n]
+            depth_sum += zs
+            depth_sum2 += zs*zs
+            settle_ticks += 1
+
+    mean = depth_sum / max(settle_ticks, 1)
+    depth_stability = np.sqrt(np.maximum(depth_sum2 / max(settle_ticks, 1) - mean*mean, 0.0))
+    # neutral from the last time it was still moving vertically, never (nan) if it still is at the end or never moved
+    time_to_neutral = np.where(last_moving < ticks*dt, last_moving, np.nan)
+
+    return [
+        [i, *designs[k].values(), top_speed[k], depth_stability[k], time_to_neutral[k], fleet.zs[k]]
+        for k, i in enumerate(indices)
+    ]
+
+def _evaluate_chunk(indices: Sequence[int]) -> list[list[Any]]:
+    return evaluate(*_worker, indices)
+
+# === driver ===
+
+def _done(output: str) -> set[int]:
+    if not os.path.exists(output):
+        return set()
+    with open(output, newline='') as f:
+        return {int(row['design']) for row in csv.DictReader(f)}
+
+def _chunks(indices: list[int], size: int) -> Iterator[list[int]]:
+    for start in range(0, len(indices), size):
+        yield indices[start:start + size]
+
+def sweep(spec_path: str, output: str, workers: int | None = None, chunk: int = 64) -> int:
+    '''run every design not already in output, returns how many were run'''
+    spec = SweepSpec(spec_path)
+    done = _done(output)
+    todo = [i for i in range(len(spec)) if i not in done]
+
+    new = not os.path.exists(output) or os.path.getsize(output) == 0
+    with open(output, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(['design', *spec.names, *METRICS])
+            f.flush()
+
+        if workers == 1: # in process, handy for debugging and profiling
+            _init_worker(spec_path)
+            for indices in _chunks(todo, chunk):
+                writer.writerows(_evaluate_chunk(indices))
+                f.flush()
+            return len(todo)
+
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(spec_path,)) as pool:
+            futures = [pool.submit(_evaluate_chunk, indices) for indices in _chunks(todo, chunk)]
+            for future in as_completed(futures):
+                writer.writerows(future.result())
+                f.flush() # an interrupted sweep keeps every finished chunk
+    return len(todo)
+
+def _test_designs():
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), 'sweep.toml')
+    with open(path, 'w') as f:
+        f.write('scenario = "s.toml"\n[parameters]\nlength = [60, 80]\ndiameter = { min = 3.0, max = 5.0, num = 3 }\n"ballast_tanks.0.vol" = [1.0]\n')
+    spec = SweepSpec(path)
+    assert len(spec) == 6
+    assert [spec.design(i) for i in range(6)] == [
+        dict(zip(spec.names, values)) for values in itertools.product([60, 80], [3.0, 4.0, 5.0], [1.0])
+    ]
+
+    spec.mode, spec.parameters = 'random', {'length': {'min': 50, 'max': 150}, 'propeller.za': [0.0, 0.1]}
+    assert spec.design(3) == spec.design(3) and spec.design(3) != spec.design(4)
+
+    base = {'length': 100, 'propeller': {'ya': 3.14}, 'ballast_tanks': [{'vol': 10.0}]}
+    applied = _apply(base, {'length': 60, 'propeller.za': 0.1, 'ballast_tanks.0.vol': 5.0})
+    assert applied == {'length': 60, 'propeller': {'ya': 3.14, 'za': 0.1}, 'ballast_tanks': [{'vol': 5.0}]}
+    assert base['ballast_tanks'][0]['vol'] == 10.0
+
+def _test_chunking():
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), 'sweep.toml')
+    with open(path, 'w') as f:
+        f.write('scenario = "s.toml"\n[parameters]\n"ballast_tanks.0.vol" = [0.0, 10.0]\n"ballast_tanks.0.rho" = [1100.0, 2000.0]\n')
+    spec = SweepSpec(path)
+    base = {'length': 100, 'diameter': 5, 'zs': 150.0, 'propeller': {'ya': 3.141592653589793}, 'ballast_tanks': [{'vol': 10.0, 'rho': 1025.0}]}
+    scenario = Scenario(cfg={'submarine': [base]}, submarines=[], dt=0.1, ticks=100, thrust=2e4, integrator='rk45')
+
+    together = np.array(evaluate(spec, scenario, [0, 1, 2, 3]), dtype=float)
+    alone = np.array([evaluate(spec, scenario, [i])[0] for i in range(4)], dtype=float)
+    assert np.array_equal(together, alone, equal_nan=True) # a design's result doesn't depend on its chunk
+    assert np.isnan(together[:2, -2]).all() and (together[:2, -1] == 150.0).all() # an empty tank never moves vertically, never neutral
+
+    scenario.drag = 'cylinder' # the scenario's fleet settings reach the sweep's fleet
+    tabled = np.array(evaluate(spec, scenario, [2, 3]), dtype=float)
+    assert not np.array_equal(tabled[:, 3], together[2:, 3]) # top speed under the table's cd, not the constant's
+
+def test():
+    _test_designs()
+    _test_chunking()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
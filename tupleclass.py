@@ -1,55 +1,76 @@
 from __future__ import annotations
-from typing import Any
-from collections.abc import Mapping
-from dataclasses import dataclass, field, fields, MISSING, make_dataclass
+from typing import Any, ClassVar, get_type_hints
+from collections.abc import Iterable, Iterator
 import functools
-import io
+import numpy as np
+
+_tuple_new = tuple.__new__
+
+# builtin field types and their structured array counterparts, other annotations must be numpy scalar types
+_NUMPY_TYPES: dict[type,type] = {float: np.float64, int: np.int64, bool: np.bool_, complex: np.complex128}
+
+def _is_classvar(annotation: Any) -> bool:
+    if isinstance(annotation, str): # from __future__ import annotations
+        return annotation.startswith(('ClassVar', 'typing.ClassVar'))
+    return annotation is ClassVar or getattr(annotation, '__origin__', None) is ClassVar
+
+def _create_fn(name: str, args: str, body: list[str], namespace: dict[str,Any]) -> Any:
+    '''compile a function from source, as dataclasses and namedtuple do, so field access isn't looked up per call'''
+    src = f'def {name}({args}):\n' + '\n'.join(f'    {line}' for line in body)
+    exec(src, namespace)
+    return namespace[name]
 
 class _TupleClassMeta(type):
     '''The metaclass of TupleClass (see below for TupleClass)'''
-    def __new__(cls, name, bases, dct):
-        annotations = dct.get('__annotations__', {})
-        new_cls = make_dataclass(name, [(name, typ, field(default=MISSING)) for name, typ in annotations.items()], bases=bases) # pass tuple superclass in here in bases
-        new_cls.__module__ = dct.get('__module__')
-        for key, value in dct.items():
-            if key != '__annotations__':
-                setattr(new_cls, key, value)
-
-        # don't actually use the tuple superclass's __new__
-        # TODO if superclass is a subclass of TupleClass, then make smart constructor chain
-        original_new = new_cls.__new__
-        def __new__(cls, *args, **kwargs):
-            instance = original_new(cls, tuple(args)) # convert args to tuple
-            for name, value in zip([f.name for f in fields(cls)], args):
-                setattr(instance, name, value)
-            for name, value in kwargs.items():
-                setattr(instance, name, value)
-            return instance
-        setattr(new_cls, '__new__', __new__)
-
-        # add an __iter__ method to enable emulated tuple unpacking
-        def __iter__(self):
-            field_names = list(self.__annotations__.keys())
-            for f in field_names:
-                yield getattr(self, f)
-        setattr(new_cls, '__iter__', __iter__)
-
-        # pseudo-tuple index access
-        def __getitem__(self, key: int) -> Any:
-            return getattr(self, list(self.__annotations__.keys())[key])
-        setattr(new_cls, '__getitem__', __getitem__)
-
-        # pseudo-tuple index set
-        def __setitem__(self, key: int, val: Any):
-            setattr(self, list(self.__annotations__.keys())[key], val)
-        setattr(new_cls, '__setitem__', __setitem__)
-
-        # pretty tuple print
-        def __str__(self):
-            return self.__class__.__name__ + str(tuple(self))
-        setattr(new_cls, '__str__', __str__)        
-
-        # TODO: __repr__ that prints also the field names
+    def __new__(mcs, name, bases, dct):
+        new_cls = super().__new__(mcs, name, bases, dct)
+
+        # fields are gathered along the whole inheritance chain, base classes first, like dataclasses
+        field_names: dict[str,None] = {}
+        for base in reversed(new_cls.__mro__):
+            for field_name, annotation in base.__dict__.get('__annotations__', {}).items():
+                if not _is_classvar(annotation):
+                    field_names[field_name] = None
+        fields = tuple(field_names)
+        # ... and defaults are the nearest class attribute of that name, not tuple methods like index or count
+        defaults: dict[str,Any] = {}
+        for base in new_cls.__mro__:
+            if isinstance(base, _TupleClassMeta):
+                for f in fields:
+                    if f not in defaults and f in base.__dict__:
+                        defaults[f] = base.__dict__[f]
+        new_cls._fields = fields
+        new_cls._field_defaults = defaults
+
+        # fields without defaults come first in the constructor, so a subclass may add required fields
+        # ... after its parent's defaulted ones. the tuple itself stays in declaration order
+        required = [f for f in fields if f not in defaults]
+        optional = [f for f in fields if f in defaults]
+        values = ''.join(f'{f}, ' for f in fields)
+        self_values = ''.join(f'_self.{f}, ' for f in fields)
+        namespace = {'_tuple_new': _tuple_new, '_fields': fields, **{f'_default_{f}': defaults[f] for f in optional}}
+
+        generated = {
+            '__new__': _create_fn('__new__', ', '.join(['_cls', *required, *(f'{f}=_default_{f}' for f in optional)]), [
+                f'_self = _tuple_new(_cls, ({values}))',
+                '_self.__dict__ = {' + ', '.join(f'{f!r}: {f}' for f in fields) + '}',
+                'return _self',
+            ], namespace),
+            # emulated tuple unpacking
+            '__iter__': _create_fn('__iter__', '_self', [f'return iter(({self_values}))'], namespace),
+            # pseudo-tuple index access
+            '__getitem__': _create_fn('__getitem__', '_self, key', [
+                'if key.__class__ is int:',
+                '    return getattr(_self, _fields[key])',
+                f'return ({self_values})[key]',
+            ], namespace),
+            # pseudo-tuple index set
+            '__setitem__': _create_fn('__setitem__', '_self, key, val', ['setattr(_self, _fields[key], val)'], namespace),
+        }
+        for fn_name, fn in generated.items():
+            if fn_name not in dct:
+                fn.__qualname__ = f'{name}.{fn_name}'
+                setattr(new_cls, fn_name, fn)
 
         return new_cls
 
@@ -58,26 +79,57 @@ class TupleClass(tuple, metaclass=_TupleClassMeta):
     '''
     Mutable Named pseudo-Tuple.
 
-    Acts just like a regular NamedTuple and thus a normal tuple, but, is really a subclass of a dataclass instance. 
+    Acts just like a regular NamedTuple and thus a normal tuple, but its fields can be reassigned.
 
     Requires each specified field to be typed, since in Python, we can only determine dynamic fields via typed __annotations__.
+    Fields are inherited, positional constructor arguments fill the fields without defaults first.
 
-    Doesn't allow inhertance.
+    CPython doesn't allow non-empty __slots__ on tuple subclasses, so field values live in the instance __dict__,
+    which is also the fastest place to read them from. Every tuple operation (iteration, indexing, ==, hash, in,
+    +, *, count, index, pickling) reads the fields, so it sees reassigned values. The tuple storage only holds the
+    values at construction: C code that reads tuples directly, like json and %-formatting, wants tuple(record).
     '''
-    def __init__(self, *args, **kwargs):
-        field_names = list(self.__annotations__.keys())
-        if len(args) > len(field_names):
-            raise TypeError(f"Expected at most {len(field_names)} arguments, got {len(args)}")
-
-        # set all default
-        for name in field_names:
-            if not hasattr(self, name): # perhaps a default was already provided
-                setattr(self, name, None)
-
-        for name, value in zip(field_names, args):
-            setattr(self, name, value)
-        for name, value in kwargs.items():
-            setattr(self, name, value)
+    __slots__ = ()
+    _fields: ClassVar[tuple[str,...]]
+    _field_defaults: ClassVar[dict[str,Any]]
+
+    @classmethod
+    def _make(cls, iterable: Iterable[Any]) -> TupleClass:
+        '''construct from values in field order'''
+        return cls(**dict(zip(cls._fields, iterable)))
+
+    def __reduce__(self):
+        return self.__class__._make, (tuple(self),)
+
+    # === structured array layout ===
+
+    @classmethod
+    def dtype(cls) -> np.dtype:
+        '''the structured record layout of this class, one numpy field per tuple field'''
+        if '_dtype' not in cls.__dict__:
+            hints = get_type_hints(cls)
+            layout = []
+            for f in cls._fields:
+                dtype = np.dtype(_NUMPY_TYPES.get(hints[f], hints[f]))
+                if dtype.hasobject or dtype.itemsize == 0:
+                    raise TypeError(f'{cls.__name__}.{f}: {hints[f]!r} has no fixed size record layout')
+                layout.append((f, dtype))
+            cls._dtype = np.dtype(layout)
+        return cls.__dict__['_dtype']
+
+    @classmethod
+    def view(cls, data: np.ndarray, i: int) -> TupleClass:
+        '''a record whose fields read and write row i of a structured array with this class' dtype'''
+        if '_view_class' not in cls.__dict__:
+            cls._view_class = _make_view_class(cls)
+        return cls.__dict__['_view_class'](data, i)
+
+    # pretty tuple print
+    def __str__(self):
+        return self.__class__.__name__ + str(tuple(self))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({', '.join(f'{f}={getattr(self, f)!r}' for f in self._fields)})"
 
     # allow tuple equivalence w/ total_ordering
     def __eq__(self, other):
@@ -86,36 +138,156 @@ class TupleClass(tuple, metaclass=_TupleClassMeta):
     def __lt__(self, other):
         return tuple(self) < tuple(other)
 
+    # the rest of tuple's methods would read the tuple storage, which isn't updated by assignments
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __contains__(self, value):
+        return value in tuple(self)
+
+    def __add__(self, other):
+        return tuple(self) + other
+
+    def __radd__(self, other):
+        return other + tuple(self)
+
+    def __mul__(self, count):
+        return tuple(self)*count
+
+    __rmul__ = __mul__
+
+    def count(self, value) -> int:
+        return tuple(self).count(value)
+
+    def index(self, value, *args) -> int:
+        return tuple(self).index(value, *args)
+
+def _row_field(name: str) -> property:
+    def get(self):
+        return self._row[name]
+    def set(self, value):
+        self._row[name] = value
+    return property(get, set)
+
+def _make_view_class(cls: type[TupleClass]) -> type[TupleClass]:
+    n = len(cls._fields)
+
+    def __new__(view_cls, data: np.ndarray, i: int):
+        self = _tuple_new(view_cls)
+        self._row = data[i] # a structured scalar sharing the array's memory
+        return self
+
+    def __len__(self) -> int:
+        return n # the tuple storage is empty, the values live in the array
+
+    def __reduce__(self):
+        return cls._make, (tuple(self),) # pickles detach into an owning record
+
+    dct = {f: _row_field(f) for f in cls._fields}
+    dct.update(__new__=__new__, __len__=__len__, __reduce__=__reduce__, __module__=cls.__module__, __qualname__=f'{cls.__qualname__}.View')
+    # type.__new__ directly, the inherited accessors already go through the properties
+    return type.__new__(_TupleClassMeta, f'{cls.__name__}View', (cls,), dct)
+
+class TupleArray:
+    '''
+    Many TupleClass records stored as rows of one structured numpy array.
+
+    Indexing gives a record view onto that row, so reads and writes through .x or [i] hit the array directly.
+    Field names give whole columns (strided views), for bulk operations over every record at once:
+
+        log = TupleArray(State, 1000)
+        log.xs += log.xv*dt
+        log[3].xs # a single row
+    '''
+    record: type[TupleClass]
+    data: np.ndarray
+
+    def __init__(self, record: type[TupleClass], data: int | np.ndarray = 0):
+        object.__setattr__(self, 'record', record)
+        if isinstance(data, int):
+            data = np.zeros(data, dtype=record.dtype())
+        elif data.dtype != record.dtype():
+            raise TypeError(f'expected dtype {record.dtype()}, got {data.dtype}')
+        object.__setattr__(self, 'data', data)
+
+    @classmethod
+    def from_records(cls, record: type[TupleClass], records: Iterable[Iterable[Any]]) -> TupleArray:
+        return cls(record, np.array([tuple(r) for r in records], dtype=record.dtype()))
+
+    @classmethod
+    def frombuffer(cls, record: type[TupleClass], buffer: Any, count: int = -1, offset: int = 0) -> TupleArray:
+        '''records over an existing buffer (mmap, shared memory, bytearray) without copying'''
+        return cls(record, np.frombuffer(buffer, dtype=record.dtype(), count=count, offset=offset))
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, key: int | slice) -> TupleClass | TupleArray:
+        if isinstance(key, slice):
+            return TupleArray(self.record, self.data[key])
+        return self.record.view(self.data, key)
+
+    def __setitem__(self, key: int | slice, value: Iterable[Any]):
+        self.data[key] = tuple(value)
+
+    def __iter__(self) -> Iterator[TupleClass]:
+        view = self.record.view
+        for i in range(len(self.data)):
+            yield view(self.data, i)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[name]
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        if name in self.record._fields:
+            return self.data[name]
+        raise AttributeError(f'{self.__class__.__name__!r} object has no attribute {name!r}')
+
+    def __setattr__(self, name: str, value: Any):
+        if name in self.record._fields:
+            self.data[name] = value # in place, so log.xs += 1 writes the array
+        else:
+            object.__setattr__(self, name, value)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.record.__name__}, {len(self)} records)'
+
 def _make_dummy_TupleClass() -> type:
     class Dummy(TupleClass):
         x: int # no default
         y: str = 'default'
-    
+
     return Dummy
 
 def _test_tuple_behavior():
     Dummy = _make_dummy_TupleClass()
-        
+
     # a Dummy is a subclass of tuple (not really, but python thinks so)
     assert issubclass(Dummy, tuple)
-    
+
     # a Dummy is a tuple
     d = Dummy(10,'hi')
     assert isinstance(d, tuple)
     assert isinstance(d, Dummy)
     assert d[0] == 10
     assert d[1] == 'hi'
+    assert d[-1] == 'hi'
+    assert d[:1] == (10,)
     assert d == (10, 'hi')
     assert list(d) == [10, 'hi']
     assert len(d) == 2
+    assert len(Dummy(10)) == 2
 
 def _test_named_tuple_behavior():
-    Dummy = _make_dummy_TupleClass() 
+    Dummy = _make_dummy_TupleClass()
 
     # a Dummy is a NamedTuple
     d = Dummy(10,'hi')
     assert d.x == 10
     assert d.y == 'hi'
+    assert Dummy._fields == ('x', 'y')
+    assert repr(d) == "Dummy(x=10, y='hi')"
+    assert str(d) == "Dummy(10, 'hi')"
 
     # a Dummy supports defaults
     assert Dummy(10).y == 'default'
@@ -125,12 +297,47 @@ def _test_named_tuple_behavior():
     assert Dummy(x=10) == (10, 'default')
     assert Dummy(10,y='hi') == (10, 'hi')
 
+    try:
+        Dummy()
+        assert False, 'missing x'
+    except TypeError:
+        pass
+
 def _test_mutability():
     d = _make_dummy_TupleClass()(10,'hi')
 
     d.x = 11
     assert d.x == 11
 
+    d[1] = 'bye'
+    assert d.y == 'bye'
+    assert d == (11, 'bye')
+
+def _test_mutated_tuple():
+    d = _make_dummy_TupleClass()(10,'hi')
+    d.x = 11
+    d[1] = 'bye'
+
+    # every tuple operation sees the reassigned fields
+    assert hash(d) == hash((11, 'bye'))
+    assert 11 in d and 10 not in d
+    assert d + ('!',) == (11, 'bye', '!') and ('!',) + d == ('!', 11, 'bye')
+    assert d*2 == (11, 'bye')*2 and 2*d == d*2
+    assert d.count(11) == 1 and d.index('bye') == 1
+    assert tuple(d) == (11, 'bye') and list(reversed(d)) == ['bye', 11] and d[::-1] == ('bye', 11)
+    assert '%s %s' % tuple(d) == '11 bye'
+    assert {d: 1}[(11, 'bye')] == 1
+
+class _Pickled(TupleClass): # module level, so pickle can find it
+    x: int
+    y: str = 'default'
+
+def _test_pickle():
+    import pickle
+    d = _Pickled(10)
+    d.y = 'changed'
+    assert pickle.loads(pickle.dumps(d)) == (10, 'changed')
+
 def _test_inheritance():
     class A(TupleClass):
         a: str = 'a'
@@ -141,6 +348,7 @@ def _test_inheritance():
     b = B()
     assert b.a == 'a'
     assert b.b == 'b'
+    assert b == ('a', 'b')
 
 def _test_inheritance_no_defaults_b():
     class A(TupleClass):
@@ -152,6 +360,7 @@ def _test_inheritance_no_defaults_b():
     b = B('b')
     assert b.a == 'a'
     assert b.b == 'b'
+    assert b == ('a', 'b')
 
 def _test_inheritance_no_defaults_a():
     class A(TupleClass):
@@ -161,8 +370,8 @@ def _test_inheritance_no_defaults_a():
         b: str = 'b'
 
     b = B('a')
-    #assert b.a == 'a' # FAIL
-    assert b.b == 'a'
+    assert b.a == 'a'
+    assert b.b == 'b'
 
 def _test_inheritance_no_defaults_ab():
     class A(TupleClass):
@@ -171,48 +380,67 @@ def _test_inheritance_no_defaults_ab():
     class B(A):
         b: str
 
-    #b = B('a', 'b') # ERROR TypeError: Expected at most 1 arguments, got 2
-    #assert b.a == 'a'
-    #assert b.b == 'b'
+    b = B('a', 'b')
+    assert b.a == 'a'
+    assert b.b == 'b'
+    assert len(b) == 2
+
+class _State(TupleClass): # module level, so get_type_hints can resolve it
+    xs: float
+    xv: float
+    tick: int = 0
+
+def _test_dtype():
+    assert _State.dtype() == np.dtype([('xs', np.float64), ('xv', np.float64), ('tick', np.int64)])
+
+    class Bad(TupleClass):
+        name: str
+    try:
+        Bad.dtype()
+        assert False, 'str has no fixed size'
+    except TypeError:
+        pass
+
+def _test_array_views():
+    log = TupleArray(_State, 4)
+    log.xv = 2.0
+    log.xs += log.xv*0.5
+    assert (log.data['xs'] == 1.0).all()
+
+    # views read and write the shared row
+    row = log[2]
+    assert isinstance(row, _State) and isinstance(row, tuple)
+    row.xs = 5.0
+    row[2] = 7
+    assert log.data[2]['xs'] == 5.0 and log.data[2]['tick'] == 7
+    log.data['xv'][2] = 3.0
+    assert row.xv == 3.0
+    assert row == (5.0, 3.0, 7) and len(row) == 3
+    assert _State._make(row) == row
+
+    # slices and raw buffers share memory too
+    log[1:3].xs = -1.0
+    assert list(log.xs) == [1.0, -1.0, -1.0, 1.0]
+    buffer = bytearray(log.data.tobytes())
+    shared = TupleArray.frombuffer(_State, buffer)
+    assert shared[3] == log[3]
+    assert TupleArray.from_records(_State, [_State(1.0, 2.0)]).data[0]['xv'] == 2.0
 
 def test():
     _test_tuple_behavior()
     _test_named_tuple_behavior()
     _test_mutability()
+    _test_mutated_tuple()
+    _test_pickle()
     _test_inheritance()
     _test_inheritance_no_defaults_a()
-    _test_inheritance_no_defaults_b() # FAIL
-    _test_inheritance_no_defaults_ab() # FAIL
+    _test_inheritance_no_defaults_b()
+    _test_inheritance_no_defaults_ab()
+    _test_dtype()
+    _test_array_views()
 
 def main():
     test()
 
 if __name__ == '__main__':
     main()
-
-'''
-# Mutple, FieldTuple
-# Field, tupdleif 
-
-class ABSTRACT: # fake top inheritance ceiling that we will want to exclude from __mro__ loop
-    pass
-
-class A(ABSTRACT):
-    a: str = 'a'
-
-class B(A):
-    b: str = 'b'
-
-class C(B):
-    c: str = 'c'
-
-    #def __new__(cls, *args, **kwargs):
-        #filter(lambda x: issubclass(x, ABSTRACT) and x != ABSTRACT, reversed(cls.__mro__)):
-#            print(t)
-
-    def __init__(self, *args, **kwargs):
-        for t in filter(lambda x: issubclass(x, ABSTRACT) and x != ABSTRACT, reversed(self.__class__.__mro__)):
-            print(t)
-
-c = C()
-```
@@ -1,17 +1,44 @@
 from __future__ import annotations
-from typing import Union, Callable, Literal
-from collections.abc import Sequence, Iterator
-import itertools
-import functools
-import operator
+from typing import Any, Union
+from collections.abc import Callable, Sequence, Iterator
+import contextlib
+import threading
+from array import array
+from math import sqrt
+from sys import getrefcount
+import numpy as np
+
+def _pack(components: Sequence) -> Union[array, list]:
+    '''numeric components live in a contiguous double buffer, anything else (e.g. child polytopes) stays a list'''
+    try:
+        return array('d', components)
+    except TypeError:
+        return list(components)
 
 class Vec[T]:
-    components: list[T]
+    components: Union[array, list[T]]
+    axes: str = '' # component names, shared with the matching VecArray type
+
+    # keep numpy from broadcasting over our components, so ndarray*Vec reaches __rmul__
+    __array_ufunc__ = None
 
     def __init__(self, *args):
-        self.components = args
-        if len(args) == 1 and isinstance(args[0], (list, tuple)):
-            self.components = args[0]
+        if len(args) == 1 and isinstance(args[0], (list, tuple, array)):
+            args = args[0]
+        self.components = _pack(args)
+
+    def _new(self, components: Union[array, list[T]]) -> Vec[T]:
+        '''wrap an already packed buffer in a vector of the same type, skipping __init__'''
+        vec = object.__new__(self.__class__)
+        vec.components = components
+        return vec
+
+    def copy(self) -> Vec[T]:
+        return self._new(self.components[:])
+
+    def _as_array(self) -> VecArray:
+        '''this vector as a single row VecArray of the matching type'''
+        return _ARRAY_TYPES.get(self.axes, VecArray)(np.array(self.components, dtype=float)[:, None])
 
     def __getitem__(self, idx: int) -> T:
         return self.components[idx]
@@ -28,67 +55,102 @@ class Vec[T]:
     def __iter__(self) -> Iterator[T]:
         return iter(self.components)
 
-    def _expand_other(self, other: Union[Vec[T],T]) -> Vec[T]:
-        if isinstance(other, Vec[T]):
-            return other
-        elif isinstance(other, Sequence):
-            return Vec(other)
-        else:
-            return Vec([other]*len(self.components))
-
-    @staticmethod
-    def _make_expanded_other(f: Callable) -> Callable:
-        #return functools.partialmethod(f,) # TODO shorter alternative
-        @functools.wraps(f)
-        def _f(self, *args, **kwargs) -> Any:
-            return f(self, self._expand_other(args[0]), *args[1:], **kwargs)
-        return _f
-
-    @staticmethod
-    def _fmap(f: Callable[T,T]) -> Callable[T,Vec]:
-        def _map(vec: Vec[T]) -> Vec[T]: 
-            return Vec([*map(f, vec.components)])
-        return _map
-
-    @staticmethod
-    def _fmap2(f: Callable[T,T]) -> Callable[T,Vec[T]]:
-        def _map2_1(vec1: Vec[T]) -> Vec[T]: 
-            def _map2_2(vec2: Vec[T]) -> Vec[T]: 
-                return Vec([*itertools.starmap(f, zip(vec1.components, vec2.components))])
-            return _map2_2
-        return _map2_1
-
     def magnitude(self) -> T:
-        return sum(self**2)
+        return sqrt(self**2)
 
     def direction(self) -> Vec[T]:
         return self / self.magnitude()
 
+    # === out of place operators, each allocates exactly one new buffer ===
+
     def __neg__(self) -> Vec[T]:
-        return self._fmap(operator.neg)(self)
+        out = self.copy()
+        out *= -1
+        return out
 
-    @_make_expanded_other
-    def __add__(self, other: Vec) -> Vec:
-        return self._fmap2(operator.add)(self)(other)
+    def __add__(self, other: Union[Vec[T],Sequence[T],T]) -> Vec[T]:
+        if isinstance(other, VecArray):
+            return other + self
+        out = self.copy()
+        out += other
+        return out
 
-    @_make_expanded_other
-    def __sub__(self, other: Vec) -> Vec:
-        return self._fmap2(operator.add)(self)(-other)
+    __radd__ = __add__
 
-    @_make_expanded_other
-    def __mul__(self, other: Vec) -> float:
-        return sum(self._fmap2(operator.mul)(self)(other).components)
+    def __sub__(self, other: Union[Vec[T],Sequence[T],T]) -> Vec[T]:
+        if isinstance(other, VecArray):
+            return -other + self
+        out = self.copy()
+        out -= other
+        return out
 
-    def __pow__(self, p: int) -> float:
-        return sum(self._fmap(lambda x: x**p)(self).components)
+    def __rsub__(self, other: Union[Vec[T],Sequence[T],T]) -> Vec[T]:
+        out = -self
+        out += other
+        return out
+
+    def __mul__(self, other: Union[Vec[T],Sequence[T],T]) -> Union[Vec[T],T]:
+        '''dot product with another vector, or scaling by a scalar (or by each scalar of an array)'''
+        if isinstance(other, VecArray):
+            return other * self
+        if isinstance(other, np.ndarray):
+            return self._as_array() * other
+        if isinstance(other, (int, float)):
+            out = self.copy()
+            out *= other
+            return out
+        c = self.components
+        return sum(c[i]*o for i, o in enumerate(other))
 
-    @_make_expanded_other
-    def __iadd__(self, other: Vec):
-        self.components = self.__add__(other).components
+    __rmul__ = __mul__
+
+    def __truediv__(self, k: T) -> Vec[T]:
+        out = self.copy()
+        out /= k
+        return out
+
+    def __pow__(self, p: int) -> T:
+        return sum(x**p for x in self.components)
+
+    # === in place operators, these write straight into the existing buffer ===
+
+    def __iadd__(self, other: Union[Vec[T],Sequence[T],T]) -> Vec[T]:
+        c = self.components
+        if isinstance(other, (int, float)):
+            for i in range(len(c)):
+                c[i] += other
+        else:
+            for i, o in enumerate(other):
+                c[i] += o
+        return self
+
+    def __isub__(self, other: Union[Vec[T],Sequence[T],T]) -> Vec[T]:
+        c = self.components
+        if isinstance(other, (int, float)):
+            for i in range(len(c)):
+                c[i] -= other
+        else:
+            for i, o in enumerate(other):
+                c[i] -= o
+        return self
+
+    def __imul__(self, k: T) -> Vec[T]:
+        '''scales in place, only scalars are accepted since Vec*Vec is a dot product'''
+        c = self.components
+        for i in range(len(c)):
+            c[i] *= k
+        return self
+
+    def __itruediv__(self, k: T) -> Vec[T]:
+        c = self.components
+        for i in range(len(c)):
+            c[i] /= k
         return self
 
 class VecXZ[T](Vec[T]):
     '''for 2d position, force, velocity, acceleration vectors'''
+    axes = 'xz'
+
     @property
     def x(self) -> T:
         return self.components[0]
@@ -99,18 +161,24 @@ class VecXZ[T](Vec[T]):
 
 class VecX[T](Vec[T]):
     '''for 2d line length vectors'''
+    axes = 'x'
+
     @property
     def x(self) -> T:
         return self.components[0]
 
-class VecY[T](Vec[T]): 
+class VecY[T](Vec[T]):
     '''for 2d angle vectors'''
+    axes = 'y'
+
     @property
     def y(self) -> T:
         return self.components[0]
 
 class VecXYZ[T](Vec[T]):
     '''for 3d position, force, velocity, acceleration vectors'''
+    axes = 'xyz'
+
     @property
     def x(self) -> T:
         return self.components[0]
@@ -121,4 +189,610 @@ class VecXYZ[T](Vec[T]):
 
     @property
     def z(self) -> T:
-        return self.components[3]
+        return self.components[2]
+
+# === BATCHED VECTORS ===
+
+class VecArray:
+    '''
+    N vectors of the same dimension D, stored as a D x N float array.
+
+    Behaves like a Vec whose components are whole columns: iterating, indexing and len() work on the D components,
+    so code written against Vec (e.g. functools.reduce over Polytope.d) runs unchanged over N bodies at once.
+    Scalar results of Vec (dot products, magnitude, **) become arrays of N scalars.
+    '''
+    data: np.ndarray
+    axes: str = ''
+
+    __array_ufunc__ = None
+
+    def __init__(self, *args):
+        if len(args) == 1 and isinstance(args[0], np.ndarray) and args[0].ndim == 2:
+            self.data = args[0]
+        else:
+            self.data = np.array(args, dtype=float)
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence[float]]) -> VecArray:
+        '''build from N rows of D components, e.g. a list of Vec'''
+        return cls(np.ascontiguousarray(np.array(rows, dtype=float).T))
+
+    @classmethod
+    def zeros(cls, n: int, dims: int = 0) -> VecArray:
+        return cls(np.zeros((dims or len(cls.axes), n)))
+
+    def _new(self, data: np.ndarray) -> VecArray:
+        vecs = object.__new__(self.__class__)
+        vecs.data = data
+        return vecs
+
+    def copy(self) -> VecArray:
+        return self._new(self.data.copy())
+
+    @property
+    def count(self) -> int:
+        '''the number of vectors (rows)'''
+        return self.data.shape[1]
+
+    def row(self, idx: int) -> Vec:
+        return _VEC_TYPES.get(self.axes, Vec)(self.data[:, idx].tolist())
+
+    def __getitem__(self, idx: int) -> np.ndarray:
+        return self.data[idx]
+
+    def __setitem__(self, idx: int, val: Union[np.ndarray,float]):
+        self.data[idx] = val
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return iter(self.data)
+
+    def __repr__(self):
+        return f'Vectors({self.data.shape[0]}x{self.data.shape[1]})'
+
+    @staticmethod
+    def _operand(other: Union[VecArray,Vec,Sequence,np.ndarray,float]) -> Union[np.ndarray,float]:
+        '''
+        broadcastable against a D x N array:
+        VecArray -> D x N, Vec or sequence -> D x 1 (same vector for all rows), N array -> 1 x N (a scalar per row)
+        '''
+        if isinstance(other, VecArray):
+            return other.data
+        if isinstance(other, (int, float)):
+            return other
+        if isinstance(other, np.ndarray):
+            return other if other.ndim == 2 else other[None, :]
+        return np.asarray(other.components if isinstance(other, Vec) else other, dtype=float)[:, None]
+
+    def magnitude(self) -> np.ndarray:
+        return np.sqrt(self**2)
+
+    def direction(self) -> VecArray:
+        return self / self.magnitude()
+
+    def __neg__(self) -> VecArray:
+        return self._new(-self.data)
+
+    def __add__(self, other) -> VecArray:
+        return self._new(self.data + self._operand(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> VecArray:
+        return self._new(self.data - self._operand(other))
+
+    def __rsub__(self, other) -> VecArray:
+        return self._new(self._operand(other) - self.data)
+
+    def __mul__(self, other) -> Union[VecArray,np.ndarray]:
+        '''row-wise dot product with vectors, or scaling by a scalar (or by each scalar of an N array)'''
+        if isinstance(other, (VecArray, Vec, list, tuple)):
+            return np.einsum('ij,ij->j', self.data, np.broadcast_to(self._operand(other), self.data.shape))
+        return self._new(self.data * self._operand(other))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, k) -> VecArray:
+        return self._new(self.data / self._operand(k))
+
+    def __pow__(self, p: int) -> np.ndarray:
+        return (self.data**p).sum(axis=0)
+
+    def __iadd__(self, other) -> VecArray:
+        self.data += self._operand(other)
+        return self
+
+    def __isub__(self, other) -> VecArray:
+        self.data -= self._operand(other)
+        return self
+
+    def __imul__(self, k) -> VecArray:
+        self.data *= self._operand(k)
+        return self
+
+    def __itruediv__(self, k) -> VecArray:
+        self.data /= self._operand(k)
+        return self
+
+class VecArrayXZ(VecArray):
+    '''batched VecXZ'''
+    axes = 'xz'
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[0]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.data[1]
+
+class VecArrayX(VecArray):
+    '''batched VecX'''
+    axes = 'x'
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[0]
+
+class VecArrayY(VecArray):
+    '''batched VecY'''
+    axes = 'y'
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data[0]
+
+class VecArrayXYZ(VecArray):
+    '''batched VecXYZ'''
+    axes = 'xyz'
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data[1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.data[2]
+
+_VEC_TYPES: dict[str,type] = {cls.axes: cls for cls in (VecXZ, VecX, VecY, VecXYZ)}
+_ARRAY_TYPES: dict[str,type] = {cls.axes: cls for cls in (VecArrayXZ, VecArrayX, VecArrayY, VecArrayXYZ)}
+
+# === LAZY EXPRESSIONS ===
+
+class VecExpr(Vec):
+    '''
+    A Vec operation not evaluated yet, built by the Vec operators inside lazy(). Scaling, dividing, negating,
+    adding and subtracting it only grow the tree, everything else (reading .components, indexing, iterating,
+    a dot product, v += expr) evaluates the whole tree in one fused pass without intermediate vectors.
+
+    Vector leaves are the vectors' buffers themselves, not copies. An in place operator inside lazy() gives its
+    vector a fresh buffer when an expression may still read the current one (see _writable), so changing a
+    vector afterwards (v += a) doesn't change an expression already built from it, just as with eager operators.
+    It is a Vec, so isinstance checks and the Vec methods see the evaluated result.
+    '''
+    __slots__ = ('key', 'leaves', 'like', '_value')
+    key: int # the structure, an index into _TREES
+    leaves: tuple # the vector buffers, sequences and scalars in the order the structure visits them
+    like: Vec # the first vector leaf, whose type and length the result takes
+
+    __array_ufunc__ = None
+
+    def __init__(self, key: int, leaves: tuple, like: Vec):
+        self.key, self.leaves, self.like, self._value = key, leaves, like, None
+
+    @staticmethod
+    def _operand(other) -> tuple[int, tuple] | None:
+        '''the structure and leaves of an operand, None for operands that can't be deferred (e.g. VecArray)'''
+        if isinstance(other, VecExpr):
+            return other.key, other.leaves
+        if isinstance(other, (int, float)):
+            return SCALAR, (other,)
+        if isinstance(other, Vec):
+            return VECTOR, (other.components,)
+        if isinstance(other, (list, array)):
+            return VECTOR, (other[:],) # not ours to guard, see _writable
+        if isinstance(other, tuple):
+            return VECTOR, (other,)
+        return None
+
+    @classmethod
+    def build(cls, op: str, a, b=None) -> VecExpr | None:
+        '''a op b (or op a, for negation) as a tree, None if an operand can't be deferred'''
+        left, right = cls._operand(a), (None, ()) if b is None else cls._operand(b)
+        if left is None or right is None:
+            return None
+        like = a.like if isinstance(a, VecExpr) else a if isinstance(a, Vec) else b.like if isinstance(b, VecExpr) else b
+        return _expr(_node(op, left[0], right[0]), left[1] + right[1], like)
+
+    def evaluate(self) -> Vec:
+        '''the result as a new vector of the type of the first vector leaf, evaluated once and then kept'''
+        if self._value is None:
+            like = self.like
+            vec = object.__new__(like.__class__)
+            vec.components = _kernel(self.key, len(like.components), '')(*self.leaves)
+            self._value = vec
+        return self._value
+
+    @property
+    def components(self) -> array:
+        return self.evaluate().components
+
+    @property
+    def axes(self) -> str:
+        return self.like.axes
+
+    def _new(self, components: array) -> Vec:
+        return self.like._new(components)
+
+    def __getattr__(self, name: str) -> Any: # x, z, magnitude(), copy() ... of the result
+        if name.startswith('_'): # e.g. unset slots while copying, or numpy probing for its protocols
+            raise AttributeError(name)
+        return getattr(self.evaluate(), name)
+
+    def __getitem__(self, idx: int) -> float:
+        return self.evaluate().components[idx]
+
+    def __len__(self):
+        return len(self.like)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self.evaluate().components)
+
+    def __repr__(self):
+        return f'Lazy{self.evaluate()!r}'
+
+    def __neg__(self) -> VecExpr:
+        return _expr(_node('-', self.key, None), self.leaves, self.like)
+
+    def __add__(self, other) -> Union[VecExpr,VecArray]:
+        expr = VecExpr.build('+', self, other)
+        return self.evaluate() + other if expr is None else expr
+
+    __radd__ = __add__
+
+    def __sub__(self, other) -> Union[VecExpr,VecArray]:
+        expr = VecExpr.build('-', self, other)
+        return self.evaluate() - other if expr is None else expr
+
+    def __rsub__(self, other) -> Union[VecExpr,VecArray]:
+        expr = VecExpr.build('-', other, self)
+        return other - self.evaluate() if expr is None else expr
+
+    def __mul__(self, other) -> Union[VecExpr,VecArray,float]:
+        if isinstance(other, (int, float)):
+            return _expr(_node('*', self.key, SCALAR), self.leaves + (other,), self.like)
+        return self.evaluate() * other
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, k) -> Union[VecExpr,VecArray]:
+        if isinstance(k, (int, float)):
+            return _expr(_node('/', self.key, SCALAR), self.leaves + (k,), self.like)
+        return self.evaluate() / k
+
+    def __pow__(self, p: int) -> float:
+        return self.evaluate()**p
+
+_new_object = object.__new__
+
+def _expr(key: int, leaves: tuple, like: Vec) -> VecExpr:
+    '''VecExpr(key, leaves, like) without the __init__ call, the operators build one per node'''
+    expr = _new_object(VecExpr)
+    expr.key, expr.leaves, expr.like, expr._value = key, leaves, like, None
+    return expr
+
+# tree structures, interned so a structure is a small int that is cheap to hash: _TREES[key] is the vector
+# ... leaf, the scalar leaf, or (op, left key, right key or None for negation)
+_TREES: list[str | tuple] = ['v', 's']
+_STRUCTURES: dict[tuple,int] = {}
+VECTOR: int = 0
+SCALAR: int = 1
+
+def _node(op: str, a: int, b: int | None) -> int:
+    '''the key of the structure a op b'''
+    key = _STRUCTURES.get((op, a, b))
+    if key is None:
+        key = _STRUCTURES[(op, a, b)] = len(_TREES)
+        _TREES.append((op, a, b))
+    return key
+
+_SCALED: int = _node('*', VECTOR, SCALAR)
+_DIVIDED: int = _node('/', VECTOR, SCALAR)
+_NEGATED: int = _node('-', VECTOR, None)
+
+# structure, length and mode -> generated function, see _kernel
+_KERNELS: dict[tuple,Callable] = {}
+
+def _source(key: int, i: int, leaf: list[int]) -> str:
+    '''component i of a structure as a python expression over the arguments a0, a1 ... in visiting order'''
+    tree = _TREES[key]
+    if isinstance(tree, str):
+        j = leaf[0]
+        leaf[0] += 1
+        return f'a{j}' if tree == 's' else f'a{j}[{i}]'
+    op, a, b = tree
+    if b is None:
+        return f'(-{_source(a, i, leaf)})'
+    left = _source(a, i, leaf)
+    return f'({left} {op} {_source(b, i, leaf)})'
+
+def _kernel(key: int, n: int, mode: str) -> Callable:
+    '''
+    a function evaluating every component of a structure in one unrolled pass, generated on first use.
+    mode '' returns a new buffer, '+' and '-' add into or subtract from the buffer passed first
+    '''
+    kernel = _KERNELS.get((key, n, mode))
+    if kernel is None:
+        components = [_source(key, i, [0]) for i in range(n)]
+        args = ', '.join(f'a{j}' for j in range(_count(key)))
+        if mode:
+            body = '\n'.join(f'    c[{i}] {mode}= {e}' for i, e in enumerate(components)) or '    pass'
+            source = f'def kernel(c, {args}):\n{body}\n'
+        else:
+            source = f"def kernel({args}):\n    return array('d', ({''.join(e + ', ' for e in components)}))\n"
+        scope = {'array': array}
+        exec(source, scope)
+        kernel = _KERNELS[(key, n, mode)] = scope['kernel']
+    return kernel
+
+def _count(key: int) -> int:
+    '''the number of leaves in a structure'''
+    tree = _TREES[key]
+    if isinstance(tree, str):
+        return 1
+    return _count(tree[1]) + (tree[2] is not None and _count(tree[2]))
+
+def _writable(vec: Vec) -> Union[array, list]:
+    '''
+    the buffer an in place operator may write into. while anything besides the vector holds its buffer (most
+    likely an expression that hasn't been evaluated yet) the vector gets a fresh copy instead, so expressions
+    keep seeing the values they were built from without copying every leaf up front
+    '''
+    c = vec.components
+    if getrefcount(c) > 3: # the vector, c and getrefcount's own argument
+        c = vec.components = c[:]
+    return c
+
+# the scalar operators build their one node directly, they are most of the hot force paths
+# each falls back to the eager operator on threads outside a lazy() block
+def _lazy_neg(self: Vec) -> Union[VecExpr,Vec]:
+    if not _local.depth:
+        return _EAGER['__neg__'](self)
+    return _expr(_NEGATED, (self.components,), self)
+
+def _lazy_add(self: Vec, other) -> Union[VecExpr,Vec,VecArray]:
+    expr = VecExpr.build('+', self, other) if _local.depth else None
+    return _EAGER['__add__'](self, other) if expr is None else expr # e.g. a VecArray operand
+
+def _lazy_sub(self: Vec, other) -> Union[VecExpr,Vec,VecArray]:
+    expr = VecExpr.build('-', self, other) if _local.depth else None
+    return _EAGER['__sub__'](self, other) if expr is None else expr
+
+def _lazy_rsub(self: Vec, other) -> Union[VecExpr,Vec]:
+    expr = VecExpr.build('-', other, self) if _local.depth else None
+    return _EAGER['__rsub__'](self, other) if expr is None else expr
+
+def _lazy_mul(self: Vec, other) -> Union[VecExpr,VecArray,float]:
+    if isinstance(other, (int, float)) and _local.depth:
+        return _expr(_SCALED, (self.components, other), self)
+    return _EAGER['__mul__'](self, other) # dot products and arrays stay eager
+
+def _lazy_truediv(self: Vec, k) -> Union[VecExpr,Vec]:
+    if isinstance(k, (int, float)) and _local.depth:
+        return _expr(_DIVIDED, (self.components, k), self)
+    return _EAGER['__truediv__'](self, k)
+
+# the in place operators guard the buffer on every thread, other threads may read this one's expressions
+def _lazy_iadd(self: Vec, other) -> Vec:
+    c = _writable(self)
+    if isinstance(other, VecExpr) and other._value is None:
+        key = (other.key, len(c), '+')
+        (_KERNELS.get(key) or _kernel(*key))(c, *other.leaves)
+        return self
+    return _EAGER['__iadd__'](self, other)
+
+def _lazy_isub(self: Vec, other) -> Vec:
+    c = _writable(self)
+    if isinstance(other, VecExpr) and other._value is None:
+        key = (other.key, len(c), '-')
+        (_KERNELS.get(key) or _kernel(*key))(c, *other.leaves)
+        return self
+    return _EAGER['__isub__'](self, other)
+
+def _lazy_imul(self: Vec, k) -> Vec:
+    _writable(self)
+    return _EAGER['__imul__'](self, k)
+
+def _lazy_itruediv(self: Vec, k) -> Vec:
+    _writable(self)
+    return _EAGER['__itruediv__'](self, k)
+
+def _lazy_setitem(self: Vec, idx: int, val):
+    _writable(self)[idx] = val
+
+# the Vec operators lazy() swaps in, and the originals it puts back
+_LAZY: dict[str,Callable] = {
+    '__neg__': _lazy_neg,
+    '__add__': _lazy_add,
+    '__radd__': _lazy_add,
+    '__sub__': _lazy_sub,
+    '__rsub__': _lazy_rsub,
+    '__mul__': _lazy_mul,
+    '__rmul__': _lazy_mul,
+    '__truediv__': _lazy_truediv,
+    '__iadd__': _lazy_iadd,
+    '__isub__': _lazy_isub,
+    '__imul__': _lazy_imul,
+    '__itruediv__': _lazy_itruediv,
+    '__setitem__': _lazy_setitem,
+}
+_EAGER: dict[str,Callable] = {name: vars(Vec)[name] for name in _LAZY}
+
+class _Local(threading.local):
+    depth: int = 0 # how deeply this thread is nested in lazy() blocks
+
+_local: _Local = _Local()
+_threads: int = 0 # threads inside a lazy() block, the lazy operators are on Vec while there are any
+_lock: threading.Lock = threading.Lock()
+
+@contextlib.contextmanager
+def lazy():
+    '''
+    defer Vec arithmetic inside the block: operators build VecExpr trees, evaluated in one fused pass on
+    v += expr, on assignment to a Polytope or when their components are read. e.g. in
+
+        with vec.lazy():
+            body.apply_buoyant_force(p, g) # v += -p*volume*g / mass
+
+    no intermediate vector is allocated. Only the calling thread is lazy: the operators are swapped on the Vec
+    class while any thread is inside a block, and stay eager on the others (e.g. a PhysicsLoop). Blocks may nest.
+    Swapping them costs some tens of microseconds per outermost block, so a block should cover a whole tick's
+    worth of expressions rather than each one
+    '''
+    global _threads
+    local = _local
+    if not local.depth:
+        with _lock:
+            if not _threads:
+                for name, method in _LAZY.items():
+                    setattr(Vec, name, method)
+            _threads += 1
+    local.depth += 1
+    try:
+        yield
+    finally:
+        local.depth -= 1
+        if not local.depth:
+            with _lock:
+                _threads -= 1
+                if not _threads:
+                    for name, method in _EAGER.items():
+                        setattr(Vec, name, method)
+
+def is_lazy() -> bool:
+    '''whether the calling thread is inside a lazy() block'''
+    return _local.depth > 0
+
+def _test_inplace():
+    v, f = VecXZ(1.0, 2.0), VecXZ(3.0, -4.0)
+    buffer = v.components
+    v += f
+    v -= 0.5
+    v *= 2.0
+    v /= 4.0
+    v += [1.0, 1.0]
+    assert v.components is buffer and tuple(v) == (2.75, -0.25) # the same buffer, written in place
+    assert tuple(f) == (3.0, -4.0)
+    v = VecXZ(1.0, 2.0)
+    v += f / 2.0 # the update Polytope.apply_force does every tick
+    assert tuple(v) == tuple(VecXZ(1.0, 2.0) + f / 2.0) == (2.5, .0)
+
+def _test_vecarray_arithmetic():
+    a = VecArrayXZ.from_rows([(1.0, 2.0), (3.0, 4.0), (0.0, -2.0)])
+    assert (len(a), a.count) == (2, 3) and a.data.flags.c_contiguous
+    assert np.array_equal((a + VecXZ(1.0, -1.0)).data, [[2.0, 4.0, 1.0], [1.0, 3.0, -3.0]]) # one Vec for every row
+    assert np.array_equal((a - a).data, np.zeros((2, 3))) and np.array_equal((1.0 - a).data, 1.0 - a.data)
+    assert np.array_equal((a + np.array([1.0, 2.0, 3.0])).data, a.data + [1.0, 2.0, 3.0]) # one scalar per row
+    assert np.array_equal(a*VecXZ(1.0, 1.0), [3.0, 7.0, -2.0]) and np.array_equal(a*a, [5.0, 25.0, 4.0])
+    assert np.array_equal((2.0*a).data, 2*a.data) and np.array_equal(a**2, a*a)
+    assert np.array_equal(a.magnitude(), [5**0.5, 5.0, 2.0])
+    assert np.allclose(a.direction().magnitude(), 1.0) and np.allclose(a.direction().data[:, 1], [0.6, 0.8])
+    assert type(a + a) is VecArrayXZ and type(-a) is VecArrayXZ and type(a.row(1)) is VecXZ and tuple(a.row(1)) == (3.0, 4.0)
+
+    b = a.copy()
+    data = b.data
+    b += VecXZ(1.0, 1.0)
+    b -= a
+    b *= np.array([1.0, 2.0, 3.0])
+    b /= 2.0
+    assert b.data is data and np.array_equal(b.data, [[0.5, 1.0, 1.5]]*2) # in place, broadcast like the operators
+    assert np.array_equal(a.data, [[1.0, 3.0, 0.0], [2.0, 4.0, -2.0]])
+
+def _test_vecarray_views():
+    a = VecArrayXZ.zeros(3)
+    a.x[1], a.z[2] = 5.0, -1.0 # the axes are views onto the rows of data
+    assert np.array_equal(a.data, [[0.0, 5.0, 0.0], [0.0, 0.0, -1.0]])
+    a[1] = 2.0
+    assert np.array_equal(a.z, [2.0]*3) and [list(c) for c in a] == a.data.tolist()
+    xyz = VecArrayXYZ(np.arange(6.0).reshape(3, 2))
+    assert np.array_equal(xyz.y, [2.0, 3.0]) and tuple(xyz.row(0)) == (0.0, 2.0, 4.0)
+
+def _test_lazy():
+    g, f, v = VecXZ(.0, 9.81), VecXZ(3.0, -4.0), VecXZ(1.0, 2.0)
+    eager = v.copy()
+    eager += -1025.0*2.5*g / 7.0
+    eager -= 3.0 - f
+    with lazy():
+        expr = -1025.0*2.5*g / 7.0
+        assert isinstance(expr, VecExpr) and is_lazy()
+        v += expr # fused straight into v's buffer
+        v -= 3.0 - f
+        assert isinstance(-f, VecExpr) and (f*f) == 25.0 # dot products stay eager
+        assert isinstance(f + VecArrayXZ.zeros(2), VecArrayXZ)
+        scaled = (f + g)*2.0
+        assert (-g).z == -9.81 and [*(-g)] == [-.0, -9.81] and (1.0 + g).magnitude() == VecXZ(1.0, 10.81).magnitude()
+    assert not is_lazy() and not isinstance(-f, VecExpr)
+    assert tuple(v) == tuple(eager) # the same operations in the same order, to the bit
+    assert type(scaled.evaluate()) is VecXZ and scaled.evaluate() is scaled.evaluate()
+    assert (scaled.x, scaled[1], len(scaled)) == (6.0, 2*(-4.0 + 9.81), 2)
+
+    with lazy(), lazy(): # nested blocks restore the eager operators once the outer one ends
+        pass
+    assert Vec.__add__ is _EAGER['__add__']
+
+def _test_lazy_snapshot():
+    s, v, a = VecXZ(.0, .0), VecXZ(1.0, 2.0), VecXZ(.0, -1.0)
+    eager_s, eager_v = s.copy(), v.copy()
+    eager_ds = eager_v*0.5
+    eager_v += a
+    eager_s += eager_ds
+    with lazy():
+        ds = v*0.5 # built from v as it is now
+        v += a
+        s += ds
+        expr = v/2.0
+        assert isinstance(expr, Vec) and type(expr.copy()) is VecXZ and tuple(expr._as_array().data[:, 0]) == (.5, .5)
+    assert (tuple(s), tuple(v)) == (tuple(eager_s), tuple(eager_v)) == ((.5, 1.0), (1.0, 1.0))
+
+    # leaves aren't copied, the in place operators move the vector to a fresh buffer while one is held
+    with lazy():
+        half = v*0.5
+        assert half.leaves[0] is v.components
+        v[0] = 4.0
+        v *= 2.0
+        v /= 4.0
+        assert tuple(half) == (.5, .5) and tuple(v) == (2.0, .5)
+        buffer = id(v.components)
+        v += a # nothing holds v's buffer anymore, so it is written in place
+        assert id(v.components) == buffer
+
+def _test_lazy_thread():
+    v, results = VecXZ(1.0, 2.0), []
+    def other():
+        results.append((is_lazy(), type(v*2.0), type(-v), type(v + v)))
+    with lazy():
+        thread = threading.Thread(target=other)
+        thread.start()
+        thread.join()
+        assert isinstance(v*2.0, VecExpr)
+    assert results == [(False, VecXZ, VecXZ, VecXZ)] # the other thread stays eager while this one is lazy
+
+def test():
+    _test_inplace()
+    _test_vecarray_arithmetic()
+    _test_vecarray_views()
+    _test_lazy()
+    _test_lazy_snapshot()
+    _test_lazy_thread()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()
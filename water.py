@@ -0,0 +1,186 @@
+'''
+Water column profiles: density, pressure and temperature against depth.
+
+Profiles are resampled once onto a uniform depth grid, so a query is an O(1) index computation plus a linear
+interpolation, for a single depth or a whole array of depths. Depths outside the table clamp to its ends.
+Large tables saved as .npy are memory mapped rather than read.
+'''
+from __future__ import annotations
+from typing import Union
+import csv
+import numpy as np
+
+P_ATM: float = 101325.0 # Pa
+
+Depth = Union[float, np.ndarray]
+
+DENSITY, PRESSURE, TEMPERATURE = 0, 1, 2
+
+SCALAR_TABLE_LIMIT: int = 1 << 20 # grid rows, larger (usually memory mapped) tables aren't copied into lists
+
+class WaterColumn:
+    depth0: float # depth of the first grid row, metres below the surface
+    step: float # grid spacing in metres
+    table: np.ndarray # 3 x n: density (kg/m^3), pressure (Pa), temperature (C)
+    surface_z: float # z coordinate of the surface, depth = z - surface_z
+
+    def __init__(self, depth0: float, step: float, table: np.ndarray, surface_z: float = 0.0):
+        if table.ndim != 2 or table.shape[0] != 3 or table.shape[1] < 2:
+            raise ValueError(f'expected a 3 x n (n >= 2) table, got {table.shape}')
+        self.depth0, self.step, self.table, self.surface_z = depth0, step, table, surface_z
+        self._inv_step = 1.0 / step
+        self._last = table.shape[1] - 1
+
+        # per cell slopes save a gather per query. small tables are also kept as lists for the scalar path,
+        # since indexing a list is several times cheaper than indexing an ndarray. large tables get neither:
+        # a slope table would copy the whole (memory mapped) table, so their slopes come from the two
+        # neighbouring samples at lookup
+        if table.shape[1] <= SCALAR_TABLE_LIMIT:
+            self._slopes = np.diff(table, axis=1)
+            self._lists = (table.tolist(), self._slopes.tolist())
+        else:
+            self._slopes = None
+            self._lists = (table, None)
+
+    # === construction ===
+
+    @classmethod
+    def linear(cls, rho_surface: float, beta: float, max_depth: float = 11000.0, step: float = 1.0, temperature: float = 4.0, g: float = 9.8, surface_z: float = 0.0) -> WaterColumn:
+        '''the closed form rho = rho_surface + beta*depth, tabulated, with hydrostatic pressure'''
+        depth = np.arange(0.0, max_depth + step, step)
+        density = rho_surface + beta*depth
+        pressure = P_ATM + g*(rho_surface*depth + beta*depth**2/2)
+        return cls(0.0, step, np.stack((density, pressure, np.full_like(depth, temperature))), surface_z)
+
+    @classmethod
+    def from_samples(cls, depth: np.ndarray, density: np.ndarray, pressure: np.ndarray | None = None, temperature: np.ndarray | None = None, step: float | None = None, g: float = 9.8, surface_z: float = 0.0) -> WaterColumn:
+        '''
+        resample a (possibly irregular) cast onto a uniform grid, by default as fine as its smallest gap.
+        a missing pressure profile is integrated hydrostatically from the density
+        '''
+        integrate = pressure is None
+        depth = np.asarray(depth, dtype=float)
+        columns = np.stack([np.full_like(depth, np.nan) if column is None else np.asarray(column, dtype=float) for column in (density, pressure, temperature)])
+        depth, (density, pressure, temperature) = _average_repeats(depth, columns) # e.g. the down and up casts meet at the bottom
+        if len(depth) < 2:
+            raise ValueError(f'expected samples at two or more depths, got {depth}')
+        if step is None:
+            step = float(np.min(np.diff(depth)))
+        elif step <= 0.0:
+            raise ValueError(f'expected a positive step, got {step}')
+        grid = np.arange(depth[0], depth[-1] + step/2, step)
+
+        if integrate:
+            # trapezoidal integration of rho*g over depth, starting from atmospheric pressure at the surface
+            dp = g*(density[1:] + density[:-1])/2*np.diff(depth)
+            pressure = P_ATM + g*density[0]*max(depth[0], 0.0) + np.concatenate(([0.0], np.cumsum(dp)))
+
+        table = np.stack([np.interp(grid, depth, column) for column in (density, pressure, temperature)])
+        return cls(float(grid[0]), step, table, surface_z)
+
+    @classmethod
+    def load(cls, path: str, surface_z: float = 0.0) -> WaterColumn:
+        '''
+        .npy: a 4 x n array as written by save(), memory mapped (rows: depth, density, pressure, temperature)
+        .csv: a cast with a header naming depth, density and optionally pressure, temperature columns
+        '''
+        if path.endswith('.npy'):
+            data = np.load(path, mmap_mode='r')
+            return cls(float(data[0, 0]), float(data[0, 1] - data[0, 0]), data[1:], surface_z)
+
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+        columns = {key.strip().lower(): np.array([float(row[key]) for row in rows]) for key in rows[0]}
+        return cls.from_samples(columns['depth'], columns['density'], columns.get('pressure'), columns.get('temperature'), surface_z=surface_z)
+
+    def save(self, path: str):
+        depth = self.depth0 + self.step*np.arange(self.table.shape[1])
+        np.save(path, np.vstack((depth, self.table)))
+
+    # === queries ===
+
+    def _lerp(self, row: int, depth: Depth, out: np.ndarray | None = None) -> Depth:
+        if isinstance(depth, (int, float)):
+            values, slopes = self._lists
+            values, slopes = values[row], None if slopes is None else slopes[row]
+            x = (depth - self.depth0)*self._inv_step
+            if x <= 0.0:
+                return float(values[0])
+            if x >= self._last:
+                return float(values[self._last])
+            i = int(x)
+            value = values[i]
+            return float(value + (values[i + 1] - value if slopes is None else slopes[i])*(x - i))
+
+        x = np.subtract(depth, self.depth0, out=out, dtype=float)
+        x *= self._inv_step
+        np.clip(x, 0.0, self._last, out=x)
+        i = x.astype(np.intp)
+        np.minimum(i, self._last - 1, out=i)
+        x -= i
+        values = self.table[row]
+        value = values[i]
+        x *= values[i + 1] - value if self._slopes is None else self._slopes[row][i]
+        x += value
+        return x
+
+    def density(self, depth: Depth) -> Depth:
+        return self._lerp(DENSITY, depth)
+
+    def pressure(self, depth: Depth) -> Depth:
+        return self._lerp(PRESSURE, depth)
+
+    def temperature(self, depth: Depth) -> Depth:
+        return self._lerp(TEMPERATURE, depth)
+
+    def density_at(self, z: Depth, out: np.ndarray | None = None) -> Depth:
+        '''density at a z coordinate rather than a depth, arrays can be written into out'''
+        if out is not None:
+            return self._lerp(DENSITY, np.subtract(z, self.surface_z, out=out), out)
+        return self._lerp(DENSITY, z - self.surface_z)
+
+def _average_repeats(x: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    '''sorted distinct x, and values (samples along the last axis) averaged over the samples at each of them'''
+    x, inverse, counts = np.unique(x, return_inverse=True, return_counts=True)
+    sums = np.zeros(values.shape[:-1] + x.shape)
+    np.add.at(sums, (..., inverse), values)
+    return x, sums/counts
+
+def _test_samples():
+    depth = np.array([10.0, 0.0, 20.0, 20.0, 10.0])
+    column = WaterColumn.from_samples(depth, np.array([1026.0, 1025.0, 1027.0, 1029.0, 1028.0]))
+    assert column.step == 10.0 and np.allclose(column.table[DENSITY], [1025.0, 1027.0, 1028.0]) # repeats averaged
+    assert column.pressure(0.0) == P_ATM and np.isnan(column.temperature(5.0))
+    for bad in (dict(depth=np.array([5.0, 5.0])), dict(step=0.0)):
+        try:
+            WaterColumn.from_samples(**{'depth': depth, 'density': np.full(len(bad.get('depth', depth)), 1025.0), **bad})
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'expected a ValueError for {bad}')
+
+def _test_large_table():
+    global SCALAR_TABLE_LIMIT
+    import os, tempfile
+    small = WaterColumn.linear(1025.0, 0.0046, max_depth=1000.0, step=0.5)
+    path = os.path.join(tempfile.mkdtemp(), 'column.npy')
+    small.save(path)
+    limit, SCALAR_TABLE_LIMIT = SCALAR_TABLE_LIMIT, 100
+    try:
+        large = WaterColumn.load(path) # memory mapped, and over the limit
+    finally:
+        SCALAR_TABLE_LIMIT = limit
+    assert large._slopes is None and isinstance(large.table, np.memmap) # no copy of the table
+    depths = np.array([-5.0, 0.0, 0.2, 123.45, 999.9, 1000.0, 2000.0])
+    assert np.allclose(large.density(depths), small.density(depths), rtol=1e-12)
+    assert all(abs(large.pressure(float(d)) - small.pressure(float(d))) < 1e-6 for d in depths)
+
+def test():
+    _test_samples()
+    _test_large_table()
+
+def main():
+    test()
+
+if __name__ == '__main__':
+    main()